@@ -85,6 +85,11 @@ class SourceRevisionAdmin(admin.ModelAdmin):
     list_filter = ['action', 'timestamp']
     search_fields = ['uid__title']
 
+@admin.register(ObjectRevision)
+class ObjectRevisionAdmin(admin.ModelAdmin):
+    list_display = ['content_type', 'object_id', 'seq', 'user', 'timestamp', 'action']
+    list_filter = ['content_type', 'action', 'timestamp']
+
 # Activity model
 @admin.register(Activity)
 class ActivityAdmin(admin.ModelAdmin):
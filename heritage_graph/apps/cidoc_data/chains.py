@@ -0,0 +1,81 @@
+"""
+Activity chains: activities linked through ``previous_activity``.
+
+A chain is everything reachable downwards from a root activity (one with no
+previous activity, or whose previous activity no longer exists). The reads
+below find the roots of the starting activities and then walk down from
+them, both in one recursive query. On the way up an activity's cached
+``chain_root`` is followed instead of ``previous_activity`` when it is set,
+so on a backfilled table that walk is a single step.
+"""
+
+from django.db import connection, models
+from django.db.models.functions import Coalesce
+
+from .models import Activity
+
+MAX_CHAIN_DEPTH = 10000
+MAX_CHAINS = 50
+MAX_CHAIN_ROWS = 5000
+
+
+def _chain_rows(anchor, params, max_chains, max_rows):
+    """Activities of the chains through the rows matching ``anchor``, with ``chain_id`` and ``depth``"""
+    table = connection.ops.quote_name(Activity._meta.db_table)
+    # UNION (not UNION ALL) on the way up drops rows already seen, so shared
+    # ancestors are visited once and a corrupt cycle still terminates
+    return list(Activity.objects.raw(f'''
+        WITH RECURSIVE up (activity_id, next_id) AS (
+            SELECT activity_id, COALESCE(chain_root, previous_activity) FROM {table} WHERE {anchor}
+            UNION
+            SELECT a.activity_id, COALESCE(a.chain_root, a.previous_activity)
+            FROM up JOIN {table} a ON a.activity_id = up.next_id
+            WHERE up.next_id <> up.activity_id
+        ),
+        roots AS (
+            SELECT DISTINCT up.activity_id FROM up
+            WHERE up.next_id IS NULL OR up.next_id = up.activity_id
+                OR NOT EXISTS (SELECT 1 FROM {table} p WHERE p.activity_id = up.next_id)
+            ORDER BY up.activity_id LIMIT %s
+        ),
+        down (chain_id, activity_id, depth) AS (
+            SELECT activity_id, activity_id, 0 FROM roots
+            UNION ALL
+            SELECT down.chain_id, a.activity_id, down.depth + 1
+            FROM down JOIN {table} a ON a.previous_activity = down.activity_id
+            WHERE a.activity_id <> down.activity_id AND down.depth < %s
+        )
+        SELECT a.*, down.chain_id, down.depth FROM down JOIN {table} a ON a.activity_id = down.activity_id
+        ORDER BY down.chain_id, down.depth, a.timestamp, a.activity_id
+        LIMIT %s
+    ''', [*params, max_chains, MAX_CHAIN_DEPTH, max_rows]))
+
+
+def activity_chain(activity_id, max_rows=MAX_CHAIN_ROWS):
+    """Every activity in ``activity_id``'s chain, root first"""
+    return _chain_rows('activity_id = %s', [activity_id], 1, max_rows)
+
+
+def post_chains(post_uid, max_chains=MAX_CHAINS, max_rows=MAX_CHAIN_ROWS):
+    """Every activity in the chains that include an activity on ``post_uid``"""
+    return _chain_rows('post_uid = %s', [post_uid], max_chains, max_rows)
+
+
+def chain_root_for(activity):
+    """The chain_root a new activity should cache, if its previous activity is known"""
+    if activity.previous_activity is None:
+        return None
+    return (
+        Activity.objects.filter(pk=activity.previous_activity)
+        .values_list(Coalesce('chain_root', 'activity_id', output_field=models.IntegerField()), flat=True)
+        .first()
+    )
+
+
+def forget_chain_roots(activity_ids):
+    """
+    Drop cached roots that point at removed activities (e.g. archived
+    ones). Those rows fall back to previous_activity, so their chain now
+    starts at the oldest activity still in the table.
+    """
+    Activity.objects.filter(chain_root__in=activity_ids).update(chain_root=None)
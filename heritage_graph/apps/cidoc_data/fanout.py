@@ -0,0 +1,182 @@
+"""
+Notification fan-out for CIDOC revisions and comments.
+
+Saving a revision or comment only queues a 'cidoc_fan_out' outbox event;
+the drain_outbox worker later resolves the object's followers (everyone who
+has revised or commented on it) with one query and writes their
+notifications with bulk_create in chunks. A follower who still has an
+unread notification of the same kind for the object gets that one bumped
+instead of a new row, so a burst of edits collapses into one notification.
+"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.heritage_data.models import OutboxEvent, outbox_shard
+from apps.heritage_data.outbox import handles
+from apps.heritage_data.push import get_broker, user_channel
+
+from .models import (
+    Artifact, ArtifactComment, ArtifactRevision, ArtifactRevisionComment,
+    Event, EventComment, EventRevision, EventRevisionComment,
+    HistoricalPeriod, HistoricalPeriodComment, HistoricalPeriodRevision, HistoricalPeriodRevisionComment,
+    Location, LocationComment, LocationRevision, LocationRevisionComment,
+    NotificationForUser,
+    Person, PersonComment, PersonRevision, PersonRevisionComment,
+    Source, SourceComment, SourceRevision, SourceRevisionComment,
+    Tradition, TraditionComment, TraditionRevision, TraditionRevisionComment,
+    adjust_unread_counts,
+)
+
+FAN_OUT_EVENT = 'cidoc_fan_out'
+FAN_OUT_BATCH_SIZE = 500
+
+# object type -> (model, revision model, comment model, revision comment model)
+FOLLOWED_MODELS = {
+    'historical_period': (HistoricalPeriod, HistoricalPeriodRevision, HistoricalPeriodComment, HistoricalPeriodRevisionComment),
+    'location': (Location, LocationRevision, LocationComment, LocationRevisionComment),
+    'person': (Person, PersonRevision, PersonComment, PersonRevisionComment),
+    'artifact': (Artifact, ArtifactRevision, ArtifactComment, ArtifactRevisionComment),
+    'event': (Event, EventRevision, EventComment, EventRevisionComment),
+    'tradition': (Tradition, TraditionRevision, TraditionComment, TraditionRevisionComment),
+    'source': (Source, SourceRevision, SourceComment, SourceRevisionComment),
+}
+
+NOTIFICATION_TYPES = {key for key, _ in NotificationForUser.NOTIFICATION_TYPES}
+
+
+def notification_type_for(object_type, kind):
+    if kind == 'comment':
+        return 'comment'
+    update_type = f'{object_type}_update'
+    return update_type if update_type in NOTIFICATION_TYPES else 'revision'
+
+
+def fan_out_event(object_type, object_id, kind, sender_id, activity_id=None):
+    """Build (but do not save) the outbox event for one revision or comment"""
+    key = f'{object_type}:{object_id}'
+    return OutboxEvent(
+        event_type=FAN_OUT_EVENT,
+        shard=outbox_shard(key),
+        payload={
+            'order_key': key,
+            'object_type': object_type,
+            'object_id': object_id,
+            'notification_type': notification_type_for(object_type, kind),
+            'kind': kind,
+            'sender_id': sender_id,
+            'activity_id': activity_id,
+        },
+    )
+
+
+def followers(object_type, object_id):
+    """IDs of everyone who revised or commented on the object, in one query"""
+    _, revision_model, comment_model, revision_comment_model = FOLLOWED_MODELS[object_type]
+    user_ids = (
+        revision_model.objects.filter(uid_id=object_id).values_list('user_id', flat=True)
+        .union(comment_model.objects.filter(uid_id=object_id).values_list('user_id', flat=True))
+        .union(revision_comment_model.objects.filter(uid__uid_id=object_id).values_list('user_id', flat=True))
+    )
+    return set(user_ids)
+
+
+def notification_message(kind, count, label):
+    noun = 'comment' if kind == 'comment' else 'revision'
+    if count == 1:
+        return f'New {noun} on {label}'
+    return f'{count} new {noun}s on {label}'
+
+
+def notification_push_event(notification):
+    return {
+        'type': 'cidoc_notification',
+        'notification_id': notification.pk,
+        'notification_type': notification.notification_type,
+        'related_object_type': notification.related_object_type,
+        'related_object_id': notification.related_object_id,
+        'message': notification.message,
+        'collapsed_count': notification.collapsed_count,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def _labels(keys):
+    """{(object_type, object_id): str(object)} with one query per object type"""
+    ids_by_type = {}
+    for object_type, object_id in keys:
+        ids_by_type.setdefault(object_type, set()).add(object_id)
+    labels = {}
+    for object_type, ids in ids_by_type.items():
+        model = FOLLOWED_MODELS[object_type][0]
+        for pk, obj in model.objects.in_bulk(ids).items():
+            labels[object_type, pk] = str(obj)
+    return labels
+
+
+@handles(FAN_OUT_EVENT)
+def fan_out_notifications(events):
+    groups = {}
+    for event in events:
+        payload = event.payload
+        key = (payload['object_type'], payload['object_id'], payload['notification_type'], payload['kind'])
+        groups.setdefault(key, []).append(payload)
+    labels = _labels({(object_type, object_id) for object_type, object_id, _, _ in groups})
+    now = timezone.now()
+
+    created, bumped = [], []
+    for (object_type, object_id, notification_type, kind), payloads in groups.items():
+        label = labels.get((object_type, object_id))
+        if label is None:
+            continue  # deleted since the event was queued
+        # Nobody is notified about their own changes
+        per_recipient = {}
+        for user_id in followers(object_type, object_id):
+            count = sum(1 for payload in payloads if payload['sender_id'] != user_id)
+            if count:
+                per_recipient[user_id] = count
+        if not per_recipient:
+            continue
+        last = payloads[-1]
+
+        unread = NotificationForUser.objects.select_for_update().filter(
+            user_id__in=per_recipient, is_read=False, related_object_type=object_type,
+            related_object_id=object_id, notification_type=notification_type,
+        ).order_by('user_id', '-created_at')
+        for notification in unread:
+            count = per_recipient.pop(notification.user_id, None)
+            if count is None:
+                continue  # only the newest unread one per user is bumped
+            notification.collapsed_count += count
+            notification.message = notification_message(kind, notification.collapsed_count, label)
+            notification.created_at = now
+            notification.sender_id = last['sender_id']
+            notification.activity_id_id = last['activity_id']
+            bumped.append(notification)
+
+        created.extend(
+            NotificationForUser(
+                user_id=user_id, notification_type=notification_type,
+                related_object_id=object_id, related_object_type=object_type,
+                message=notification_message(kind, count, label), collapsed_count=count,
+                sender_id=last['sender_id'], activity_id_id=last['activity_id'],
+            )
+            for user_id, count in sorted(per_recipient.items())
+        )
+
+    NotificationForUser.objects.bulk_update(
+        bumped, ['collapsed_count', 'message', 'created_at', 'sender', 'activity_id'],
+        batch_size=FAN_OUT_BATCH_SIZE,
+    )
+    created = NotificationForUser.objects.bulk_create(created, batch_size=FAN_OUT_BATCH_SIZE)
+    # bulk_create bypasses the signals that keep the counters
+    adjust_unread_counts(Counter(notification.user_id for notification in created))
+
+    def push():
+        broker = get_broker()
+        for notification in bumped + created:
+            broker.publish(user_channel(notification.user_id), notification_push_event(notification))
+
+    transaction.on_commit(push)
@@ -0,0 +1,228 @@
+"""
+The CIDOC records seen as one graph.
+
+Nodes are ``(type, pk)`` pairs over the main models; edges are their
+foreign keys and many-to-many fields, read in both directions. RELATIONS is
+derived from the models, so a new relation between them is picked up
+without changes here. expand() fetches every edge touching a frontier with
+one query per relation and direction, whatever the frontier's size.
+"""
+
+from collections import namedtuple
+
+from django.db import models
+
+from .models import Artifact, Event, HistoricalPeriod, Location, Person, Source, Tradition
+
+NODE_MODELS = {
+    'historical_period': HistoricalPeriod,
+    'location': Location,
+    'person': Person,
+    'artifact': Artifact,
+    'event': Event,
+    'tradition': Tradition,
+    'source': Source,
+}
+NODE_TYPES = {model: node_type for node_type, model in NODE_MODELS.items()}
+LABEL_FIELDS = {'source': 'title'}
+
+DEFAULT_DEPTH = 1
+MAX_DEPTH = 3
+DEFAULT_MAX_NODES = 200
+MAX_NODES = 1000
+DEFAULT_MAX_DEGREE = 50
+DEFAULT_PATHS = 3
+MAX_PATHS = 20
+DEFAULT_PATH_DEPTH = 4
+MAX_PATH_DEPTH = 8
+DEFAULT_MAX_VISITED = 5000
+
+# ``table``, ``source_column`` and ``target_column`` say where the pairs are
+# stored: the model's own table for a foreign key, the through table for M2M.
+Relation = namedtuple('Relation', 'name source target table source_column target_column')
+
+
+def _relations():
+    relations = []
+    for source, model in NODE_MODELS.items():
+        for field in model._meta.get_fields():
+            if not field.concrete or not field.is_relation:
+                continue
+            target = NODE_TYPES.get(field.related_model)
+            if target is None:
+                continue
+            if isinstance(field, models.ManyToManyField):
+                relations.append(Relation(
+                    field.name, source, target, field.remote_field.through,
+                    field.m2m_column_name(), field.m2m_reverse_name(),
+                ))
+            else:
+                relations.append(Relation(field.name, source, target, model, 'pk', field.attname))
+    return relations
+
+
+RELATIONS = _relations()
+
+
+def node_key(node):
+    return f'{node[0]}:{node[1]}'
+
+
+def parse_node_key(key):
+    """'artifact:3' -> ('artifact', 3); raises ValueError if malformed"""
+    node_type, _, pk = (key or '').partition(':')
+    if node_type not in NODE_MODELS or not pk.isdigit():
+        raise ValueError(f"Expected '<type>:<id>' with type one of {', '.join(NODE_MODELS)}.")
+    return node_type, int(pk)
+
+
+def _pairs(relation, column, ids, limit):
+    other = relation.target_column if column == relation.source_column else relation.source_column
+    rows = (
+        relation.table.objects.filter(**{f'{column}__in': ids, f'{other}__isnull': False})
+        .order_by(column, other)
+        .values_list(relation.source_column, relation.target_column)
+    )
+    return rows[:limit] if limit is not None else rows
+
+
+def expand(frontier, limit=None):
+    """
+    Every edge with an end in ``frontier`` (``{type: set(pks)}``), as
+    ``(source_node, relation_name, target_node)``. ``limit`` caps the rows
+    read per relation and direction. Returns ``(edges, complete)`` where
+    ``complete`` is False if any of those caps was reached.
+    """
+    edges = []
+    complete = True
+    for relation in RELATIONS:
+        for node_type, column in ((relation.source, relation.source_column), (relation.target, relation.target_column)):
+            ids = frontier.get(node_type)
+            if not ids:
+                continue
+            rows = list(_pairs(relation, column, ids, limit))
+            if limit is not None and len(rows) == limit:
+                complete = False
+            for source_id, target_id in rows:
+                edges.append(((relation.source, source_id), relation.name, (relation.target, target_id)))
+    return edges, complete
+
+
+def node_labels(nodes):
+    """{node: label} with one query per node type; nodes that no longer exist are left out"""
+    ids_by_type = {}
+    for node_type, pk in nodes:
+        ids_by_type.setdefault(node_type, set()).add(pk)
+    labels = {}
+    for node_type, ids in ids_by_type.items():
+        label_field = LABEL_FIELDS.get(node_type, 'name')
+        for pk, label in NODE_MODELS[node_type].objects.filter(pk__in=ids).values_list('pk', label_field):
+            labels[node_type, pk] = label
+    return labels
+
+
+def neighbourhood(start, depth=DEFAULT_DEPTH, max_nodes=DEFAULT_MAX_NODES, max_degree=DEFAULT_MAX_DEGREE):
+    """
+    Breadth-first neighbourhood of ``start`` up to ``depth`` hops. Each node
+    contributes at most ``max_degree`` new neighbours and the walk stops
+    adding nodes at ``max_nodes``; ``truncated`` reports whether either
+    limit was hit. Returns ``(nodes, edges, truncated)`` where ``nodes``
+    maps node -> depth.
+    """
+    seen = {start: 0}
+    edges = {}
+    truncated = False
+    frontier = [start]
+    for level in range(1, depth + 1):
+        by_type = {}
+        for node_type, pk in frontier:
+            by_type.setdefault(node_type, set()).add(pk)
+        added = {}
+        next_frontier = []
+        # Bounds each read; a relation that fills its cap marks the result truncated
+        found, complete = expand(by_type, limit=len(frontier) * max_degree)
+        truncated = truncated or not complete
+        for source, relation, target in found:
+            for node, other in ((source, target), (target, source)):
+                if seen.get(node) != level - 1:
+                    continue
+                if other not in seen:
+                    if len(seen) >= max_nodes or added.get(node, 0) >= max_degree:
+                        truncated = True
+                        continue
+                    added[node] = added.get(node, 0) + 1
+                    seen[other] = level
+                    next_frontier.append(other)
+                edges[source, relation, target] = None
+        if not next_frontier:
+            break
+        frontier = next_frontier
+    return seen, list(edges), truncated
+
+
+def _chains(node, parents, limit):
+    """Up to ``limit`` edge chains leading from the search root to ``node``"""
+    if not parents[node]:
+        return [[]]
+    chains = []
+    for parent, edge in parents[node]:
+        for chain in _chains(parent, parents, limit - len(chains)):
+            chains.append(chain + [edge])
+            if len(chains) >= limit:
+                return chains
+    return chains
+
+
+def shortest_paths(start, goal, k=DEFAULT_PATHS, max_depth=DEFAULT_PATH_DEPTH,
+                   max_visited=DEFAULT_MAX_VISITED, expand=expand):
+    """
+    Bidirectional breadth-first search from ``start`` and ``goal``, always
+    growing the smaller frontier by one level. Returns ``(paths, truncated)``
+    where ``paths`` holds up to ``k`` of the shortest connections, each a
+    list of ``(source, relation, target)`` edges in order from ``start``.
+    Paths are no longer than ``max_depth`` edges and the search gives up
+    (``truncated``) once ``max_visited`` nodes have been reached.
+    ``expand`` may be swapped for GraphIndex.expand to search in memory.
+    """
+    if start == goal:
+        return [[]], False
+    parents = ({start: []}, {goal: []})
+    frontiers = ([start], [goal])
+    truncated = False
+    for _ in range(max_depth):
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        mine, theirs = parents[side], parents[1 - side]
+        by_type = {}
+        for node_type, pk in frontiers[side]:
+            by_type.setdefault(node_type, set()).add(pk)
+        found, complete = expand(by_type, limit=max_visited)
+        truncated = truncated or not complete
+
+        level = {}
+        for edge in found:
+            source, _, target = edge
+            for node, other in ((source, target), (target, source)):
+                if node[1] not in by_type.get(node[0], ()) or (other in mine and other not in level):
+                    continue
+                step = (node, edge)
+                if step not in level.setdefault(other, []):
+                    level[other].append(step)
+        mine.update(level)
+
+        meeting = [node for node in level if node in theirs]
+        if meeting:
+            paths = []
+            for node in meeting:
+                for head in _chains(node, mine, k):
+                    for tail in _chains(node, theirs, k):
+                        paths.append(head + tail[::-1])
+            if side == 1:
+                paths = [path[::-1] for path in paths]
+            paths.sort(key=len)
+            return paths[:k], truncated
+        if not level:
+            return [], truncated
+        if len(parents[0]) + len(parents[1]) > max_visited:
+            return [], True
+        frontiers = (list(level), frontiers[1]) if side == 0 else (frontiers[0], list(level))
+    return [], True
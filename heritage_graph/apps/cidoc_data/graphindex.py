@@ -0,0 +1,302 @@
+"""
+In-process adjacency index of the CIDOC graph.
+
+Every node gets a dense integer id and the edges are held CSR-style in flat
+arrays: the neighbours of node ``i`` are ``targets[indptr[i]:indptr[i + 1]]``
+with the matching ``labels`` entry naming the relation (``+k`` for
+RELATIONS[k - 1] read forwards, ``-k`` backwards). Multi-hop questions then
+walk integer arrays instead of joining through tables.
+
+Writes after the build are applied from signals as a small overlay of added
+and removed edges, folded back into the arrays once it grows past
+COMPACT_THRESHOLD. Each change also bumps a version number in the cache; a
+process whose index was built from an older version rebuilds it on next
+use, which is how changes made by other processes reach it.
+"""
+
+import heapq
+import sys
+import threading
+from array import array
+
+from django.core.cache import cache
+
+from .graph import NODE_MODELS, RELATIONS
+
+VERSION_KEY = 'cidoc-graph-index-version'
+COMPACT_THRESHOLD = 10000
+RELATION_INDEX = {relation: number for number, relation in enumerate(RELATIONS, start=1)}
+
+
+class GraphIndex:
+    def __init__(self, nodes, edges, version=0):
+        """``nodes`` is a list of (type, pk); ``edges`` three parallel arrays (source, label, target)"""
+        self.nodes = nodes
+        self.ids = {node: i for i, node in enumerate(nodes)}
+        self.version = version
+        self._compress(*edges)
+
+    @classmethod
+    def build(cls, version=0):
+        """Read every relation with one bulk scan each"""
+        nodes, ids = [], {}
+
+        def node_id(node):
+            i = ids.get(node)
+            if i is None:
+                i = ids[node] = len(nodes)
+                nodes.append(node)
+            return i
+
+        for node_type, model in NODE_MODELS.items():
+            for pk in model.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=5000):
+                node_id((node_type, pk))
+
+        sources, labels, targets = array('q'), array('b'), array('q')
+        for number, relation in enumerate(RELATIONS, start=1):
+            rows = relation.table.objects.filter(**{f'{relation.target_column}__isnull': False}).values_list(
+                relation.source_column, relation.target_column
+            )
+            for source_pk, target_pk in rows.iterator(chunk_size=5000):
+                source = node_id((relation.source, source_pk))
+                target = node_id((relation.target, target_pk))
+                sources.extend((source, target))
+                labels.extend((number, -number))
+                targets.extend((target, source))
+        return cls(nodes, (sources, labels, targets), version)
+
+    def _compress(self, sources, labels, targets):
+        # Counting sort of the edge list by source node
+        size = len(self.nodes)
+        indptr = array('q', bytes(8 * (size + 1)))
+        for source in sources:
+            indptr[source + 1] += 1
+        for i in range(size):
+            indptr[i + 1] += indptr[i]
+        fill = array('q', indptr[:-1])
+        self.targets = array('q', bytes(8 * len(targets)))
+        self.labels = array('b', bytes(len(labels)))
+        for source, label, target in zip(sources, labels, targets):
+            position = fill[source]
+            self.targets[position] = target
+            self.labels[position] = label
+            fill[source] += 1
+        self.indptr = indptr
+        self.added = {}
+        self.removed = set()
+
+    # -- reads -------------------------------------------------------------
+
+    def _adjacent(self, i):
+        """(label, neighbour id) pairs of node id ``i``, overlay included"""
+        if i + 1 < len(self.indptr):
+            start, end = self.indptr[i], self.indptr[i + 1]
+            for label, target in zip(self.labels[start:end], self.targets[start:end]):
+                if not self.removed or (i, label, target) not in self.removed:
+                    yield label, target
+        yield from self.added.get(i, ())
+
+    def neighbours(self, node, node_type=None):
+        """``(relation_name, direction, node)`` for every edge of ``node``"""
+        i = self.ids.get(node)
+        if i is None:
+            return []
+        result = []
+        for label, target in self._adjacent(i):
+            other = self.nodes[target]
+            if node_type is None or other[0] == node_type:
+                result.append((RELATIONS[abs(label) - 1].name, 'out' if label > 0 else 'in', other))
+        return result
+
+    def follow(self, starts, *node_types):
+        """
+        Nodes reached from ``starts`` by stepping to a neighbour of each
+        type in ``node_types`` in turn, e.g.
+        ``follow([('historical_period', 3)], 'artifact', 'tradition')``.
+        """
+        frontier = {self.ids[node] for node in starts if node in self.ids}
+        for node_type in node_types:
+            frontier = {
+                target
+                for i in frontier
+                for _, target in self._adjacent(i)
+                if self.nodes[target][0] == node_type
+            }
+        return {self.nodes[i] for i in frontier}
+
+    def expand(self, frontier, limit=None):
+        """
+        Same contract as graph.expand(), answered from memory. ``limit`` caps
+        the edges kept per relation and direction, picked in the database's
+        (frontier pk, other pk) order.
+        """
+        pairs = {}
+        for node_type, pks in frontier.items():
+            for pk in pks:
+                i = self.ids.get((node_type, pk))
+                if i is None:
+                    continue
+                for label, target in self._adjacent(i):
+                    pairs.setdefault(label, []).append((pk, self.nodes[target][1]))
+        edges = []
+        complete = True
+        for number, relation in enumerate(RELATIONS, start=1):
+            for label in (number, -number):
+                found = pairs.get(label)
+                if not found:
+                    continue
+                if limit is not None:
+                    if len(found) >= limit:
+                        complete = False
+                    found = heapq.nsmallest(limit, found)
+                for pk, other in found:
+                    source, target = (pk, other) if label > 0 else (other, pk)
+                    edges.append(((relation.source, source), relation.name, (relation.target, target)))
+        return edges, complete
+
+    # -- writes ------------------------------------------------------------
+
+    def _node_id(self, node):
+        i = self.ids.get(node)
+        if i is None:
+            i = self.ids[node] = len(self.nodes)
+            self.nodes.append(node)
+        return i
+
+    def _has(self, source, label, target):
+        return any(pair == (label, target) for pair in self._adjacent(source))
+
+    def _add_half(self, source, label, target):
+        if (source, label, target) in self.removed:
+            self.removed.discard((source, label, target))
+        elif not self._has(source, label, target):
+            self.added.setdefault(source, set()).add((label, target))
+
+    def _remove_half(self, source, label, target):
+        pairs = self.added.get(source)
+        if pairs and (label, target) in pairs:
+            pairs.discard((label, target))
+        elif self._has(source, label, target):
+            self.removed.add((source, label, target))
+
+    def add_edge(self, relation, source_pk, target_pk):
+        number = RELATION_INDEX[relation]
+        source = self._node_id((relation.source, source_pk))
+        target = self._node_id((relation.target, target_pk))
+        self._add_half(source, number, target)
+        self._add_half(target, -number, source)
+        self._maybe_compact()
+
+    def remove_edge(self, relation, source_pk, target_pk):
+        number = RELATION_INDEX[relation]
+        source = self.ids.get((relation.source, source_pk))
+        target = self.ids.get((relation.target, target_pk))
+        if source is None or target is None:
+            return
+        self._remove_half(source, number, target)
+        self._remove_half(target, -number, source)
+        self._maybe_compact()
+
+    def edges_of(self, node, relation, direction='out'):
+        """pks at the other end of ``node``'s ``relation`` edges"""
+        number = RELATION_INDEX[relation]
+        wanted = number if direction == 'out' else -number
+        i = self.ids.get(node)
+        if i is None:
+            return set()
+        return {self.nodes[target][1] for label, target in self._adjacent(i) if label == wanted}
+
+    def add_node(self, node):
+        self._node_id(node)
+
+    def remove_node(self, node):
+        i = self.ids.get(node)
+        if i is None:
+            return
+        for label, target in list(self._adjacent(i)):
+            self._remove_half(i, label, target)
+            self._remove_half(target, -label, i)
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if len(self.removed) + sum(len(pairs) for pairs in self.added.values()) >= COMPACT_THRESHOLD:
+            self.compact()
+
+    def compact(self):
+        """Fold the overlay back into the arrays"""
+        sources, labels, targets = array('q'), array('b'), array('q')
+        for i in range(len(self.nodes)):
+            for label, target in self._adjacent(i):
+                sources.append(i)
+                labels.append(label)
+                targets.append(target)
+        self._compress(sources, labels, targets)
+
+    # -- reporting ---------------------------------------------------------
+
+    def stats(self):
+        arrays = (self.indptr, self.targets, self.labels)
+        array_bytes = sum(a.buffer_info()[1] * a.itemsize for a in arrays)
+        node_bytes = (
+            sys.getsizeof(self.nodes) + sys.getsizeof(self.ids)
+            + sum(sys.getsizeof(node) for node in self.nodes)
+        )
+        return {
+            'nodes': len(self.nodes),
+            'edges': len(self.targets) // 2,
+            'overlay': len(self.removed) + sum(len(pairs) for pairs in self.added.values()),
+            'array_bytes': array_bytes,
+            'node_bytes': node_bytes,
+            'version': self.version,
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def current_version():
+    return cache.get(VERSION_KEY, 0)
+
+
+def get_graph_index():
+    """The process's index, rebuilt if another process changed the graph since it was built"""
+    global _index
+    with _index_lock:
+        version = current_version()
+        if _index is None or _index.version != version:
+            _index = GraphIndex.build(version)
+        return _index
+
+
+def loaded_graph_index():
+    """The index if this process has built one, without building it"""
+    return _index
+
+
+def rebuild_graph_index():
+    global _index
+    with _index_lock:
+        _index = GraphIndex.build(current_version())
+        return _index
+
+
+def apply_change(change):
+    """
+    Apply ``change(index)`` to this process's index, if any, and bump the
+    shared version so other processes rebuild theirs.
+    """
+    cache.add(VERSION_KEY, 0, timeout=None)
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:  # evicted between add() and incr()
+        cache.set(VERSION_KEY, 1, timeout=None)
+        version = 1
+    with _index_lock:
+        if _index is None:
+            return
+        if _index.version == version - 1:
+            change(_index)
+            _index.version = version
+        # Otherwise the index has missed a change made elsewhere and is
+        # rebuilt on next use.
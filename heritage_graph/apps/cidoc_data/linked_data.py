@@ -0,0 +1,259 @@
+"""
+Linked-data export of the CIDOC records, mapped onto CIDOC-CRM classes.
+
+Every table is walked with a server-side cursor in chunks; for each chunk
+the many-to-many rows of its records are fetched with one query per
+relation, and the chunk is written out before the next one is read, so
+memory use stays flat however large the graph is. Revisions are exported
+as metadata only (who, when, what action), not their snapshots.
+"""
+
+import json
+from itertools import islice
+
+from django.conf import settings
+
+from .fanout import FOLLOWED_MODELS
+from .graph import LABEL_FIELDS, NODE_MODELS, RELATIONS
+
+EXPORT_FORMATS = ['nt', 'ttl', 'jsonld']
+DEFAULT_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'nt': 'application/n-triples',
+    'ttl': 'text/turtle',
+    'jsonld': 'application/ld+json',
+}
+
+CRM = 'http://www.cidoc-crm.org/cidoc-crm/'
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+RDFS = 'http://www.w3.org/2000/01/rdf-schema#'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+# Router prefixes, so exported IRIs resolve to the API
+ROUTES = {
+    'historical_period': 'historical_periods',
+    'location': 'locations',
+    'person': 'persons',
+    'artifact': 'artifacts',
+    'event': 'events',
+    'tradition': 'traditions',
+    'source': 'sources',
+}
+
+CLASSES = {
+    'historical_period': 'E4_Period',
+    'location': 'E53_Place',
+    'person': 'E21_Person',
+    'artifact': 'E22_Human-Made_Object',
+    'event': 'E5_Event',
+    'tradition': 'E29_Design_or_Procedure',
+    'source': 'E31_Document',
+}
+
+# (node type, field) -> CRM property; anything else goes to the local vocabulary
+CRM_PROPERTIES = {
+    ('event', 'location'): 'P7_took_place_at',
+    ('event', 'participants'): 'P11_had_participant',
+    ('event', 'historical_period'): 'P10_falls_within',
+    ('artifact', 'origin_location'): 'P53_has_former_or_current_location',
+    ('artifact', 'associated_events'): 'P12i_was_present_at',
+    ('source', 'documented_persons'): 'P70_documents',
+}
+CRM_FIELD_PROPERTIES = {
+    'documentation_sources': 'P70i_is_documented_in',
+    'description': 'P3_has_note',
+    'biography': 'P3_has_note',
+}
+
+
+class IRI(str):
+    """An IRI object, as opposed to a literal"""
+
+
+def base_iri():
+    return getattr(settings, 'CIDOC_BASE_IRI', 'http://localhost:8000/cidoc/')
+
+
+def vocab_iri(name):
+    return f'{base_iri()}vocab#{name}'
+
+
+def entity_iri(node_type, pk):
+    return IRI(f'{base_iri()}{ROUTES[node_type]}/{pk}')
+
+
+def _property(node_type, field):
+    local = CRM_PROPERTIES.get((node_type, field)) or CRM_FIELD_PROPERTIES.get(field)
+    return CRM + local if local else vocab_iri(field)
+
+
+def _chunks(queryset, chunk_size):
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _entities(node_type, chunk_size):
+    model = NODE_MODELS[node_type]
+    label_field = LABEL_FIELDS.get(node_type, 'name')
+    foreign_keys = {r.target_column: r for r in RELATIONS if r.source == node_type and r.source_column == 'pk'}
+    many_to_many = [r for r in RELATIONS if r.source == node_type and r.source_column != 'pk']
+    columns = [f.attname for f in model._meta.concrete_fields if f.attname != 'id']
+    rdf_class = IRI(CRM + CLASSES[node_type])
+
+    for chunk in _chunks(model.objects.order_by('pk').values_list('pk', *columns), chunk_size):
+        linked = {}
+        for relation in many_to_many:
+            pairs = relation.table.objects.filter(
+                **{f'{relation.source_column}__in': [row[0] for row in chunk]}
+            ).order_by(relation.source_column, relation.target_column).values_list(
+                relation.source_column, relation.target_column
+            )
+            for source_pk, target_pk in pairs:
+                linked.setdefault(source_pk, []).append((relation, target_pk))
+
+        for pk, *values in chunk:
+            properties = []
+            for column, value in zip(columns, values):
+                if value is None or value == '':
+                    continue
+                relation = foreign_keys.get(column)
+                if relation is not None:
+                    properties.append((_property(node_type, relation.name), entity_iri(relation.target, value)))
+                elif column == label_field:
+                    properties.append((RDFS + 'label', value))
+                else:
+                    properties.append((_property(node_type, column), value))
+            for relation, target_pk in linked.get(pk, ()):
+                properties.append((_property(node_type, relation.name), entity_iri(relation.target, target_pk)))
+            yield entity_iri(node_type, pk), rdf_class, properties
+
+
+def _revisions(node_type, chunk_size):
+    revision_model = FOLLOWED_MODELS[node_type][1]
+    route = f'{node_type}_revisions'
+    rows = revision_model.objects.order_by('pk').values_list(
+        'pk', 'uid_id', 'user_id', 'timestamp', 'action', 'prev_uid'
+    )
+    rdf_class = IRI(CRM + 'E7_Activity')
+    for chunk in _chunks(rows, chunk_size):
+        for pk, entity_pk, user_id, timestamp, action, prev_pk in chunk:
+            properties = [
+                (CRM + 'P16_used_specific_object', entity_iri(node_type, entity_pk)),
+                (CRM + 'P14_carried_out_by', IRI(f'{base_iri()}users/{user_id}')),
+                (vocab_iri('timestamp'), timestamp),
+                (vocab_iri('action'), action),
+            ]
+            if prev_pk is not None:
+                properties.append((vocab_iri('previous_revision'), IRI(f'{base_iri()}{route}/{prev_pk}')))
+            yield IRI(f'{base_iri()}{route}/{pk}'), rdf_class, properties
+
+
+def iter_resources(chunk_size=DEFAULT_CHUNK_SIZE):
+    """``(subject, class, [(predicate, object)])`` for every record and revision"""
+    for node_type in NODE_MODELS:
+        yield from _entities(node_type, chunk_size)
+    for node_type in NODE_MODELS:
+        yield from _revisions(node_type, chunk_size)
+
+
+# -- serialisation ---------------------------------------------------------
+
+def _escape(text):
+    return (
+        text.replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+def _literal_parts(value):
+    """(lexical form, datatype IRI or None)"""
+    if isinstance(value, bool):
+        return ('true' if value else 'false'), XSD + 'boolean'
+    if isinstance(value, int):
+        return str(value), XSD + 'integer'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat(), XSD + 'dateTime'
+    return str(value), None
+
+
+def _nt_term(value):
+    if isinstance(value, IRI):
+        return f'<{value}>'
+    lexical, datatype = _literal_parts(value)
+    return f'"{_escape(lexical)}"' + (f'^^<{datatype}>' if datatype else '')
+
+
+def stream_ntriples(resources):
+    for subject, rdf_class, properties in resources:
+        lines = [f'<{subject}> <{RDF_TYPE}> <{rdf_class}> .']
+        lines.extend(f'<{subject}> <{predicate}> {_nt_term(value)} .' for predicate, value in properties)
+        yield '\n'.join(lines) + '\n'
+
+
+def _prefixes():
+    return {'crm': CRM, 'rdfs': RDFS, 'xsd': XSD, 'hg': vocab_iri('')}
+
+
+def _compact(iri, prefixes):
+    for prefix, namespace in prefixes.items():
+        local = iri[len(namespace):]
+        if iri.startswith(namespace) and local and all(c.isalnum() or c in '_-' for c in local):
+            return f'{prefix}:{local}'
+    return f'<{iri}>'
+
+
+def _ttl_term(value, prefixes):
+    if isinstance(value, IRI):
+        return f'<{value}>'
+    lexical, datatype = _literal_parts(value)
+    return f'"{_escape(lexical)}"' + (f'^^{_compact(datatype, prefixes)}' if datatype else '')
+
+
+def stream_turtle(resources):
+    prefixes = _prefixes()
+    yield ''.join(f'@prefix {prefix}: <{namespace}> .\n' for prefix, namespace in prefixes.items()) + '\n'
+    for subject, rdf_class, properties in resources:
+        statements = [f'a {_compact(rdf_class, prefixes)}']
+        statements.extend(
+            f'{_compact(predicate, prefixes)} {_ttl_term(value, prefixes)}' for predicate, value in properties
+        )
+        yield f'<{subject}> ' + ' ;\n    '.join(statements) + ' .\n\n'
+
+
+def _jsonld_value(value):
+    if isinstance(value, IRI):
+        return {'@id': value}
+    lexical, datatype = _literal_parts(value)
+    if datatype is None:
+        return value
+    return {'@value': lexical, '@type': datatype}
+
+
+def stream_jsonld(resources):
+    prefixes = _prefixes()
+    yield '{"@context": ' + json.dumps(prefixes) + ', "@graph": [\n'
+    separator = ''
+    for subject, rdf_class, properties in resources:
+        node = {'@id': subject, '@type': _compact(rdf_class, prefixes)}
+        for predicate, value in properties:
+            node.setdefault(_compact(predicate, prefixes).strip('<>'), []).append(_jsonld_value(value))
+        yield separator + json.dumps(node, ensure_ascii=False)
+        separator = ',\n'
+    yield '\n]}\n'
+
+
+def stream_linked_data(export_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return a generator of text chunks for the requested format"""
+    resources = iter_resources(chunk_size=chunk_size)
+    if export_format == 'nt':
+        return stream_ntriples(resources)
+    if export_format == 'ttl':
+        return stream_turtle(resources)
+    if export_format == 'jsonld':
+        return stream_jsonld(resources)
+    raise ValueError(f'Unsupported export format: {export_format}')
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.cidoc_data.chains import MAX_CHAIN_DEPTH
+from apps.cidoc_data.models import Activity
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill in (or repair) the cached chain_root of every activity by "
+        "walking each chain down from its root"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of activities updated per query",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        table = connection.ops.quote_name(Activity._meta.db_table)
+        # Only previous_activity is trusted here, so stale cached roots are fixed too
+        rows = Activity.objects.raw(
+            f"""
+            WITH RECURSIVE down (chain_root, activity_id, depth) AS (
+                SELECT a.activity_id, a.activity_id, 0 FROM {table} a
+                WHERE a.previous_activity IS NULL OR NOT EXISTS (
+                    SELECT 1 FROM {table} p WHERE p.activity_id = a.previous_activity
+                )
+                UNION ALL
+                SELECT down.chain_root, a.activity_id, down.depth + 1
+                FROM down JOIN {table} a ON a.previous_activity = down.activity_id
+                WHERE a.activity_id <> down.activity_id AND down.depth < %s
+            )
+            SELECT down.activity_id, down.chain_root AS root FROM down
+            JOIN {table} a ON a.activity_id = down.activity_id
+            WHERE a.chain_root IS NULL OR a.chain_root <> down.chain_root
+            ORDER BY down.chain_root
+            """,
+            [MAX_CHAIN_DEPTH],
+        )
+        by_root = {}
+        for row in rows:
+            by_root.setdefault(row.root, []).append(row.activity_id)
+
+        updated = 0
+        for root, activity_ids in by_root.items():
+            for start in range(0, len(activity_ids), batch_size):
+                with transaction.atomic():
+                    updated += Activity.objects.filter(
+                        pk__in=activity_ids[start:start + batch_size]
+                    ).update(chain_root=root)
+        self.stdout.write(
+            self.style.SUCCESS(f"{updated} activities updated across {len(by_root)} chains")
+        )
+
+
+# Usage:
+# python manage.py backfill_activity_chain_roots
+# python manage.py backfill_activity_chain_roots --batch-size 5000
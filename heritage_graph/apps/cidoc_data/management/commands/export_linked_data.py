@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from apps.cidoc_data.linked_data import (
+    DEFAULT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    stream_linked_data,
+)
+
+
+class Command(BaseCommand):
+    help = "Stream the CIDOC dataset as N-Triples, Turtle or JSON-LD mapped to CIDOC-CRM"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=EXPORT_FORMATS, default="ttl", help="Output format"
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write to (default: '-' for stdout)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Rows fetched per database round trip",
+        )
+
+    def handle(self, *args, **options):
+        chunks = stream_linked_data(options["format"], chunk_size=options["chunk_size"])
+        output = options["output"]
+        if output == "-":
+            self.write_chunks(chunks, sys.stdout.buffer)
+        else:
+            with open(output, "wb") as stream:
+                self.write_chunks(chunks, stream)
+            self.stderr.write(self.style.SUCCESS(f"Exported linked data to {output}"))
+
+    def write_chunks(self, chunks, stream):
+        for chunk in chunks:
+            stream.write(chunk.encode("utf-8"))
+        stream.flush()
+
+
+# Usage:
+# python manage.py export_linked_data --format ttl --output cidoc.ttl
+# python manage.py export_linked_data --format jsonld --chunk-size 5000 > cidoc.jsonld
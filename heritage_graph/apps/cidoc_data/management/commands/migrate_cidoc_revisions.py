@@ -0,0 +1,98 @@
+from itertools import groupby
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.cidoc_data.fanout import FOLLOWED_MODELS
+from apps.cidoc_data.models import ObjectRevision
+from apps.cidoc_data.revisions import build_revision, legacy_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the unified revision store from the per-model revision "
+        "tables, storing diffs between snapshots and periodic keyframes. "
+        "The per-model rows keep their metadata; their snapshots are cleared"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of records whose history is rebuilt per transaction",
+        )
+        parser.add_argument(
+            "--type",
+            choices=list(FOLLOWED_MODELS),
+            help="Only migrate revisions of this record type",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        types = [options["type"]] if options["type"] else list(FOLLOWED_MODELS)
+        for object_type in types:
+            model, revision_model = FOLLOWED_MODELS[object_type][:2]
+            content_type = ContentType.objects.get_for_model(model)
+            object_ids = list(
+                revision_model.objects.order_by("uid_id").values_list("uid_id", flat=True).distinct()
+            )
+            migrated = 0
+            for start in range(0, len(object_ids), batch_size):
+                migrated += self.migrate_batch(
+                    model, content_type, revision_model, object_ids[start:start + batch_size]
+                )
+            self.stdout.write(
+                f"{object_type}: {migrated} revisions of {len(object_ids)} records migrated"
+            )
+        self.stdout.write(self.style.SUCCESS("Revision store rebuilt"))
+
+    def migrate_batch(self, model, content_type, revision_model, object_ids):
+        with transaction.atomic():
+            # record_revision() locks the record before appending, so holding
+            # these locks keeps newly mirrored revisions out until this batch
+            # commits; once it does, they are appended after the rebuilt ones
+            list(model.objects.select_for_update().filter(pk__in=object_ids).values_list("pk", flat=True))
+            legacy_rows = list(
+                revision_model.objects.select_for_update().filter(uid_id__in=object_ids)
+                .order_by("uid_id", "timestamp", "revision_id")
+                .only("revision_id", "uid_id", "stored_snapshot", "user_id", "timestamp", "action")
+            )
+            # Rows mirrored earlier have had their snapshot cleared; read it
+            # back from the store before that history is replaced
+            legacy_snapshots(legacy_rows)
+            # Never delete store rows the rebuild would not write back: records
+            # revised after the read above are left for the next run
+            read = [row.revision_id for row in legacy_rows]
+            changed = set(
+                ObjectRevision.objects.filter(content_type=content_type, object_id__in=object_ids)
+                .exclude(legacy_revision_id__in=read).values_list("object_id", flat=True)
+            )
+            if changed:
+                self.stderr.write(
+                    f"{content_type.model}: {len(changed)} records were revised during "
+                    "the migration; run the command again to migrate them"
+                )
+                object_ids = [object_id for object_id in object_ids if object_id not in changed]
+                legacy_rows = [row for row in legacy_rows if row.uid_id not in changed]
+
+            revisions = []
+            for object_id, history in groupby(legacy_rows, key=lambda row: row.uid_id):
+                state = None
+                for seq, row in enumerate(history, start=1):
+                    revisions.append(build_revision(
+                        seq, state, row.stored_snapshot,
+                        content_type=content_type, object_id=object_id, user_id=row.user_id,
+                        timestamp=row.timestamp, action=row.action, legacy_revision_id=row.revision_id,
+                    ))
+                    state = row.stored_snapshot
+            ObjectRevision.objects.filter(content_type=content_type, object_id__in=object_ids).delete()
+            ObjectRevision.objects.bulk_create(revisions, batch_size=1000)
+            revision_model.objects.filter(uid_id__in=object_ids).update(stored_snapshot=None)
+        return len(revisions)
+
+
+# Usage:
+# python manage.py migrate_cidoc_revisions
+# python manage.py migrate_cidoc_revisions --type artifact --batch-size 200
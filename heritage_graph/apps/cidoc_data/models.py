@@ -1,5 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+
+from apps.heritage_data.unread import UnreadCounters
 
 # Choice constants
 ARTIFACT_CONDITION_CHOICES = [
@@ -256,11 +260,30 @@ class Source(models.Model):
 
 
 # Revision tables
-class HistoricalPeriodRevision(models.Model):
+class MirroredSnapshot:
+    """
+    ``snapshot`` of a per-model revision row. The row's own copy
+    (``stored_snapshot``) is cleared once the revision is mirrored into
+    ObjectRevision; reading ``snapshot`` then rebuilds it from there.
+    """
+
+    @property
+    def snapshot(self):
+        if self.stored_snapshot is None and self.pk is not None:
+            from .revisions import legacy_snapshots
+            legacy_snapshots([self])
+        return self.stored_snapshot
+
+    @snapshot.setter
+    def snapshot(self, value):
+        self.stored_snapshot = value
+
+
+class HistoricalPeriodRevision(MirroredSnapshot, models.Model):
     revision_id = models.AutoField(primary_key=True)
     uid = models.ForeignKey(HistoricalPeriod, on_delete=models.CASCADE, help_text="Original HistoricalPeriod record")
     prev_uid = models.IntegerField(null=True, blank=True, help_text="ID of the previous revision record")
-    snapshot = models.JSONField(help_text="JSON representation of the HistoricalPeriod record at this revision")
+    stored_snapshot = models.JSONField(db_column="snapshot", null=True, blank=True, help_text="JSON representation of the HistoricalPeriod record at this revision; cleared once mirrored into ObjectRevision")
     user = models.ForeignKey(User, on_delete=models.CASCADE, help_text="User who made the change")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When this revision was created")
     action = models.CharField(max_length=20, choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')])
@@ -269,11 +292,11 @@ class HistoricalPeriodRevision(models.Model):
         return f"Revision {self.revision_id} for HistoricalPeriod {self.uid.id}"
 
 
-class LocationRevision(models.Model):
+class LocationRevision(MirroredSnapshot, models.Model):
     revision_id = models.AutoField(primary_key=True)
     uid = models.ForeignKey(Location, on_delete=models.CASCADE, help_text="Original Location record")
     prev_uid = models.IntegerField(null=True, blank=True, help_text="ID of the previous revision record")
-    snapshot = models.JSONField(help_text="JSON representation of the Location record at this revision")
+    stored_snapshot = models.JSONField(db_column="snapshot", null=True, blank=True, help_text="JSON representation of the Location record at this revision; cleared once mirrored into ObjectRevision")
     user = models.ForeignKey(User, on_delete=models.CASCADE, help_text="User who made the change")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When this revision was created")
     action = models.CharField(max_length=20, choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')])
@@ -282,11 +305,11 @@ class LocationRevision(models.Model):
         return f"Revision {self.revision_id} for Location {self.uid.id}"
 
 
-class PersonRevision(models.Model):
+class PersonRevision(MirroredSnapshot, models.Model):
     revision_id = models.AutoField(primary_key=True)
     uid = models.ForeignKey(Person, on_delete=models.CASCADE, help_text="Original Person record")
     prev_uid = models.IntegerField(null=True, blank=True, help_text="ID of the previous revision record")
-    snapshot = models.JSONField(help_text="JSON representation of the Person record at this revision")
+    stored_snapshot = models.JSONField(db_column="snapshot", null=True, blank=True, help_text="JSON representation of the Person record at this revision; cleared once mirrored into ObjectRevision")
     user = models.ForeignKey(User, on_delete=models.CASCADE, help_text="User who made the change")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When this revision was created")
     action = models.CharField(max_length=20, choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')])
@@ -295,11 +318,11 @@ class PersonRevision(models.Model):
         return f"Revision {self.revision_id} for Person {self.uid.id}"
 
 
-class ArtifactRevision(models.Model):
+class ArtifactRevision(MirroredSnapshot, models.Model):
     revision_id = models.AutoField(primary_key=True)
     uid = models.ForeignKey(Artifact, on_delete=models.CASCADE, help_text="Original Artifact record")
     prev_uid = models.IntegerField(null=True, blank=True, help_text="ID of the previous revision record")
-    snapshot = models.JSONField(help_text="JSON representation of the Artifact record at this revision")
+    stored_snapshot = models.JSONField(db_column="snapshot", null=True, blank=True, help_text="JSON representation of the Artifact record at this revision; cleared once mirrored into ObjectRevision")
     user = models.ForeignKey(User, on_delete=models.CASCADE, help_text="User who made the change")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When this revision was created")
     action = models.CharField(max_length=20, choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')])
@@ -308,11 +331,11 @@ class ArtifactRevision(models.Model):
         return f"Revision {self.revision_id} for Artifact {self.uid.id}"
 
 
-class EventRevision(models.Model):
+class EventRevision(MirroredSnapshot, models.Model):
     revision_id = models.AutoField(primary_key=True)
     uid = models.ForeignKey(Event, on_delete=models.CASCADE, help_text="Original Event record")
     prev_uid = models.IntegerField(null=True, blank=True, help_text="ID of the previous revision record")
-    snapshot = models.JSONField(help_text="JSON representation of the Event record at this revision")
+    stored_snapshot = models.JSONField(db_column="snapshot", null=True, blank=True, help_text="JSON representation of the Event record at this revision; cleared once mirrored into ObjectRevision")
     user = models.ForeignKey(User, on_delete=models.CASCADE, help_text="User who made the change")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When this revision was created")
     action = models.CharField(max_length=20, choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')])
@@ -321,11 +344,11 @@ class EventRevision(models.Model):
         return f"Revision {self.revision_id} for Event {self.uid.id}"
 
 
-class TraditionRevision(models.Model):
+class TraditionRevision(MirroredSnapshot, models.Model):
     revision_id = models.AutoField(primary_key=True)
     uid = models.ForeignKey(Tradition, on_delete=models.CASCADE, help_text="Original Tradition record")
     prev_uid = models.IntegerField(null=True, blank=True, help_text="ID of the previous revision record")
-    snapshot = models.JSONField(help_text="JSON representation of the Tradition record at this revision")
+    stored_snapshot = models.JSONField(db_column="snapshot", null=True, blank=True, help_text="JSON representation of the Tradition record at this revision; cleared once mirrored into ObjectRevision")
     user = models.ForeignKey(User, on_delete=models.CASCADE, help_text="User who made the change")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When this revision was created")
     action = models.CharField(max_length=20, choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')])
@@ -334,11 +357,11 @@ class TraditionRevision(models.Model):
         return f"Revision {self.revision_id} for Tradition {self.uid.id}"
 
 
-class SourceRevision(models.Model):
+class SourceRevision(MirroredSnapshot, models.Model):
     revision_id = models.AutoField(primary_key=True)
     uid = models.ForeignKey(Source, on_delete=models.CASCADE, help_text="Original Source record")
     prev_uid = models.IntegerField(null=True, blank=True, help_text="ID of the previous revision record")
-    snapshot = models.JSONField(help_text="JSON representation of the Source record at this revision")
+    stored_snapshot = models.JSONField(db_column="snapshot", null=True, blank=True, help_text="JSON representation of the Source record at this revision; cleared once mirrored into ObjectRevision")
     user = models.ForeignKey(User, on_delete=models.CASCADE, help_text="User who made the change")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When this revision was created")
     action = models.CharField(max_length=20, choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')])
@@ -347,6 +370,35 @@ class SourceRevision(models.Model):
         return f"Revision {self.revision_id} for Source {self.uid.id}"
 
 
+# Unified revision store: one row per change to any record, keyed by (content type, object id, seq)
+class ObjectRevision(MirroredSnapshot, models.Model):
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, help_text="Model of the revised record")
+    object_id = models.IntegerField(help_text="ID of the revised record")
+    seq = models.PositiveIntegerField(help_text="Position of this revision in the record's history, starting at 1")
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, help_text="User who made the change")
+    timestamp = models.DateTimeField(default=timezone.now, help_text="When this revision was created")
+    action = models.CharField(max_length=20, choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')])
+    snapshot = models.JSONField(null=True, blank=True, help_text="Full state, stored on keyframes only")
+    diff = models.JSONField(null=True, blank=True, help_text="JSON Patch from the previous revision's state")
+    legacy_revision_id = models.IntegerField(null=True, blank=True, help_text="revision_id in the per-model revision table this row mirrors")
+
+    class Meta:
+        db_table = 'cidoc_revisions'
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id', 'seq'], name='cidoc_revision_seq_unique'),
+        ]
+        indexes = [
+            # Covers history listings without reading the JSON columns
+            models.Index(fields=['content_type', 'object_id', 'seq', 'timestamp', 'action', 'user', 'legacy_revision_id'], name='cidoc_revision_history_idx'),
+            models.Index(fields=['content_type', 'object_id', 'timestamp'], name='cidoc_revision_time_idx'),
+            models.Index(fields=['content_type', 'legacy_revision_id'], name='cidoc_revision_legacy_idx'),
+        ]
+        ordering = ['content_type', 'object_id', 'seq']
+
+    def __str__(self):
+        return f"Revision {self.seq} of {self.content_type_id}:{self.object_id}"
+
+
 # Activity class
 class Activity(models.Model):
     activity_id = models.AutoField(primary_key=True)
@@ -356,6 +408,14 @@ class Activity(models.Model):
     previous_activity = models.IntegerField(null=True, blank=True, help_text="ID of the previous activity in the chain")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the activity was performed")
     details = models.JSONField(help_text="Additional details about the activity")
+    chain_root = models.IntegerField(null=True, blank=True, help_text="Cached ID of the first activity in this activity's chain")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['previous_activity'], name='activity_previous_idx'),
+            models.Index(fields=['post_uid'], name='activity_post_idx'),
+            models.Index(fields=['chain_root'], name='activity_chain_root_idx'),
+        ]
 
     def __str__(self):
         return f"Activity {self.activity_id} by User {self.user.id}"
@@ -371,6 +431,9 @@ class HistoricalPeriodComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='period_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on HistoricalPeriod {self.uid.id}"
 
@@ -384,6 +447,9 @@ class LocationComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='location_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on Location {self.uid.id}"
 
@@ -397,6 +463,9 @@ class PersonComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='person_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on Person {self.uid.id}"
 
@@ -410,6 +479,9 @@ class ArtifactComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='artifact_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on Artifact {self.uid.id}"
 
@@ -423,6 +495,9 @@ class EventComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='event_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on Event {self.uid.id}"
 
@@ -436,6 +511,9 @@ class TraditionComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='tradition_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on Tradition {self.uid.id}"
 
@@ -449,6 +527,9 @@ class SourceComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='source_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on Source {self.uid.id}"
 
@@ -463,6 +544,9 @@ class HistoricalPeriodRevisionComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='period_rev_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on HistoricalPeriodRevision {self.uid.revision_id}"
 
@@ -476,6 +560,9 @@ class LocationRevisionComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='location_rev_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on LocationRevision {self.uid.revision_id}"
 
@@ -489,6 +576,9 @@ class PersonRevisionComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='person_rev_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on PersonRevision {self.uid.revision_id}"
 
@@ -502,6 +592,9 @@ class ArtifactRevisionComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='artifact_rev_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on ArtifactRevision {self.uid.revision_id}"
 
@@ -515,6 +608,9 @@ class EventRevisionComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='event_rev_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on EventRevision {self.uid.revision_id}"
 
@@ -528,6 +624,9 @@ class TraditionRevisionComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='tradition_rev_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on TraditionRevision {self.uid.revision_id}"
 
@@ -541,6 +640,9 @@ class SourceRevisionComment(models.Model):
     comment = models.TextField(help_text="The comment text")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the comment was made")
 
+    class Meta:
+        indexes = [models.Index(fields=['uid', 'previous_comment_id'], name='source_rev_cmt_thread_idx')]
+
     def __str__(self):
         return f"Comment {self.comment_id} on SourceRevision {self.uid.revision_id}"
 
@@ -568,6 +670,7 @@ class NotificationForUser(models.Model):
     related_object_type = models.CharField(max_length=50, help_text="Type of the related object (artifact, location, etc.)")
     message = models.TextField(help_text="Notification message content")
     is_read = models.BooleanField(default=False, help_text="Whether the notification has been read")
+    collapsed_count = models.PositiveIntegerField(default=1, help_text="Number of events on the same object folded into this unread notification")
     created_at = models.DateTimeField(auto_now_add=True, help_text="When the notification was created")
     activity_id = models.ForeignKey(Activity, on_delete=models.SET_NULL, null=True, blank=True, help_text="Associated activity that triggered the notification")
     sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sent_notifications', help_text="User who triggered the notification")
@@ -578,4 +681,23 @@ class NotificationForUser(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name = "User Notification"
-        verbose_name_plural = "User Notifications"
\ No newline at end of file
+        verbose_name_plural = "User Notifications"
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['user', 'is_read', '-created_at']),
+        ]
+
+
+# Unread notification counter per user
+class UnreadNotificationCount(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='unread_notification_count', help_text="User the counter belongs to")
+    unread = models.IntegerField(default=0, help_text="Number of unread notifications, kept in step with NotificationForUser")
+
+    def __str__(self):
+        return f"{self.unread} unread for User {self.user_id}"
+
+
+unread_counters = UnreadCounters(UnreadNotificationCount, NotificationForUser)
+adjust_unread_counts = unread_counters.adjust
+get_unread_count = unread_counters.get
+mark_notifications_read = unread_counters.mark_read
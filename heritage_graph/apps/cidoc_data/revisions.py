@@ -0,0 +1,156 @@
+"""
+Reads and writes for the unified revision store (ObjectRevision).
+
+Every change to a CIDOC record becomes one row keyed by (content type,
+object id, seq). Only every KEYFRAME_INTERVAL-th revision keeps a full
+snapshot; the others store a JSON Patch against the previous state, so a
+state is rebuilt from the nearest keyframe with at most
+KEYFRAME_INTERVAL - 1 patches, all read in one query.
+
+The per-model *Revision tables are still where the API writes revisions
+(revision comments point at them); each new row there is mirrored here by a
+signal, and the migrate_cidoc_revisions command moves existing history in.
+Once mirrored, a per-model row keeps only its metadata: its
+``stored_snapshot`` column is cleared and its ``snapshot`` property
+rebuilds the state from here with legacy_snapshots().
+"""
+
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q
+
+from apps.heritage_data.diffs import apply_diff, diff_documents
+
+from .models import ObjectRevision
+
+KEYFRAME_INTERVAL = 20
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+HISTORY_FIELDS = ['seq', 'timestamp', 'action', 'user_id', 'legacy_revision_id']
+
+
+def is_keyframe(seq):
+    return (seq - 1) % KEYFRAME_INTERVAL == 0
+
+
+def _revisions(model, object_id):
+    return ObjectRevision.objects.filter(
+        content_type=ContentType.objects.get_for_model(model), object_id=object_id
+    )
+
+
+def _replay(rows):
+    """State after the last of ``rows`` (ordered by seq, starting at a keyframe)"""
+    state = None
+    for snapshot, diff in rows:
+        state = snapshot if snapshot is not None else apply_diff(state, diff or [])
+    return state
+
+
+def _state_through(revisions, seq):
+    keyframe = (
+        revisions.filter(seq__lte=seq, snapshot__isnull=False)
+        .order_by('-seq').values_list('seq', flat=True)[:1]
+    )
+    rows = revisions.filter(seq__gte=keyframe, seq__lte=seq).order_by('seq').values_list('snapshot', 'diff')
+    return _replay(rows)
+
+
+def build_revision(seq, previous_state, snapshot, **fields):
+    """An unsaved ObjectRevision holding a keyframe or a diff as ``seq`` requires"""
+    keyframe = previous_state is None or is_keyframe(seq)
+    return ObjectRevision(
+        seq=seq,
+        snapshot=snapshot if keyframe else None,
+        diff=diff_documents(previous_state, snapshot) if previous_state is not None else None,
+        **fields,
+    )
+
+
+def record_revision(model, object_id, snapshot, user_id=None, action='update', **fields):
+    """
+    Append a revision to the record's history. The record's row is locked
+    while the next seq is taken, so concurrent writers queue up.
+    """
+    with transaction.atomic():
+        model.objects.select_for_update().filter(pk=object_id).exists()
+        revisions = _revisions(model, object_id)
+        last_seq = revisions.order_by('-seq').values_list('seq', flat=True).first() or 0
+        previous_state = _state_through(revisions, last_seq) if last_seq else None
+        revision = build_revision(
+            last_seq + 1, previous_state, snapshot,
+            content_type=ContentType.objects.get_for_model(model), object_id=object_id,
+            user_id=user_id, action=action, **fields,
+        )
+        revision.save()
+    return revision
+
+
+def legacy_snapshots(revisions):
+    """
+    Fill in ``stored_snapshot`` on per-model revision rows whose copy was
+    cleared once mirrored, rebuilt from the store with one query for the
+    whole batch
+    """
+    cleared = defaultdict(list)
+    for revision in revisions:
+        if revision.stored_snapshot is None:
+            cleared[type(revision).uid.field.related_model, revision.uid_id].append(revision)
+    if not cleared:
+        return
+    ranges = Q()
+    for (model, object_id), rows in cleared.items():
+        history = _revisions(model, object_id)
+        wanted = history.filter(legacy_revision_id__in=[row.revision_id for row in rows])
+        first = wanted.order_by('seq').values('seq')[:1]
+        last = wanted.order_by('-seq').values('seq')[:1]
+        keyframe = history.filter(seq__lte=first, snapshot__isnull=False).order_by('-seq').values('seq')[:1]
+        ranges |= Q(
+            content_type=ContentType.objects.get_for_model(model), object_id=object_id,
+            seq__gte=keyframe, seq__lte=last,
+        )
+    rows = (
+        ObjectRevision.objects.filter(ranges)
+        .order_by('content_type', 'object_id', 'seq')
+        .values_list('content_type_id', 'object_id', 'snapshot', 'diff', 'legacy_revision_id')
+    )
+    states, current, state = {}, None, None
+    for content_type_id, object_id, snapshot, diff, legacy_revision_id in rows:
+        if (content_type_id, object_id) != current:
+            current, state = (content_type_id, object_id), None
+        state = snapshot if snapshot is not None else apply_diff(state, diff or [])
+        if legacy_revision_id is not None:
+            states[content_type_id, legacy_revision_id] = state
+    for (model, _), rows in cleared.items():
+        content_type_id = ContentType.objects.get_for_model(model).pk
+        for row in rows:
+            row.stored_snapshot = states.get((content_type_id, row.revision_id))
+
+
+def object_history(model, object_id, before_seq=None, page_size=DEFAULT_PAGE_SIZE):
+    """Newest-first revision metadata, read from the covering index only"""
+    revisions = _revisions(model, object_id)
+    if before_seq is not None:
+        revisions = revisions.filter(seq__lt=before_seq)
+    return list(revisions.order_by('-seq').values(*HISTORY_FIELDS)[:page_size])
+
+
+def state_at(model, object_id, seq=None, at=None):
+    """
+    The record's state after revision ``seq``, or as of time ``at``, or
+    now. Returns ``(seq, state)``; both are None if there is no such
+    revision.
+    """
+    revisions = _revisions(model, object_id)
+    if seq is None:
+        latest = revisions.order_by('-seq')
+        if at is not None:
+            latest = latest.filter(timestamp__lte=at)
+        seq = latest.values_list('seq', flat=True).first()
+    elif not revisions.filter(seq=seq).exists():
+        seq = None
+    if seq is None:
+        return None, None
+    return seq, _state_through(revisions, seq)
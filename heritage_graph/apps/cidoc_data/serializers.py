@@ -1,6 +1,8 @@
 from rest_framework import serializers
+from django.db import models
 from django.contrib.auth.models import User
 from .models import *
+from .revisions import legacy_snapshots
 
 # --- User Serializer ---
 class UserSerializer(serializers.ModelSerializer):
@@ -45,40 +47,47 @@ class SourceSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 # --- Revision serializers ---
-class HistoricalPeriodRevisionSerializer(serializers.ModelSerializer):
+class LegacyRevisionListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        data = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        legacy_snapshots(data)
+        return super().to_representation(data)
+
+class LegacyRevisionSerializer(serializers.ModelSerializer):
+    """Per-model revision row; once mirrored its snapshot is read back from the revision store"""
+    snapshot = serializers.JSONField()
+
     class Meta:
+        list_serializer_class = LegacyRevisionListSerializer
+        exclude = ['stored_snapshot']
+
+class HistoricalPeriodRevisionSerializer(LegacyRevisionSerializer):
+    class Meta(LegacyRevisionSerializer.Meta):
         model = HistoricalPeriodRevision
-        fields = '__all__'
 
-class LocationRevisionSerializer(serializers.ModelSerializer):
-    class Meta:
+class LocationRevisionSerializer(LegacyRevisionSerializer):
+    class Meta(LegacyRevisionSerializer.Meta):
         model = LocationRevision
-        fields = '__all__'
 
-class PersonRevisionSerializer(serializers.ModelSerializer):
-    class Meta:
+class PersonRevisionSerializer(LegacyRevisionSerializer):
+    class Meta(LegacyRevisionSerializer.Meta):
         model = PersonRevision
-        fields = '__all__'
 
-class ArtifactRevisionSerializer(serializers.ModelSerializer):
-    class Meta:
+class ArtifactRevisionSerializer(LegacyRevisionSerializer):
+    class Meta(LegacyRevisionSerializer.Meta):
         model = ArtifactRevision
-        fields = '__all__'
 
-class EventRevisionSerializer(serializers.ModelSerializer):
-    class Meta:
+class EventRevisionSerializer(LegacyRevisionSerializer):
+    class Meta(LegacyRevisionSerializer.Meta):
         model = EventRevision
-        fields = '__all__'
 
-class TraditionRevisionSerializer(serializers.ModelSerializer):
-    class Meta:
+class TraditionRevisionSerializer(LegacyRevisionSerializer):
+    class Meta(LegacyRevisionSerializer.Meta):
         model = TraditionRevision
-        fields = '__all__'
 
-class SourceRevisionSerializer(serializers.ModelSerializer):
-    class Meta:
+class SourceRevisionSerializer(LegacyRevisionSerializer):
+    class Meta(LegacyRevisionSerializer.Meta):
         model = SourceRevision
-        fields = '__all__'
 
 # --- Comment serializers ---
 class ActivitySerializer(serializers.ModelSerializer):
@@ -114,3 +123,6 @@ class NotificationForUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = NotificationForUser
         fields = '__all__'
+
+class MarkNotificationsReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500)
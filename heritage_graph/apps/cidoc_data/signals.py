@@ -0,0 +1,162 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.heritage_data.models import publish_events
+from apps.heritage_data.push import publish_on_commit, user_channel
+
+from .fanout import FOLLOWED_MODELS, fan_out_event, notification_push_event
+from .graph import NODE_TYPES, RELATIONS
+from .graphindex import apply_change
+from .chains import chain_root_for
+from .models import Activity, NotificationForUser, adjust_unread_counts
+from .revisions import record_revision
+
+
+@receiver(pre_save, sender=NotificationForUser)
+def remember_read_state(sender, instance, update_fields=None, **kwargs):
+    instance._was_read = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and 'is_read' not in update_fields:
+        return
+    instance._was_read = (
+        NotificationForUser.objects.filter(pk=instance.pk)
+        .values_list('is_read', flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=NotificationForUser)
+def update_unread_count(sender, instance, created, **kwargs):
+    if created:
+        if not instance.is_read:
+            adjust_unread_counts({instance.user_id: 1})
+        return
+    was_read = getattr(instance, '_was_read', None)
+    if was_read is not None and was_read != instance.is_read:
+        adjust_unread_counts({instance.user_id: -1 if instance.is_read else 1})
+
+
+@receiver(post_save, sender=NotificationForUser)
+def push_notification(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit(user_channel(instance.user_id), notification_push_event(instance))
+
+
+@receiver(post_delete, sender=NotificationForUser)
+def release_unread_count(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread_counts({instance.user_id: -1})
+
+
+def queue_fan_out(sender, instance, created, **kwargs):
+    if not created:
+        return
+    object_type, kind = FAN_OUT_SENDERS[sender]
+    if sender in REVISION_COMMENT_MODELS:
+        object_id = instance.uid.uid_id
+    else:
+        object_id = instance.uid_id
+    activity_id = getattr(instance, 'activity_id_id', None)
+    publish_events([fan_out_event(object_type, object_id, kind, instance.user_id, activity_id)])
+
+
+FAN_OUT_SENDERS = {}
+REVISION_COMMENT_MODELS = set()
+for object_type, (_, revision_model, comment_model, revision_comment_model) in FOLLOWED_MODELS.items():
+    FAN_OUT_SENDERS[revision_model] = (object_type, 'revision')
+    FAN_OUT_SENDERS[comment_model] = (object_type, 'comment')
+    FAN_OUT_SENDERS[revision_comment_model] = (object_type, 'comment')
+    REVISION_COMMENT_MODELS.add(revision_comment_model)
+for model in FAN_OUT_SENDERS:
+    post_save.connect(queue_fan_out, sender=model, dispatch_uid=f'cidoc_fan_out_{model.__name__}')
+
+
+# Cache each activity's chain root (chains.py) as it is created
+@receiver(pre_save, sender=Activity)
+def set_chain_root(sender, instance, **kwargs):
+    if instance._state.adding and instance.chain_root is None:
+        instance.chain_root = chain_root_for(instance)
+
+
+@receiver(post_save, sender=Activity)
+def root_new_chain(sender, instance, created, **kwargs):
+    if created and instance.chain_root is None:
+        instance.chain_root = instance.pk
+        Activity.objects.filter(pk=instance.pk).update(chain_root=instance.pk)
+
+
+# Mirror revisions written to the per-model tables into the unified store (revisions.py)
+def mirror_revision(sender, instance, created, **kwargs):
+    if not created:
+        return
+    record_revision(
+        REVISED_MODELS[sender], instance.uid_id, instance.snapshot,
+        user_id=instance.user_id, action=instance.action,
+        timestamp=instance.timestamp, legacy_revision_id=instance.revision_id,
+    )
+    # The store now holds the state; the per-model row keeps its metadata only
+    sender.objects.filter(pk=instance.pk).update(stored_snapshot=None)
+
+
+REVISED_MODELS = {revision_model: model for model, revision_model, _, _ in FOLLOWED_MODELS.values()}
+for revision_model in REVISED_MODELS:
+    post_save.connect(mirror_revision, sender=revision_model, dispatch_uid=f'cidoc_revision_store_{revision_model.__name__}')
+
+
+# Keep the in-memory graph index (graphindex.py) in step after each commit
+def sync_graph_node(sender, instance, created, update_fields=None, **kwargs):
+    relations = FK_RELATIONS.get(sender, [])
+    if not created and update_fields is not None and not {r.target_column for r in relations} & set(update_fields):
+        return
+    node = (NODE_TYPES[sender], instance.pk)
+    targets = [(relation, getattr(instance, relation.target_column)) for relation in relations]
+
+    def change(index):
+        index.add_node(node)
+        for relation, target_pk in targets:
+            for old_pk in index.edges_of(node, relation) - {target_pk}:
+                index.remove_edge(relation, instance.pk, old_pk)
+            if target_pk is not None:
+                index.add_edge(relation, instance.pk, target_pk)
+
+    transaction.on_commit(lambda: apply_change(change))
+
+
+def drop_graph_node(sender, instance, **kwargs):
+    node = (NODE_TYPES[sender], instance.pk)
+    transaction.on_commit(lambda: apply_change(lambda index: index.remove_node(node)))
+
+
+def sync_graph_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    relation = M2M_RELATIONS[sender]
+    node = (relation.target if reverse else relation.source, instance.pk)
+    pks = set(pk_set or ())
+
+    def change(index):
+        others = index.edges_of(node, relation, 'in' if reverse else 'out') if action == 'post_clear' else pks
+        for other in others:
+            source_pk, target_pk = (other, instance.pk) if reverse else (instance.pk, other)
+            if action == 'post_add':
+                index.add_edge(relation, source_pk, target_pk)
+            else:
+                index.remove_edge(relation, source_pk, target_pk)
+
+    transaction.on_commit(lambda: apply_change(change))
+
+
+FK_RELATIONS = {}
+M2M_RELATIONS = {}
+for relation in RELATIONS:
+    if relation.source_column == 'pk':
+        FK_RELATIONS.setdefault(relation.table, []).append(relation)
+    else:
+        M2M_RELATIONS[relation.table] = relation
+for model in NODE_TYPES:
+    post_save.connect(sync_graph_node, sender=model, dispatch_uid=f'cidoc_graph_save_{model.__name__}')
+    post_delete.connect(drop_graph_node, sender=model, dispatch_uid=f'cidoc_graph_delete_{model.__name__}')
+for through in M2M_RELATIONS:
+    m2m_changed.connect(sync_graph_m2m, sender=through, dispatch_uid=f'cidoc_graph_m2m_{through.__name__}')
@@ -1,3 +1,476 @@
+import json
+import re
+from io import StringIO
+from itertools import count
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, models
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import (
+    Activity, Artifact, ArtifactComment, ArtifactRevision, Event, HistoricalPeriod, NotificationForUser, ObjectRevision,
+    Person, Source, Tradition,
+)
+from . import graphindex
+from .graph import RELATIONS, expand, shortest_paths
+from .graphindex import GraphIndex, rebuild_graph_index
+from apps.heritage_data.models import OutboxEvent
+from apps.heritage_data.outbox import drain_batch
+
+from .fanout import fan_out_event
+from .linked_data import CRM, RDF_TYPE, entity_iri, iter_resources, stream_jsonld, stream_ntriples, vocab_iri
+from .revisions import KEYFRAME_INTERVAL, legacy_snapshots, state_at
+from .threads import load_thread, nest
+from .urls import router
+
+_serial = count(1)
+
+
+def make(model):
+    """Save a row of ``model`` with every field filled in, related rows included"""
+    if model is User:
+        return User.objects.create(username=f'user{next(_serial)}')
+    values = {}
+    for field in model._meta.concrete_fields:
+        if field.primary_key or getattr(field, 'auto_now_add', False):
+            continue
+        if field.is_relation:
+            values[field.name] = make(field.related_model)
+        elif field.choices:
+            values[field.name] = field.choices[0][0]
+        elif isinstance(field, models.URLField):
+            values[field.name] = 'https://example.org/'
+        elif isinstance(field, (models.CharField, models.TextField)):
+            values[field.name] = f'{field.name}{next(_serial)}'[:field.max_length]
+        elif isinstance(field, models.IntegerField):
+            values[field.name] = 1
+        elif isinstance(field, models.JSONField):
+            values[field.name] = {}
+    instance = model.objects.create(**values)
+    for field in model._meta.many_to_many:
+        getattr(instance, field.name).add(make(field.related_model))
+    return instance
+
+
+def graph_relation(source, name):
+    return next(relation for relation in RELATIONS if relation.source == source and relation.name == name)
+
+
+class RouteQueryCountTests(TestCase):
+    """Listing a route costs the same number of queries however many rows it returns"""
+
+    def list_queries(self, prefix):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(f'/cidoc/{prefix}/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries), len(response.json()['results'])
+
+    def test_list_query_count_is_constant(self):
+        for prefix, viewset, _ in router.registry:
+            queryset = getattr(viewset, 'queryset', None)
+            if queryset is None:
+                continue
+            with self.subTest(route=prefix):
+                # Start below the page size so both lists render every row
+                queryset.model.objects.all().delete()
+                make(queryset.model)
+                one, rows = self.list_queries(prefix)
+                make(queryset.model)
+                make(queryset.model)
+                three, more_rows = self.list_queries(prefix)
+                self.assertGreater(more_rows, rows)
+                self.assertEqual(three, one)
+
+
+class FanOutOrderTests(TestCase):
+    """A failed fan-out event holds back later events for the same object only"""
+
+    def test_failure_blocks_the_object(self):
+        artifact, other, user = make(Artifact), make(Artifact), make(User)
+        OutboxEvent.objects.all().delete()
+        broken = fan_out_event('artifact', artifact.pk, 'comment', user.pk)
+        broken.payload['object_type'] = 'unknown'
+        broken.save()
+        held = fan_out_event('artifact', artifact.pk, 'comment', user.pk)
+        held.save()
+        unrelated = fan_out_event('artifact', other.pk, 'comment', user.pk)
+        unrelated.save()
+
+        with self.assertLogs('apps.heritage_data.outbox', 'ERROR'):
+            completed, blocked = drain_batch()
+        self.assertEqual((completed, blocked), (1, {('order', f'artifact:{artifact.pk}')}))
+        pending = OutboxEvent.objects.filter(processed_at__isnull=True).order_by('id')
+        self.assertEqual(list(pending.values_list('pk', flat=True)), [broken.pk, held.pk])
+
+        # Blocked keys are left out of the next batch altogether
+        self.assertEqual(drain_batch(blocked=blocked), (0, blocked))
+        self.assertEqual(OutboxEvent.objects.get(pk=broken.pk).attempts, 1)
+
+
+class RevisionStoreTests(TestCase):
+    """Revisions mirrored into the unified store replay to the snapshots that were written"""
+
+    def test_every_state_is_rebuilt(self):
+        artifact, user = make(Artifact), make(User)
+        snapshots = [{'name': f'name{i % 4}', 'tags': list(range(i % 5))} for i in range(2 * KEYFRAME_INTERVAL + 3)]
+        for snapshot in snapshots:
+            ArtifactRevision.objects.create(uid=artifact, snapshot=snapshot, user=user, action='update')
+
+        stored = ObjectRevision.objects.filter(object_id=artifact.pk)
+        self.assertEqual(stored.filter(snapshot__isnull=False).count(), 3)
+        for seq, snapshot in enumerate(snapshots, start=1):
+            self.assertEqual(state_at(Artifact, artifact.pk, seq=seq), (seq, snapshot))
+
+    def test_legacy_rows_keep_metadata_only(self):
+        artifact, user = make(Artifact), make(User)
+        snapshots = {
+            ArtifactRevision.objects.create(uid=artifact, snapshot=snapshot, user=user, action='update').pk: snapshot
+            for snapshot in ({'name': f'name{i}', 'tags': list(range(i % 3))} for i in range(KEYFRAME_INTERVAL + 5))
+        }
+        self.assertFalse(ArtifactRevision.objects.filter(stored_snapshot__isnull=False).exists())
+        # Plain attribute access reads through to the store
+        for revision in ArtifactRevision.objects.all():
+            self.assertEqual(revision.snapshot, snapshots[revision.pk])
+
+        # Rebuilding the store reads the cleared snapshots back and keeps them
+        call_command('migrate_cidoc_revisions', stdout=StringIO())
+        self.assertFalse(ArtifactRevision.objects.filter(stored_snapshot__isnull=False).exists())
+
+        client = APIClient()
+        for page in (1, 2, 3):
+            for result in client.get('/cidoc/artifact_revisions/', {'page': page}).json()['results']:
+                self.assertEqual(result['snapshot'], snapshots[result['revision_id']])
+        revision_id = max(snapshots)
+        detail = client.get(f'/cidoc/artifact_revisions/{revision_id}/').json()
+        self.assertEqual(detail['snapshot'], snapshots[revision_id])
+
+    def test_migration_keeps_a_revision_saved_meanwhile(self):
+        artifact, user = make(Artifact), make(User)
+        ArtifactRevision.objects.create(uid=artifact, snapshot={'name': 'first'}, user=user, action='create')
+
+        def save_meanwhile(rows):
+            # Another writer's revision lands after the legacy rows were read
+            ArtifactRevision.objects.create(uid=artifact, snapshot={'name': 'second'}, user=user, action='update')
+            return legacy_snapshots(rows)
+
+        command = 'apps.cidoc_data.management.commands.migrate_cidoc_revisions'
+        stderr = StringIO()
+        with mock.patch(f'{command}.legacy_snapshots', side_effect=save_meanwhile):
+            call_command('migrate_cidoc_revisions', type='artifact', stdout=StringIO(), stderr=stderr)
+        self.assertIn('run the command again', stderr.getvalue())
+        self.assertEqual(state_at(Artifact, artifact.pk), (2, {'name': 'second'}))
+
+        call_command('migrate_cidoc_revisions', type='artifact', stdout=StringIO())
+        self.assertEqual(state_at(Artifact, artifact.pk), (2, {'name': 'second'}))
+        self.assertEqual(state_at(Artifact, artifact.pk, seq=1), (1, {'name': 'first'}))
+
+
+class CommentThreadTests(TestCase):
+    """Thread reads walk the reply tree in one query"""
+
+    def test_thread_and_thread_page(self):
+        artifact, user, activity = make(Artifact), make(User), make(Activity)
+
+        def comment(previous=None):
+            return ArtifactComment.objects.create(
+                uid=artifact, user=user, activity_id=activity, previous_comment_id=previous, comment='text'
+            ).pk
+
+        root, other_root = comment(), comment()
+        reply = comment(root)
+        comment(reply)
+        client = APIClient()
+
+        with self.assertNumQueries(1):
+            response = client.get(f'/cidoc/artifact_comments/threads/?uid={artifact.pk}')
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual([(r['comment_id'], r['reply_count']) for r in response.json()['results']], [(root, 2), (other_root, 0)])
+
+        with self.assertNumQueries(1):
+            response = client.get(f'/cidoc/artifact_comments/{root}/thread/')
+        self.assertEqual(response.json()['replies'][0]['comment_id'], reply)
+        self.assertEqual(response.json()['replies'][0]['replies'][0]['depth'], 2)
+
+    def test_reply_cycle(self):
+        artifact, user, activity = make(Artifact), make(User), make(Activity)
+        first, second = (
+            ArtifactComment.objects.create(uid=artifact, user=user, activity_id=activity, comment='text').pk
+            for _ in range(2)
+        )
+        ArtifactComment.objects.filter(pk=first).update(previous_comment_id=second)
+        ArtifactComment.objects.filter(pk=second).update(previous_comment_id=first)
+
+        for root, reply in ((first, second), (second, first)):
+            response = APIClient().get(f'/cidoc/artifact_comments/{root}/thread/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([r['comment_id'] for r in response.json()['replies']], [reply])
+            self.assertEqual(response.json()['replies'][0]['replies'], [])
+        self.assertEqual([c.comment_id for c in nest(load_thread(ArtifactComment, first) * 2).replies], [second])
+
+
+class ActivityChainTests(TestCase):
+    """A whole activity chain loads in one query, with or without cached roots"""
+
+    def test_chain_from_any_member(self):
+        user = make(User)
+
+        def activity(previous=None):
+            return Activity.objects.create(
+                user=user, post_uid=1, activity_type='comment', previous_activity=previous, details={}
+            ).pk
+
+        root = activity()
+        middle = activity(root)
+        leaves = [activity(middle), activity(middle)]
+        client = APIClient()
+        for cached in (True, False):
+            if not cached:
+                Activity.objects.update(chain_root=None)
+            with self.subTest(cached=cached), self.assertNumQueries(1):
+                response = client.get(f'/cidoc/activities/{leaves[0]}/chain/')
+                self.assertEqual(response.json()['root'], root)
+                self.assertEqual([a['activity_id'] for a in response.json()['activities']], [root, middle, *leaves])
+
+
+class MarkReadTests(TestCase):
+    def test_mark_read_validates_ids(self):
+        notification = make(NotificationForUser)
+        client = APIClient()
+        client.force_authenticate(notification.user)
+        response = client.post('/cidoc/notifications/mark_read/', {'ids': [True]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = client.post('/cidoc/notifications/mark_read/', {'ids': [notification.pk]}, format='json')
+        self.assertEqual(response.json(), {'updated': 1, 'unread': 0})
+
+
+class NeighbourhoodTests(TestCase):
+    """Neighbourhood walks stop at their node and fan-out caps and say so"""
+
+    def get(self, **params):
+        response = APIClient().get('/cidoc/graph/neighbourhood/', {'type': 'historical_period', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_limits_truncate(self):
+        period = HistoricalPeriod.objects.create(name='Malla')
+        people = [Person.objects.create(name=f'person{i}', historical_period=period) for i in range(5)]
+        for person in people:
+            Artifact.objects.create(name=f'made by {person.name}', creator=person)
+
+        full = self.get(id=period.pk, depth=2)
+        self.assertFalse(full['truncated'])
+        self.assertEqual(sorted(node['depth'] for node in full['nodes']), [0] + [1] * 5 + [2] * 5)
+        self.assertEqual(len(full['edges']), 10)
+
+        one_hop = self.get(id=period.pk)
+        self.assertFalse(one_hop['truncated'])
+        self.assertEqual(len(one_hop['nodes']), 6)
+
+        for params, nodes in [({'fan_out': 2}, 3), ({'limit': 4}, 4), ({'depth': 2, 'limit': 8}, 8)]:
+            with self.subTest(**params):
+                result = self.get(id=period.pk, **params)
+                self.assertTrue(result['truncated'])
+                self.assertEqual(len(result['nodes']), nodes)
+                keys = {node['key'] for node in result['nodes']}
+                self.assertTrue(all(edge['source'] in keys and edge['target'] in keys for edge in result['edges']))
+
+
+class GraphIndexSyncTests(TestCase):
+    """Signals keep a loaded graph index equal to a fresh build"""
+
+    def setUp(self):
+        self.addCleanup(setattr, graphindex, '_index', None)
+
+    def edges(self, index):
+        return {(node, *neighbour) for node in index.nodes for neighbour in index.neighbours(node)}
+
+    def assertMatchesBuild(self, index):
+        self.assertEqual(self.edges(index), self.edges(GraphIndex.build()))
+
+    def test_writes_reach_the_index(self):
+        first, second = Person.objects.create(name='first'), Person.objects.create(name='second')
+        tradition = Tradition.objects.create(name='Lakhe')
+        artifact = Artifact.objects.create(name='Mask', creator=first)
+        index = rebuild_graph_index()
+        self.assertMatchesBuild(index)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tradition.practitioners.add(first, second)
+        self.assertEqual({node for _, _, node in index.neighbours(('tradition', tradition.pk))}, {('person', first.pk), ('person', second.pk)})
+        with self.captureOnCommitCallbacks(execute=True):
+            second.practiced_traditions.add(Tradition.objects.create(name='Dhime'))
+            artifact.traditions_used_in.add(tradition)
+        self.assertMatchesBuild(index)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tradition.practitioners.clear()
+        self.assertEqual(index.neighbours(('tradition', tradition.pk)), [('artifacts_used', 'out', ('artifact', artifact.pk))])
+        self.assertMatchesBuild(index)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            artifact.creator = second
+            artifact.save()
+        self.assertEqual(index.edges_of(('artifact', artifact.pk), graph_relation('artifact', 'creator')), {second.pk})
+        self.assertMatchesBuild(index)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(index.edges_of(('artifact', artifact.pk), graph_relation('artifact', 'creator')), set())
+        self.assertMatchesBuild(index)
+
+        self.assertGreater(index.stats()['overlay'], 0)
+        index.compact()
+        self.assertEqual(index.stats()['overlay'], 0)
+        self.assertMatchesBuild(index)
+        self.assertEqual(index.stats()['edges'], GraphIndex.build().stats()['edges'])
+
+
+class ShortestPathTests(TestCase):
+    """k shortest paths agree between the database and the in-memory index"""
+
+    def setUp(self):
+        self.addCleanup(setattr, graphindex, '_index', None)
+        # person -- artifact -- source, person -- event -- source and a
+        # longer person -- tradition -- artifact -- source
+        self.person, self.source = Person.objects.create(name='Sculptor'), Source.objects.create(title='Survey')
+        self.artifact = Artifact.objects.create(name='Statue', creator=self.person)
+        self.artifact.documentation_sources.add(self.source)
+        self.event = Event.objects.create(name='Consecration')
+        self.event.participants.add(self.person)
+        self.event.documentation_sources.add(self.source)
+        tradition = Tradition.objects.create(name='Jatra')
+        tradition.practitioners.add(self.person)
+        other = Artifact.objects.create(name='Chariot')
+        tradition.artifacts_used.add(other)
+        other.documentation_sources.add(self.source)
+        # A lone person with a single neighbour, so the start side meets the goal
+        self.lone = Person.objects.create(name='Painter')
+        self.painting = Artifact.objects.create(name='Paubha', creator=self.lone)
+        self.painting.documentation_sources.add(self.source)
+
+    def search(self, start, goal, k):
+        results = [
+            shortest_paths(start, goal, k=k, expand=search)
+            for search in (expand, GraphIndex.build().expand)
+        ]
+        self.assertEqual(*[(sorted(paths), truncated) for paths, truncated in results])
+        return results[0]
+
+    def test_paths_from_both_sides(self):
+        person, source = ('person', self.person.pk), ('source', self.source.pk)
+        via_artifact = [(('artifact', self.artifact.pk), 'creator', person), (('artifact', self.artifact.pk), 'documentation_sources', source)]
+        via_event = [(('event', self.event.pk), 'participants', person), (('event', self.event.pk), 'documentation_sources', source)]
+
+        # The goal side meets the start side, so its chains are reversed
+        paths, truncated = self.search(person, source, k=3)
+        self.assertFalse(truncated)
+        self.assertEqual(sorted(paths), sorted([via_artifact, via_event]))
+        paths, _ = self.search(person, source, k=1)
+        self.assertIn(paths, [[via_artifact], [via_event]])
+        paths, _ = self.search(source, person, k=3)
+        self.assertEqual(sorted(paths), sorted([via_artifact[::-1], via_event[::-1]]))
+
+        lone = ('person', self.lone.pk)
+        paths, _ = self.search(lone, source, k=3)
+        self.assertEqual(paths, [[(('artifact', self.painting.pk), 'creator', lone), (('artifact', self.painting.pk), 'documentation_sources', source)]])
+
+    def test_expand_caps_match_the_database(self):
+        index = GraphIndex.build()
+        frontier = {'person': {self.person.pk, self.lone.pk}, 'source': {self.source.pk}}
+        for limit in (None, 1, 2, 3, 100):
+            with self.subTest(limit=limit):
+                edges, complete = expand(frontier, limit=limit)
+                in_memory, in_memory_complete = index.expand(frontier, limit=limit)
+                self.assertEqual(sorted(in_memory), sorted(edges))
+                self.assertEqual(in_memory_complete, complete)
+                self.assertEqual(complete, limit is None or limit > 3)
+
+        _, truncated = shortest_paths(
+            ('person', self.person.pk), ('source', self.source.pk), max_visited=1, expand=index.expand
+        )
+        self.assertTrue(truncated)
+
+    def test_endpoint_with_and_without_index(self):
+        params = {'source': f'person:{self.person.pk}', 'target': f'source:{self.source.pk}', 'k': 5}
+        responses = []
+        for loaded in (False, True):
+            if loaded:
+                rebuild_graph_index()
+            responses.append(APIClient().get('/cidoc/graph/path/', params).json())
+        self.assertEqual(*[sorted(map(str, response['paths'])) for response in responses])
+        for path in responses[0]['paths']:
+            self.assertEqual(path['length'], 2)
+            self.assertEqual([node['key'] for node in path['nodes']][::2], [params['source'], params['target']])
+            self.assertEqual(path['nodes'][1]['key'], path['edges'][0]['source'])
+
+
+# One N-Triples statement: IRI subject and predicate, IRI or (typed) literal object
+NT_LINE = re.compile(r'<([^<>"\s]+)> <([^<>"\s]+)> (<[^<>"\s]+>|"(?:[^"\\\n]|\\.)*"(?:\^\^<[^<>"\s]+>)?) \.')
+
+
+class LinkedDataExportTests(TestCase):
+    """The linked-data export is well formed and chunking does not change what it says"""
+
+    def setUp(self):
+        self.people = [Person.objects.create(name=f'person{i}') for i in range(3)]
+        self.traditions = [Tradition.objects.create(name=f'tradition{i}') for i in range(3)]
+        for tradition, practitioners in zip(self.traditions, [self.people[:2], self.people[1:2], self.people]):
+            tradition.practitioners.add(*practitioners)
+        self.artifact = Artifact.objects.create(
+            name='Mask', creator=self.people[0], description='Worn at "Indra Jatra"\nsince C:\\1700',
+        )
+        self.artifact.documentation_sources.add(Source.objects.create(title='Survey'))
+
+    def triples(self, chunk_size):
+        triples = []
+        for line in ''.join(stream_ntriples(iter_resources(chunk_size=chunk_size))).splitlines():
+            match = NT_LINE.fullmatch(line)
+            self.assertIsNotNone(match, line)
+            triples.append(match.groups())
+        return triples
+
+    def test_ntriples_parse_and_survive_chunking(self):
+        triples = self.triples(chunk_size=2000)
+        self.assertEqual(len(triples), len(set(triples)))
+        for chunk_size in (1, 2):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.triples(chunk_size), triples)
+
+        practitioners = {
+            (subject, obj) for subject, predicate, obj in triples if predicate == vocab_iri('practitioners')
+        }
+        self.assertEqual(practitioners, {
+            (entity_iri('tradition', tradition.pk), f'<{entity_iri("person", person.pk)}>')
+            for tradition in self.traditions for person in tradition.practitioners.all()
+        })
+        artifact = entity_iri('artifact', self.artifact.pk)
+        self.assertIn((artifact, RDF_TYPE, f'<{CRM}E22_Human-Made_Object>'), triples)
+        self.assertIn(
+            (artifact, CRM + 'P3_has_note', '"Worn at \\"Indra Jatra\\"\\nsince C:\\\\1700"'), triples
+        )
+
+    def test_jsonld_is_valid_json(self):
+        resources = list(iter_resources(chunk_size=2))
+        document = json.loads(''.join(stream_jsonld(iter(resources))))
+        self.assertEqual(document['@context']['crm'], CRM)
+        self.assertEqual([node['@id'] for node in document['@graph']], [subject for subject, _, _ in resources])
+        artifact = next(node for node in document['@graph'] if node['@id'] == entity_iri('artifact', self.artifact.pk))
+        self.assertEqual(artifact['crm:P3_has_note'], [self.artifact.description])
+        self.assertEqual(artifact['hg:creator'], [{'@id': entity_iri('person', self.people[0].pk)}])
+
+        self.assertEqual(json.loads(''.join(stream_jsonld(iter([])))), {'@context': document['@context'], '@graph': []})
 
-# Create your tests here.
+    def test_endpoint(self):
+        url = '/cidoc/graph/export/'
+        self.assertIn(APIClient().get(url).status_code, (401, 403))
+        client = APIClient()
+        client.force_authenticate(make(User))
+        self.assertEqual(client.get(url, {'export_format': 'rdf'}).status_code, 400)
+        response = client.get(url, {'export_format': 'nt'})
+        self.assertEqual(response['Content-Type'], 'application/n-triples')
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(body, ''.join(stream_ntriples(iter_resources())))
@@ -0,0 +1,86 @@
+"""
+Threaded reads of the CIDOC comment tables.
+
+Replies point at their parent through ``previous_comment_id``; a comment
+without one starts a thread. Both reads below walk the reply tree with a
+single recursive CTE over the (uid, previous_comment_id) index, so a thread
+costs one query however deep or wide it is. The SQL only relies on the
+columns every comment model shares, so it serves all fourteen tables.
+"""
+
+from django.db import connection
+
+MAX_THREAD_DEPTH = 50
+MAX_THREAD_PAGE_SIZE = 100
+
+
+def _sql_names(model):
+    quote = connection.ops.quote_name
+    return quote(model._meta.db_table), quote(model._meta.get_field('uid').column)
+
+
+def load_thread(model, comment_id):
+    """
+    ``comment_id`` and every reply under it, each with a ``depth`` attribute.
+    A comment has one parent, so a corrupt reply cycle below the root has to
+    pass through the root; the walk never steps back onto it.
+    """
+    table, uid = _sql_names(model)
+    return list(model.objects.raw(f'''
+        WITH RECURSIVE tree (comment_id, uid, depth) AS (
+            SELECT comment_id, {uid}, 0 FROM {table} WHERE comment_id = %s
+            UNION ALL
+            SELECT c.comment_id, c.{uid}, tree.depth + 1
+            FROM tree JOIN {table} c ON c.{uid} = tree.uid AND c.previous_comment_id = tree.comment_id
+            WHERE tree.depth < %s AND c.comment_id <> %s
+        )
+        SELECT c.*, tree.depth FROM tree JOIN {table} c ON c.comment_id = tree.comment_id
+    ''', [comment_id, MAX_THREAD_DEPTH, comment_id]))
+
+
+def nest(comments):
+    """
+    Arrange the rows of load_thread() as a tree: returns the root, with every
+    comment's replies, oldest first, in its ``replies`` attribute.
+    """
+    # Keep the shallowest copy of each comment, so repeated rows can never
+    # make the tree loop
+    unique = {}
+    for comment in sorted(comments, key=lambda c: c.depth):
+        unique.setdefault(comment.comment_id, comment)
+    root = min(unique.values(), key=lambda c: c.depth)
+    children = {}
+    for comment in sorted(unique.values(), key=lambda c: (c.timestamp, c.comment_id)):
+        if comment is not root:
+            children.setdefault(comment.previous_comment_id, []).append(comment)
+    for comment in unique.values():
+        comment.replies = children.get(comment.comment_id, [])
+    return root
+
+
+def load_thread_page(model, object_id, page_size, offset=0):
+    """
+    One page of the threads started on record ``object_id``, oldest first.
+    Each root comment carries ``reply_count`` (replies at any depth) and
+    ``total_threads`` (threads on the record across all pages).
+    """
+    table, uid = _sql_names(model)
+    return list(model.objects.raw(f'''
+        WITH RECURSIVE roots AS (
+            SELECT comment_id, COUNT(*) OVER () AS total_threads FROM {table}
+            WHERE {uid} = %s AND previous_comment_id IS NULL
+            ORDER BY timestamp, comment_id LIMIT %s OFFSET %s
+        ),
+        tree (root_id, comment_id, depth) AS (
+            SELECT comment_id, comment_id, 0 FROM roots
+            UNION ALL
+            SELECT tree.root_id, c.comment_id, tree.depth + 1
+            FROM tree JOIN {table} c ON c.{uid} = %s AND c.previous_comment_id = tree.comment_id
+            WHERE tree.depth < %s
+        )
+        SELECT c.*, roots.total_threads, counts.reply_count
+        FROM roots
+        JOIN (SELECT root_id, COUNT(*) - 1 AS reply_count FROM tree GROUP BY root_id) counts ON counts.root_id = roots.comment_id
+        JOIN {table} c ON c.comment_id = roots.comment_id
+        ORDER BY c.timestamp, c.comment_id
+    ''', [object_id, page_size, offset, object_id, MAX_THREAD_DEPTH]))
@@ -25,6 +25,7 @@ router.register(r'artifact_revisions', ArtifactRevisionViewSet)
 router.register(r'event_revisions', EventRevisionViewSet)
 router.register(r'tradition_revisions', TraditionRevisionViewSet)
 router.register(r'source_revisions', SourceRevisionViewSet)
+router.register(r'revision_history', RevisionHistoryViewSet, basename='revision_history')
 
 # Activities & comments
 router.register(r'activities', ActivityViewSet)
@@ -47,6 +48,9 @@ router.register(r'source_revision_comments', SourceRevisionCommentViewSet)
 # Notifications
 router.register(r'notifications', NotificationForUserViewSet)
 
+# Graph traversal
+router.register(r'graph', GraphViewSet, basename='graph')
+
 urlpatterns = [
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,81 +1,193 @@
-from rest_framework import viewsets
+from django.conf import settings
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from django.http import StreamingHttpResponse
+from rest_framework.response import Response
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from apps.heritage_data.prefetch import plan_queryset
+from .chains import MAX_CHAIN_ROWS, MAX_CHAINS, activity_chain, post_chains
+from .graph import (
+    DEFAULT_DEPTH, DEFAULT_MAX_DEGREE, DEFAULT_MAX_NODES, DEFAULT_MAX_VISITED, DEFAULT_PATH_DEPTH,
+    DEFAULT_PATHS, MAX_DEPTH, MAX_NODES, MAX_PATH_DEPTH, MAX_PATHS, NODE_MODELS,
+    expand, neighbourhood, node_key, node_labels, parse_node_key, shortest_paths,
+)
+from .graphindex import get_graph_index, loaded_graph_index
+from .linked_data import CONTENT_TYPES, EXPORT_FORMATS, stream_linked_data
 from .models import *
+from .revisions import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, object_history, state_at
 from .serializers import *
+from .threads import MAX_THREAD_PAGE_SIZE, load_thread, load_thread_page, nest
+
+# --- Base ViewSet ---
+class PlannedModelViewSet(viewsets.ModelViewSet):
+    """ModelViewSet whose reads load exactly what the serializer renders, so lists cost a fixed number of queries"""
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            queryset = plan_queryset(queryset, self.get_serializer_class()())
+        return queryset
 
 # --- User ViewSet ---
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(PlannedModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
 # --- Main models ViewSets ---
-class HistoricalPeriodViewSet(viewsets.ModelViewSet):
+class HistoricalPeriodViewSet(PlannedModelViewSet):
     queryset = HistoricalPeriod.objects.all()
     serializer_class = HistoricalPeriodSerializer
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(PlannedModelViewSet):
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
 
-class PersonViewSet(viewsets.ModelViewSet):
+class PersonViewSet(PlannedModelViewSet):
     queryset = Person.objects.all()
     serializer_class = PersonSerializer
 
-class ArtifactViewSet(viewsets.ModelViewSet):
+class ArtifactViewSet(PlannedModelViewSet):
     queryset = Artifact.objects.all()
     serializer_class = ArtifactSerializer
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(PlannedModelViewSet):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
 
-class TraditionViewSet(viewsets.ModelViewSet):
+class TraditionViewSet(PlannedModelViewSet):
     queryset = Tradition.objects.all()
     serializer_class = TraditionSerializer
 
-class SourceViewSet(viewsets.ModelViewSet):
+class SourceViewSet(PlannedModelViewSet):
     queryset = Source.objects.all()
     serializer_class = SourceSerializer
 
 # --- Revision ViewSets ---
-class HistoricalPeriodRevisionViewSet(viewsets.ModelViewSet):
+class HistoricalPeriodRevisionViewSet(PlannedModelViewSet):
     queryset = HistoricalPeriodRevision.objects.all()
     serializer_class = HistoricalPeriodRevisionSerializer
 
-class LocationRevisionViewSet(viewsets.ModelViewSet):
+class LocationRevisionViewSet(PlannedModelViewSet):
     queryset = LocationRevision.objects.all()
     serializer_class = LocationRevisionSerializer
 
-class PersonRevisionViewSet(viewsets.ModelViewSet):
+class PersonRevisionViewSet(PlannedModelViewSet):
     queryset = PersonRevision.objects.all()
     serializer_class = PersonRevisionSerializer
 
-class ArtifactRevisionViewSet(viewsets.ModelViewSet):
+class ArtifactRevisionViewSet(PlannedModelViewSet):
     queryset = ArtifactRevision.objects.all()
     serializer_class = ArtifactRevisionSerializer
 
-class EventRevisionViewSet(viewsets.ModelViewSet):
+class EventRevisionViewSet(PlannedModelViewSet):
     queryset = EventRevision.objects.all()
     serializer_class = EventRevisionSerializer
 
-class TraditionRevisionViewSet(viewsets.ModelViewSet):
+class TraditionRevisionViewSet(PlannedModelViewSet):
     queryset = TraditionRevision.objects.all()
     serializer_class = TraditionRevisionSerializer
 
-class SourceRevisionViewSet(viewsets.ModelViewSet):
+class SourceRevisionViewSet(PlannedModelViewSet):
     queryset = SourceRevision.objects.all()
     serializer_class = SourceRevisionSerializer
 
 # --- Activity and Comment ViewSets ---
-class ActivityViewSet(viewsets.ModelViewSet):
+class ActivityViewSet(PlannedModelViewSet):
     queryset = Activity.objects.all()
     serializer_class = ActivitySerializer
 
+    def _render_chain_rows(self, rows):
+        results = []
+        for row in rows:
+            data = self.get_serializer(row).data
+            data['depth'] = row.depth
+            results.append(data)
+        return results
+
+    @action(detail=True, methods=['get'])
+    def chain(self, request, pk=None):
+        """Every activity in this activity's chain, root first"""
+        try:
+            activity_id = int(pk)
+        except ValueError:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        rows = activity_chain(activity_id, max_rows=MAX_CHAIN_ROWS + 1)
+        if not rows:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'root': rows[0].chain_id,
+            'activities': self._render_chain_rows(rows[:MAX_CHAIN_ROWS]),
+            'truncated': len(rows) > MAX_CHAIN_ROWS,
+        })
+
+    @action(detail=False, methods=['get'])
+    def chains(self, request):
+        """The chains that include an activity on ?post_uid="""
+        try:
+            post_uid = _int_param(request.query_params, 'post_uid', None, -2 ** 31, 2 ** 31 - 1)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        rows = post_chains(post_uid, max_chains=MAX_CHAINS + 1, max_rows=MAX_CHAIN_ROWS + 1)
+        truncated = len(rows) > MAX_CHAIN_ROWS
+        chains = {}
+        for row in rows[:MAX_CHAIN_ROWS]:
+            chains.setdefault(row.chain_id, []).append(row)
+        if len(chains) > MAX_CHAINS:
+            chains.pop(max(chains))
+            truncated = True
+        return Response({
+            'chains': [{'root': root, 'activities': self._render_chain_rows(chain)} for root, chain in chains.items()],
+            'truncated': truncated,
+        })
+
 # Generate generic comment viewsets
 def create_comment_viewset(model, serializer):
-    class CommentViewSet(viewsets.ModelViewSet):
+    class CommentViewSet(PlannedModelViewSet):
         queryset = model.objects.all()
         serializer_class = serializer
+
+        def _render_thread(self, comment):
+            data = self.get_serializer(comment).data
+            data['depth'] = comment.depth
+            data['replies'] = [self._render_thread(reply) for reply in comment.replies]
+            return data
+
+        @action(detail=True, methods=['get'])
+        def thread(self, request, pk=None):
+            """This comment and every reply under it, nested"""
+            try:
+                comment_id = int(pk)
+            except ValueError:
+                return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+            comments = load_thread(model, comment_id)
+            if not comments:
+                return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(self._render_thread(nest(comments)))
+
+        @action(detail=False, methods=['get'])
+        def threads(self, request):
+            """A page of the threads started on record ?uid=, with reply counts"""
+            params = request.query_params
+            try:
+                object_id = _int_param(params, 'uid', None, 1, 2 ** 31 - 1)
+                page = _int_param(params, 'page', 1, 1, 2 ** 31 - 1)
+                page_size = _int_param(params, 'page_size', settings.REST_FRAMEWORK['PAGE_SIZE'], 1, MAX_THREAD_PAGE_SIZE)
+            except ValueError as e:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            roots = load_thread_page(model, object_id, page_size, offset=(page - 1) * page_size)
+            if roots:
+                count = roots[0].total_threads
+            else:
+                count = model.objects.filter(uid=object_id, previous_comment_id__isnull=True).count() if page > 1 else 0
+            results = []
+            for root in roots:
+                data = self.get_serializer(root).data
+                data['reply_count'] = root.reply_count
+                results.append(data)
+            return Response({'count': count, 'page': page, 'page_size': page_size, 'results': results})
+
     return CommentViewSet
 
 HistoricalPeriodCommentViewSet = create_comment_viewset(HistoricalPeriodComment, HistoricalPeriodCommentSerializer)
@@ -95,6 +207,180 @@ TraditionRevisionCommentViewSet = create_comment_viewset(TraditionRevisionCommen
 SourceRevisionCommentViewSet = create_comment_viewset(SourceRevisionComment, SourceRevisionCommentSerializer)
 
 # --- Notification ViewSet ---
-class NotificationForUserViewSet(viewsets.ModelViewSet):
+class NotificationForUserViewSet(PlannedModelViewSet):
     queryset = NotificationForUser.objects.all()
     serializer_class = NotificationForUserSerializer
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def unread_count(self, request):
+        return Response({'unread': get_unread_count(request.user)})
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def mark_read(self, request):
+        serializer = MarkNotificationsReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = mark_notifications_read(NotificationForUser.objects.filter(user=request.user, pk__in=serializer.validated_data['ids']))
+        return Response({'updated': updated, 'unread': get_unread_count(request.user)})
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def mark_all_read(self, request):
+        updated = mark_notifications_read(NotificationForUser.objects.filter(user=request.user))
+        return Response({'updated': updated, 'unread': get_unread_count(request.user)})
+
+
+# --- Graph ViewSet ---
+def _int_param(params, name, default, minimum, maximum):
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an integer.')
+    if not minimum <= value <= maximum:
+        raise ValueError(f'{name} must be between {minimum} and {maximum}.')
+    return value
+
+
+class GraphViewSet(viewsets.ViewSet):
+    @action(detail=False, methods=['get'])
+    def neighbourhood(self, request):
+        params = request.query_params
+        node_type = params.get('type')
+        if node_type not in NODE_MODELS:
+            return Response({'type': f"Must be one of {', '.join(NODE_MODELS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            pk = _int_param(params, 'id', None, 1, 2 ** 31 - 1)
+            depth = _int_param(params, 'depth', DEFAULT_DEPTH, 1, MAX_DEPTH)
+            max_nodes = _int_param(params, 'limit', DEFAULT_MAX_NODES, 1, MAX_NODES)
+            max_degree = _int_param(params, 'fan_out', DEFAULT_MAX_DEGREE, 1, MAX_NODES)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not NODE_MODELS[node_type].objects.filter(pk=pk).exists():
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        nodes, edges, truncated = neighbourhood((node_type, pk), depth, max_nodes, max_degree)
+        labels = node_labels(nodes)
+        return Response({
+            'root': node_key((node_type, pk)),
+            'nodes': [
+                {'key': node_key(node), 'type': node[0], 'id': node[1], 'label': labels[node], 'depth': level}
+                for node, level in nodes.items() if node in labels
+            ],
+            'edges': [
+                {'source': node_key(source), 'relation': relation, 'target': node_key(target)}
+                for source, relation, target in edges if source in labels and target in labels
+            ],
+            'truncated': truncated,
+        })
+
+    @action(detail=False, methods=['get'])
+    def connected(self, request):
+        """Nodes reached by following ?path=artifact,tradition from ?type=&id=, answered from the graph index"""
+        params = request.query_params
+        node_type = params.get('type')
+        path = [step for step in params.get('path', '').split(',') if step]
+        if node_type not in NODE_MODELS or not path or any(step not in NODE_MODELS for step in path):
+            return Response({'detail': f"type and every path step must be one of {', '.join(NODE_MODELS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(path) > MAX_DEPTH:
+            return Response({'detail': f'path may have at most {MAX_DEPTH} steps.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            pk = _int_param(params, 'id', None, 1, 2 ** 31 - 1)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        found = get_graph_index().follow([(node_type, pk)], *path)
+        nodes = sorted(found)[:MAX_NODES]
+        labels = node_labels(nodes)
+        return Response({
+            'nodes': [{'key': node_key(node), 'type': node[0], 'id': node[1], 'label': labels[node]} for node in nodes if node in labels],
+            'truncated': len(found) > MAX_NODES,
+        })
+
+    @action(detail=False, methods=['get'])
+    def path(self, request):
+        """Up to ?k= shortest connections between ?source=type:id and ?target=type:id"""
+        params = request.query_params
+        try:
+            start = parse_node_key(params.get('source'))
+            goal = parse_node_key(params.get('target'))
+            k = _int_param(params, 'k', DEFAULT_PATHS, 1, MAX_PATHS)
+            max_depth = _int_param(params, 'max_depth', DEFAULT_PATH_DEPTH, 1, MAX_PATH_DEPTH)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if set(node_labels([start, goal])) != {start, goal}:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Search in memory when this process already holds the graph index
+        index = get_graph_index() if loaded_graph_index() is not None else None
+        paths, truncated = shortest_paths(
+            start, goal, k=k, max_depth=max_depth, max_visited=DEFAULT_MAX_VISITED,
+            expand=index.expand if index is not None else expand,
+        )
+        labels = node_labels({node for path in paths for edge in path for node in (edge[0], edge[2])} | {start})
+        results = []
+        for path in paths:
+            nodes = [start]
+            for source, _, target in path:
+                nodes.append(target if source == nodes[-1] else source)
+            results.append({
+                'length': len(path),
+                'nodes': [{'key': node_key(node), 'type': node[0], 'id': node[1], 'label': labels.get(node)} for node in nodes],
+                'edges': [{'source': node_key(source), 'relation': relation, 'target': node_key(target)} for source, relation, target in path],
+            })
+        return Response({'source': node_key(start), 'target': node_key(goal), 'paths': results, 'truncated': truncated})
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def export(self, request):
+        """Stream the whole dataset as CIDOC-CRM linked data (?export_format=nt|ttl|jsonld)"""
+        export_format = request.query_params.get('export_format', 'ttl')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'export_format': f"Must be one of {', '.join(EXPORT_FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(stream_linked_data(export_format), content_type=CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="cidoc.{export_format}"'
+        return response
+
+
+# --- Revision history ViewSet ---
+def _revised_record(params):
+    """(model, pk) named by ?type=&id=, or raise ValueError"""
+    node_type = params.get('type')
+    if node_type not in NODE_MODELS:
+        raise ValueError(f"type must be one of {', '.join(NODE_MODELS)}.")
+    return NODE_MODELS[node_type], _int_param(params, 'id', None, 1, 2 ** 31 - 1)
+
+
+class RevisionHistoryViewSet(viewsets.ViewSet):
+    """History and past states of a record, read from the unified revision store"""
+    def list(self, request):
+        """Revision metadata of ?type=&id=, newest first; page back with ?before=<seq>"""
+        params = request.query_params
+        try:
+            model, pk = _revised_record(params)
+            page_size = _int_param(params, 'page_size', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+            before = _int_param(params, 'before', None, 1, 2 ** 31 - 1) if 'before' in params else None
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        revisions = object_history(model, pk, before_seq=before, page_size=page_size)
+        return Response({
+            'results': revisions,
+            'next_before': revisions[-1]['seq'] if len(revisions) == page_size and revisions[-1]['seq'] > 1 else None,
+        })
+
+    @action(detail=False, methods=['get'])
+    def state(self, request):
+        """State of ?type=&id= after revision ?seq=, or as of ?at=<ISO 8601 time>, or now"""
+        params = request.query_params
+        try:
+            model, pk = _revised_record(params)
+            seq = _int_param(params, 'seq', None, 1, 2 ** 31 - 1) if 'seq' in params else None
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        at = None
+        if 'at' in params:
+            at = parse_datetime(params['at'])
+            if at is None:
+                return Response({'at': 'Must be an ISO 8601 date and time.'}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+        seq, snapshot = state_at(model, pk, seq=seq, at=at)
+        if seq is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'seq': seq, 'snapshot': snapshot})
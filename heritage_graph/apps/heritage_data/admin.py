@@ -17,6 +17,7 @@ from .models import (
     CulturalEntity,
     Revision,
     Activity,
+    mark_notifications_read,
 )
 
 
@@ -227,7 +228,7 @@ class NotificationAdmin(admin.ModelAdmin):
     actions = ["mark_as_read"]
 
     def mark_as_read(self, request, queryset):
-        updated_count = queryset.update(is_read=True)
+        updated_count = mark_notifications_read(queryset)
         self.message_user(request, f"{updated_count} notifications marked as read.")
 
     mark_as_read.short_description = "Mark selected notifications as read"
@@ -290,7 +291,7 @@ class RevisionAdmin(admin.ModelAdmin):
 
     fieldsets = (
         ("Revision Info", {
-            "fields": ("entity", "revision_number", "data")
+            "fields": ("entity", "revision_number", "snapshot", "diff")
         }),
         ("Metadata", {
             "fields": ("created_by", "created_at")
@@ -298,8 +299,8 @@ class RevisionAdmin(admin.ModelAdmin):
     )
 
     def short_data_preview(self, obj):
-        """Show a shortened JSON preview in list view."""
-        preview = str(obj.data)
+        """Show a shortened preview of the stored snapshot or diff in list view."""
+        preview = str(obj.snapshot if obj.snapshot is not None else obj.diff)
         return (preview[:75] + "...") if len(preview) > 75 else preview
 
     short_data_preview.short_description = "Revision Data (Preview)"
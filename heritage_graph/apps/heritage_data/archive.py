@@ -0,0 +1,160 @@
+"""
+Retention and archival for the activity tables.
+
+Rows older than the retention window are moved out of the database one
+calendar month at a time. Each month becomes a gzip-compressed NDJSON file
+under ACTIVITY_ARCHIVE_DIR/<kind>/<YYYY-MM>.ndjson.gz, which acts as a
+closed, read-only partition. Later runs append new gzip members to the same
+file, and readers drop duplicate rows by primary key, so a run interrupted
+between writing a batch and deleting it is harmless.
+"""
+
+import gzip
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.cidoc_data.chains import forget_chain_roots
+from apps.cidoc_data.models import Activity as CidocActivity
+
+from .models import Activity, ActivityLog
+
+# kind -> (model, timestamp field)
+ARCHIVE_MODELS = {
+    "activitylog": (ActivityLog, "timestamp"),
+    "activity": (Activity, "created_at"),
+    "cidoc_activity": (CidocActivity, "timestamp"),
+}
+
+# Kinds whose rows stay in the database while another table still points
+# at them with on_delete=CASCADE: CIDOC comments hang off their activity,
+# and archiving the activity must not delete the comment with it
+KEEP_REFERENCED = {"cidoc_activity"}
+
+# kind -> called with the primary keys of each archived batch
+ON_ARCHIVED = {"cidoc_activity": forget_chain_roots}
+
+DEFAULT_RETENTION_DAYS = {"activitylog": 180, "activity": 730, "cidoc_activity": 730}
+DEFAULT_BATCH_SIZE = 2000
+
+
+def archive_dir(kind):
+    base = getattr(
+        settings, "ACTIVITY_ARCHIVE_DIR", Path(settings.BASE_DIR) / "archive"
+    )
+    return Path(base) / kind
+
+
+def retention_cutoff(kind, now=None):
+    """Start of the oldest month that must stay in the database"""
+    days = getattr(settings, "ACTIVITY_RETENTION_DAYS", {}).get(
+        kind, DEFAULT_RETENTION_DAYS[kind]
+    )
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    return cutoff.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(value):
+    return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _month_path(kind, month):
+    return archive_dir(kind) / f"{month:%Y-%m}.ndjson.gz"
+
+
+def _unreferenced(rows):
+    """``rows`` minus those a cascading foreign key still points at"""
+    for relation in rows.model._meta.related_objects:
+        if relation.one_to_many and relation.on_delete is models.CASCADE:
+            rows = rows.exclude(**{f"{relation.name}__isnull": False})
+    return rows
+
+
+def archive_kind(kind, before, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Move every ``kind`` row with a timestamp before ``before`` (a month
+    boundary) into the monthly archive files. Returns ``{month: rows}``.
+    """
+    model, field = ARCHIVE_MODELS[kind]
+    columns = [f.attname for f in model._meta.concrete_fields]
+    pk_index = columns.index(model._meta.pk.attname)
+    rows = model.objects.filter(**{f"{field}__lt": before}).order_by()
+    if kind in KEEP_REFERENCED:
+        rows = _unreferenced(rows)
+    archive_dir(kind).mkdir(parents=True, exist_ok=True)
+
+    moved = {}
+    oldest = rows.order_by(field).values_list(field, flat=True).first()
+    month = _month_start(oldest) if oldest else before
+    while month < before:
+        end = min(_next_month(month), before)
+        in_month = rows.filter(**{f"{field}__gte": month, f"{field}__lt": end})
+        while True:
+            batch = list(in_month.order_by("pk").values_list(*columns)[:batch_size])
+            if not batch:
+                break
+            # Each batch is a separate gzip member appended to the month file
+            with gzip.open(_month_path(kind, month), "at", encoding="utf-8") as out:
+                for row in batch:
+                    out.write(
+                        json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder)
+                        + "\n"
+                    )
+            archived = [row[pk_index] for row in batch]
+            with transaction.atomic():
+                archived_rows = model.objects.filter(pk__in=archived)
+                if kind in KEEP_REFERENCED:
+                    archived_rows = _unreferenced(archived_rows)
+                archived_rows.delete()
+                if kind in ON_ARCHIVED:
+                    ON_ARCHIVED[kind](archived)
+            moved[f"{month:%Y-%m}"] = moved.get(f"{month:%Y-%m}", 0) + len(batch)
+        month = _next_month(month)
+    return moved
+
+
+def read_archive(kind, start=None, end=None):
+    """
+    Yield archived ``kind`` rows (as dicts) whose timestamp falls in
+    ``[start, end)``, oldest month first. Only the month files overlapping
+    the range are opened.
+    """
+    model, field = ARCHIVE_MODELS[kind]
+    directory = archive_dir(kind)
+    if not directory.exists():
+        return
+
+    for path in sorted(directory.glob("*.ndjson.gz")):
+        month = timezone.make_aware(
+            datetime.strptime(path.name.split(".")[0], "%Y-%m"),
+            timezone.get_fixed_timezone(0),
+        )
+        if end is not None and month >= end:
+            continue
+        if start is not None and _next_month(month) <= start:
+            continue
+
+        seen = set()
+        with gzip.open(path, "rt", encoding="utf-8") as source:
+            for line in source:
+                row = json.loads(line)
+                pk = row[model._meta.pk.attname]
+                if pk in seen:
+                    continue
+                seen.add(pk)
+                timestamp = parse_datetime(row[field])
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp >= end:
+                    continue
+                yield row
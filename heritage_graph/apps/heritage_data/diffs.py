@@ -0,0 +1,78 @@
+"""
+Structural diffs between JSON documents, expressed as RFC 6902 JSON Patch
+operations. Objects are compared key by key; lists and scalars are replaced
+as a whole, which keeps patches small for form data while staying simple
+to apply.
+"""
+
+import copy
+
+
+def _escape(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token):
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def diff_documents(old, new, path=""):
+    """Return the JSON Patch operations that turn ``old`` into ``new``"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(diff_documents(old[key], value, child))
+        return ops
+    if _identical(old, new):
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def _identical(old, new):
+    """
+    Equality that also tells JSON types apart: 1, 1.0 and True compare
+    equal in Python but are different values once stored and replayed
+    """
+    if type(old) is not type(new):
+        return False
+    if isinstance(old, list):
+        return len(old) == len(new) and all(map(_identical, old, new))
+    if isinstance(old, dict):
+        return old.keys() == new.keys() and all(_identical(old[key], new[key]) for key in old)
+    return old == new
+
+
+def apply_diff(document, ops):
+    """Apply JSON Patch operations produced by diff_documents to a copy of ``document``"""
+    document = copy.deepcopy(document)
+    for op in ops:
+        if op["path"] == "":
+            document = copy.deepcopy(op.get("value"))
+            continue
+        *parents, last = [_unescape(token) for token in op["path"].split("/")[1:]]
+        target = document
+        for token in parents:
+            target = target[token]
+        if op["op"] == "remove":
+            target.pop(last, None)
+        else:
+            target[last] = copy.deepcopy(op["value"])
+    return document
+
+
+def changed_keys(ops):
+    """Top-level keys touched by a set of operations"""
+    keys = []
+    for op in ops:
+        tokens = op["path"].split("/")
+        key = _unescape(tokens[1]) if len(tokens) > 1 else ""
+        if key not in keys:
+            keys.append(key)
+    return keys
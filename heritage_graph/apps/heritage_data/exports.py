@@ -0,0 +1,197 @@
+import csv
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Submission
+
+EXPORT_FORMATS = ["csv", "ndjson", "parquet"]
+DEFAULT_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Every concrete column of Submission, in declaration order
+EXPORT_FIELDS = [f.attname for f in Submission._meta.concrete_fields]
+
+
+def parse_since(value):
+    """Parse an ISO date or datetime into an aware datetime for incremental exports"""
+    if not value:
+        return None
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid 'since' value: {value}")
+        since = datetime.combine(day, datetime.min.time())
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def get_export_queryset(status=None, district=None, since=None):
+    """Build the filtered, stably ordered queryset used by every export"""
+    queryset = Submission.objects.all()
+    if status:
+        queryset = queryset.filter(status=status)
+    if district:
+        queryset = queryset.filter(District__iexact=district)
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    return queryset.order_by("id").values_list(*EXPORT_FIELDS)
+
+
+def iter_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Walk the queryset with a server-side cursor so only one chunk of
+    rows is held in memory at a time.
+    """
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """File-like object whose write() just hands the value back to csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def _flatten(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([_flatten(value) for value in row])
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield (
+            json.dumps(
+                dict(zip(EXPORT_FIELDS, row)),
+                cls=DjangoJSONEncoder,
+                ensure_ascii=False,
+            )
+            + "\n"
+        )
+
+
+class _ChunkSink:
+    """
+    Write-only sink for pyarrow that keeps bytes only until they are drained,
+    so each finished row group can be sent on without buffering the file.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_schema(pa):
+    columns = []
+    for field in Submission._meta.concrete_fields:
+        if isinstance(field, (models.IntegerField, models.ForeignKey)):
+            arrow_type = pa.int64()
+        elif isinstance(field, models.DateTimeField):
+            arrow_type = pa.timestamp("us", tz="UTC")
+        else:
+            arrow_type = pa.string()
+        columns.append((field.attname, arrow_type))
+    return pa.schema(columns)
+
+
+def stream_parquet(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write one Parquet row group per chunk of rows and yield the encoded
+    bytes as soon as each group is flushed. pyarrow is imported up front so
+    a missing dependency is reported before any output is produced.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export requires the 'pyarrow' package.")
+
+    return _parquet_chunks(pa, pq, rows, chunk_size)
+
+
+def _parquet_chunks(pa, pq, rows, chunk_size):
+    schema = _parquet_schema(pa)
+    json_columns = {
+        index
+        for index, field in enumerate(Submission._meta.concrete_fields)
+        if isinstance(field, models.JSONField)
+    }
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    def write_batch(batch):
+        columns = list(zip(*batch))
+        arrays = [
+            pa.array(
+                [_flatten(v) for v in column] if i in json_columns else column,
+                type=schema.field(i).type,
+            )
+            for i, column in enumerate(columns)
+        ]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            write_batch(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        write_batch(batch)
+    writer.close()
+    yield sink.drain()
+
+
+def stream_export(export_format, queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return a generator of encoded chunks for the requested format"""
+    rows = iter_rows(queryset, chunk_size=chunk_size)
+    if export_format == "csv":
+        return stream_csv(rows)
+    if export_format == "ndjson":
+        return stream_ndjson(rows)
+    if export_format == "parquet":
+        return stream_parquet(rows, chunk_size=chunk_size)
+    raise ValueError(f"Unsupported export format: {export_format}")
@@ -0,0 +1,56 @@
+"""
+Reading the per-user activity feeds written by models.fan_out_activities.
+
+Pages are fetched with keyset pagination on the feed's own
+``(owner, created_at, id)`` index, so a page is one bounded range scan no
+matter how many activities exist overall.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+from .models import FeedEntry
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(entry):
+    raw = json.dumps([entry.created_at.isoformat(), entry.pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Turn an opaque cursor back into ``(created_at, id)``; raises ValueError if malformed"""
+    try:
+        created_at, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(entry_id)
+    except (TypeError, ValueError, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("Invalid cursor.")
+
+
+def read_feed(owner, cursor=None, page_size=DEFAULT_PAGE_SIZE, **filters):
+    """
+    Return ``(activities, next_cursor)`` for one page of ``owner``'s feed,
+    newest first. ``filters`` are applied to the activity
+    (e.g. ``activity_type='accepted'``).
+    """
+    entries = FeedEntry.objects.filter(owner=owner)
+    if cursor is not None:
+        created_at, entry_id = cursor
+        entries = entries.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=entry_id)
+        )
+    if filters:
+        entries = entries.filter(
+            **{f'activity__{lookup}': value for lookup, value in filters.items()}
+        )
+    page = list(
+        entries.select_related('activity__user', 'activity__entity')
+        .order_by('-created_at', '-id')[:page_size + 1]
+    )
+    next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+    return [entry.activity for entry in page[:page_size]], next_cursor
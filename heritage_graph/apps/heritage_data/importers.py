@@ -0,0 +1,267 @@
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Submission, SubmissionVersion
+from .signals import refresh_user_stats
+
+DEFAULT_BATCH_SIZE = 500
+
+# Labels used in Arches report exports, mapped to Submission fields
+FIELD_MAPPING = {
+    "Monument name": "Monument_name",
+    "Anglicized name": "Anglicized_name",
+    "Name in Devanagari": "Name_in_Devanagari",
+    "Monument type": "Monument_type",
+    "Religion": "Religion",
+    "Province number": "Province_number",
+    "District": "District",
+    "Municipality / village council": "Municipality_village_council",
+    "Heritage focus area": "Heritage_focus_area",
+    "City quarter (tola)": "City_quarter_tola",
+    "Short description": "Short_description",
+    "Description": "description",
+    "Description in Nepali": "Description_in_Nepali",
+    "Monument length": "Monument_length",
+    "Monument depth": "Monument_depth",
+    "Monument height  (approximate)": "Monument_height_approximate",
+    "Monument diameter": "Monument_diameter",
+    "Monument shape": "Monument_shape",
+    "Number of storeys": "Number_of_storeys",
+    "Thickness of main wall": "Thickness_of_main_wall",
+    "Type of bricks": "Type_of_bricks",
+    "Number of wood-carved windows": "Number_of_wood_carved_windows",
+    "Number of doors": "Number_of_doors",
+    "Number of bays (front)": "Number_of_bays_front",
+    "Number of bays (sides)": "Number_of_bays_sides",
+    "Number of plinth": "Number_of_plinth",
+    "Base plinth's width": "Base_plinth_width",
+    "Base plinth's depth": "Base_plinth_depth",
+    "Base plinth's height": "Base_plinth_height",
+    "Top plinth's width": "Top_plinth_width",
+    "Top plinth's depth": "Top_plinth_depth",
+    "Top plinth's height": "Top_plinth_height",
+    "Monument assessment": "Monument_assessment",
+    "Identified threats": "Identified_threats",
+    "Activity": "Activity",
+    "Editorial team": "Editorial_team",
+    "Main deity in the sanctum": "Main_deity_in_the_sanctum",
+    "Date (BCE/CE)": "Date_BCE_CE",
+    "Date (VS/NS)": "Date_VS_NS",
+    "Forms of columns": "Forms_of_columns",
+    "Gate": "Gate",
+    "Height": "Height",
+    "Width": "Width",
+    "Depth": "Depth",
+    "Circumference": "Circumference",
+    "Profile at base": "Profile_at_base",
+    "Edge at platform": "Edge_at_platform",
+    "Platform floor": "Platform_floor",
+    "Column height": "Column_height",
+    "Column width": "Column_width",
+    "Column depth": "Column_depth",
+    "Lintel height": "Lintel_height",
+    "Lintel width": "Lintel_width",
+    "Lintel depth": "Lintel_depth",
+    "Capital height": "Capital_height",
+    "Capital width": "Capital_width",
+    "Capital depth": "Capital_depth",
+    "Cakula height": "Cakula_height",
+    "Cakula width": "Cakula_width",
+    "Cakula depth": "Cakula_depth",
+    "Alternative name(s)": "Alternative_name_s",
+    "Inscription identification number": "Inscription_identification_number",
+    "Image declaration": "Image_declaration",
+    "Peculiarities": "Peculiarities",
+    "Period": "Period",
+    "Reference source": "Reference_source",
+    "Roofing": "Roofing",
+    "Sources": "Sources",
+    "Type of roof": "Type_of_roof",
+    "Year (SS/NS/VS)": "Year_SS_NS_VS",
+    "Nepali month": "Nepali_month",
+    "Tithi": "Tithi",
+    "Paksa": "Paksa",
+    "End date": "End_date",
+    "Event name": "Event_name",
+    "Details": "Details",
+    "Maps and drawing type": "Maps_and_drawing_type",
+    "Description for past interventions": "Description_for_past_interventions",
+    "Object ID number": "Object_ID_number",
+    "Object location": "Object_location",
+    "Object material": "Object_material",
+    "Object type": "Object_type",
+}
+
+
+DESCRIPTION_FIELDS = ["description", "Description_in_Nepali", "Short_description"]
+
+# Labels that describe one of several objects attached to a monument
+OBJECT_LABELS = [
+    "Name",
+    "Object ID number",
+    "Object type",
+    "Object material",
+    "Object location",
+    "Date (BCE/CE)",
+    "Commentary",
+]
+
+VALID_FIELDS = {f.name for f in Submission._meta.get_fields()}
+
+
+def map_field_name(label):
+    """Map an Arches label to a Submission field name"""
+    return FIELD_MAPPING.get(label)
+
+
+def build_submission_data(resource_id, pairs, fallback_title=""):
+    """
+    Turn the (label, value) pairs of one Arches resource into keyword
+    arguments for Submission. Unmapped labels and repeated objects are kept
+    in contribution_data.
+    """
+    pairs = [(label.strip(), (value or "").strip()) for label, value in pairs]
+
+    monument_name = next(
+        (value for label, value in pairs if label == "Monument name"), None
+    )
+
+    submission_data = {
+        "submission_id": resource_id,
+        "title": monument_name or fallback_title,
+        "description": "",
+        "contribution_type": "heritage_documentation",
+        "contribution_data": {},
+    }
+
+    object_data = []
+    current_object = {}
+
+    for label, value in pairs:
+        field_name = map_field_name(label)
+
+        # Handle object-specific fields, including the unmapped "Name" that
+        # starts each object
+        if label in OBJECT_LABELS:
+            if label == "Name" and current_object:
+                object_data.append(current_object)
+                current_object = {}
+            current_object[label] = value
+        elif field_name:
+            # Special handling for description fields
+            if field_name in DESCRIPTION_FIELDS:
+                if value:
+                    submission_data[field_name] = value
+            # Handle direct field mappings
+            elif hasattr(Submission, field_name):
+                submission_data[field_name] = value
+            # Store unmapped fields
+            else:
+                submission_data["contribution_data"][label] = value
+
+    # Add last object if exists
+    if current_object:
+        object_data.append(current_object)
+
+    if object_data:
+        submission_data["contribution_data"]["objects"] = object_data
+
+    return {
+        k: v
+        for k, v in submission_data.items()
+        if k in VALID_FIELDS or k == "contribution_data"
+    }
+
+
+class SubmissionBatchWriter:
+    """
+    Collects mapped submissions and writes them in batches: one lookup for
+    existing IDs, one upsert per group of columns, and one bulk insert of
+    SubmissionVersion rows for the updated submissions. Stats for the
+    contributor are refreshed once in close() rather than per row.
+    """
+
+    def __init__(self, contributor, batch_size=DEFAULT_BATCH_SIZE):
+        self.contributor = contributor
+        self.batch_size = batch_size
+        self.pending = {}
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def add(self, submission_data):
+        self.pending[submission_data["submission_id"]] = submission_data
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        try:
+            with transaction.atomic():
+                created, updated = self._write(batch)
+        except Exception as e:
+            first, last = min(batch), max(batch)
+            self.errors.append(
+                f"Error writing {len(batch)} submissions ({first} .. {last}): {str(e)}"
+            )
+            return
+        self.created += created
+        self.updated += updated
+
+    def close(self):
+        self.flush()
+        if self.created or self.updated:
+            refresh_user_stats(self.contributor)
+
+    def _write(self, batch):
+        existing = set(
+            Submission.objects.filter(submission_id__in=batch.keys()).values_list(
+                "submission_id", flat=True
+            )
+        )
+
+        # Rows only overwrite the columns they carry, like update_or_create
+        groups = {}
+        for data in batch.values():
+            groups.setdefault(frozenset(data), []).append(data)
+
+        for columns, rows in groups.items():
+            Submission.objects.bulk_create(
+                [Submission(contributor=self.contributor, **data) for data in rows],
+                update_conflicts=True,
+                unique_fields=["submission_id"],
+                update_fields=sorted((columns - {"submission_id"}) | {"contributor"}),
+            )
+
+        if existing:
+            self._create_versions(existing)
+
+        return len(batch) - len(existing), len(existing)
+
+    def _create_versions(self, submission_ids):
+        submissions = Submission.objects.filter(
+            submission_id__in=submission_ids
+        ).only("id", "title", "description", "contribution_data")
+        latest = dict(
+            SubmissionVersion.objects.filter(
+                submission__submission_id__in=submission_ids
+            )
+            .values("submission_id")
+            .annotate(latest=Max("version_number"))
+            .values_list("submission_id", "latest")
+        )
+        SubmissionVersion.objects.bulk_create(
+            [
+                SubmissionVersion(
+                    submission=submission,
+                    version_number=latest.get(submission.id, 0) + 1,
+                    title=submission.title,
+                    description=submission.description,
+                    contribution_data=submission.contribution_data,
+                    updated_by=self.contributor,
+                )
+                for submission in submissions
+            ]
+        )
@@ -0,0 +1,94 @@
+"""
+Moderation leases for the contribution queue.
+
+An editor claims the next N queued entities and holds them for
+LEASE_DURATION; a lease that is not renewed expires and the entity returns
+to the queue on its own. Where the database supports SKIP LOCKED
+(PostgreSQL), candidate rows are locked while they are handed out and rows
+another editor is claiming at that moment are skipped rather than waited
+on. SQLite has no row locks, so there the conditional UPDATE that only
+touches still-free rows is what keeps claims exclusive.
+"""
+
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import MODERATION_QUEUE_STATUSES, CulturalEntity
+
+LEASE_DURATION = timedelta(minutes=15)
+DEFAULT_CLAIM_SIZE = 10
+MAX_CLAIM_SIZE = 50
+
+
+def _queue():
+    return CulturalEntity.objects.filter(status__in=MODERATION_QUEUE_STATUSES)
+
+
+def _free(now):
+    return Q(claimed_by__isnull=True) | Q(claim_expires_at__lt=now)
+
+
+def _held_by(editor, now):
+    return Q(claimed_by=editor, claim_expires_at__gte=now)
+
+
+def claim_contributions(editor, limit=DEFAULT_CLAIM_SIZE):
+    """
+    Lease up to ``limit`` queued entities to ``editor``, oldest first.
+    Leases the editor already holds are renewed and count towards the
+    limit. Returns the IDs of every entity now leased to the editor.
+    """
+    now = timezone.now()
+    expires = now + LEASE_DURATION
+
+    with transaction.atomic():
+        held = _queue().filter(_held_by(editor, now)).update(claim_expires_at=expires)
+        wanted = limit - held
+        if wanted > 0:
+            candidates = _queue().filter(_free(now)).order_by('created_at', 'pk')
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            candidate_ids = list(candidates.values_list('pk', flat=True)[:wanted])
+            # Re-checked in the UPDATE so a row taken in the meantime is left alone
+            _queue().filter(_free(now), pk__in=candidate_ids).update(
+                claimed_by=editor, claim_expires_at=expires
+            )
+
+        return list(
+            _queue()
+            .filter(claimed_by=editor, claim_expires_at=expires)
+            .order_by('created_at', 'pk')
+            .values_list('pk', flat=True)
+        )
+
+
+def renew_claims(editor, entity_ids=None):
+    """
+    Extend the editor's live leases (all of them, or just ``entity_ids``).
+    Returns the renewed IDs and the new expiry; expired leases cannot be
+    renewed and have to be claimed again.
+    """
+    now = timezone.now()
+    expires = now + LEASE_DURATION
+    leases = _queue().filter(_held_by(editor, now))
+    if entity_ids is not None:
+        leases = leases.filter(pk__in=entity_ids)
+    with transaction.atomic():
+        leases.update(claim_expires_at=expires)
+        renewed = list(
+            _queue()
+            .filter(claimed_by=editor, claim_expires_at=expires)
+            .values_list('pk', flat=True)
+        )
+    return renewed, expires
+
+
+def release_claims(editor, entity_ids=None):
+    """Hand the editor's leases back to the queue; returns how many were released"""
+    leases = CulturalEntity.objects.filter(claimed_by=editor)
+    if entity_ids is not None:
+        leases = leases.filter(pk__in=entity_ids)
+    return leases.update(claimed_by=None, claim_expires_at=None)
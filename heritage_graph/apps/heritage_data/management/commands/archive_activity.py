@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.heritage_data.archive import (
+    ARCHIVE_MODELS,
+    DEFAULT_BATCH_SIZE,
+    archive_kind,
+    retention_cutoff,
+)
+from apps.heritage_data.exports import parse_since
+
+
+class Command(BaseCommand):
+    help = (
+        "Move activity rows older than the retention window into monthly "
+        "gzip NDJSON archives under ACTIVITY_ARCHIVE_DIR"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind",
+            choices=sorted(ARCHIVE_MODELS),
+            action="append",
+            help="Table to archive (repeatable, default: all)",
+        )
+        parser.add_argument(
+            "--before",
+            help="Only archive rows before this ISO date, rounded down to the start "
+            "of its month (never later than the retention cutoff)",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            before = parse_since(options["before"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for kind in options["kind"] or sorted(ARCHIVE_MODELS):
+            cutoff = retention_cutoff(kind)
+            if before is not None:
+                cutoff = min(
+                    cutoff,
+                    before.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+                )
+            moved = archive_kind(kind, cutoff, batch_size=options["batch_size"])
+            for month, count in moved.items():
+                self.stdout.write(f"{kind} {month}: archived {count} rows")
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{kind}: archived {sum(moved.values())} rows before {cutoff:%Y-%m-%d}"
+                )
+            )
+
+
+# Usage:
+# python manage.py archive_activity
+# python manage.py archive_activity --kind activitylog --before 2025-01-01
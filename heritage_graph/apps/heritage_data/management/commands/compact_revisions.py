@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.heritage_data.diffs import apply_diff, diff_documents
+from apps.heritage_data.models import CulturalEntity, Revision
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrite CulturalEntity revision history as keyframe snapshots plus "
+        "diffs, dropping snapshots that are no longer needed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of revisions updated per bulk_update",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        compacted = 0
+
+        entities = CulturalEntity.objects.values_list(
+            "pk", "current_revision_id", "latest_revision_id"
+        )
+        for entity_id, current_id, latest_id in entities.iterator(chunk_size=500):
+            with transaction.atomic():
+                compacted += self.compact_entity(
+                    entity_id, {current_id, latest_id}, batch_size
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Compacted {compacted} revisions"))
+
+    def compact_entity(self, entity_id, pinned, batch_size):
+        revisions = (
+            Revision.objects.select_for_update()
+            .filter(entity_id=entity_id)
+            .order_by("revision_number")
+        )
+        changed = []
+        previous = None
+        for revision in revisions:
+            # Rebuild from what is stored so re-running the command is safe
+            if revision.snapshot is not None:
+                data = revision.snapshot
+            else:
+                data = apply_diff(previous, revision.diff or [])
+            revision.diff = (
+                diff_documents(previous, data) if previous is not None else None
+            )
+            keep = (
+                Revision.is_keyframe(revision.revision_number)
+                or revision.pk in pinned
+            )
+            revision.snapshot = data if keep else None
+            changed.append(revision)
+            previous = data
+
+        # The newest revision always keeps its snapshot
+        if changed:
+            changed[-1].snapshot = previous
+
+        Revision.objects.bulk_update(
+            changed, ["snapshot", "diff"], batch_size=batch_size
+        )
+        return len(changed)
+
+
+# Usage:
+# python manage.py compact_revisions
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.heritage_data.outbox import (
+    DEFAULT_BATCH_SIZE,
+    drain_outbox,
+    partition_shards,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Carry out pending outbox events (activities, feeds, notifications). "
+        "Run several workers with --partitions/--partition to split the load; "
+        "each entity's events always go to the same worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Events handled per transaction",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new events instead of exiting when drained",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between polls in --loop mode",
+        )
+        parser.add_argument("--partitions", type=int, default=1)
+        parser.add_argument("--partition", type=int, default=0)
+
+    def handle(self, *args, **options):
+        partitions, partition = options["partitions"], options["partition"]
+        if partitions < 1 or not 0 <= partition < partitions:
+            raise CommandError("--partition must be between 0 and --partitions - 1")
+        shards = partition_shards(partitions, partition) if partitions > 1 else None
+
+        while True:
+            processed = drain_outbox(shards=shards, batch_size=options["batch_size"])
+            if processed:
+                self.stdout.write(f"Processed {processed} outbox events")
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS("Outbox drained"))
+
+
+# Usage:
+# python manage.py drain_outbox
+# python manage.py drain_outbox --loop --partitions 4 --partition 0
@@ -0,0 +1,80 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.heritage_data.exports import (
+    DEFAULT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    get_export_queryset,
+    parse_since,
+    stream_export,
+)
+from apps.heritage_data.models import STATUS_CHOICES
+
+
+class Command(BaseCommand):
+    help = "Stream Submission rows to CSV, NDJSON or Parquet"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=EXPORT_FORMATS, default="csv", help="Output format"
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write to (default: '-' for stdout)",
+        )
+        parser.add_argument(
+            "--status",
+            choices=[choice for choice, _ in STATUS_CHOICES],
+            help="Only export submissions with this status",
+        )
+        parser.add_argument(
+            "--district", help="Only export submissions from this district"
+        )
+        parser.add_argument(
+            "--since",
+            help="Incremental mode: only export submissions created at or "
+            "after this ISO date/datetime",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Rows fetched per database round trip",
+        )
+
+    def handle(self, *args, **options):
+        export_format = options["format"]
+        output = options["output"]
+
+        try:
+            queryset = get_export_queryset(
+                status=options["status"],
+                district=options["district"],
+                since=parse_since(options["since"]),
+            )
+            chunks = stream_export(
+                export_format, queryset, chunk_size=options["chunk_size"]
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if output == "-":
+            self.write_chunks(chunks, sys.stdout.buffer)
+        else:
+            with open(output, "wb") as stream:
+                self.write_chunks(chunks, stream)
+            self.stderr.write(self.style.SUCCESS(f"Exported submissions to {output}"))
+
+    def write_chunks(self, chunks, stream):
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            stream.write(chunk)
+        stream.flush()
+
+
+# Usage:
+# python manage.py export_submissions --format parquet --output submissions.parquet
+# python manage.py export_submissions --format ndjson --since 2025-01-01 --status accepted
@@ -0,0 +1,153 @@
+import json
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.heritage_data.importers import (
+    DEFAULT_BATCH_SIZE,
+    SubmissionBatchWriter,
+    build_submission_data,
+)
+
+JSON_EXTENSIONS = (".json",)
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+
+def iter_label_values(node, label=None):
+    """
+    Flatten an Arches resource document into (label, value) pairs in
+    document order. Nodes are keyed by their label and carry the rendered
+    value in '@display_value'; repeated node groups are lists.
+    """
+    if isinstance(node, list):
+        for item in node:
+            yield from iter_label_values(item, label)
+    elif isinstance(node, dict):
+        if label is not None and "@display_value" in node:
+            yield label, str(node["@display_value"] or "")
+        for key, value in node.items():
+            if not key.startswith("@"):
+                yield from iter_label_values(value, key)
+    elif label is not None and node is not None:
+        yield label, str(node)
+
+
+class Command(BaseCommand):
+    help = "Import Arches resource JSON or NDJSON dumps into Submission model"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="+",
+            type=str,
+            help="JSON/NDJSON files, or directories containing them",
+        )
+        parser.add_argument(
+            "--user-id", type=int, required=True, help="ID of contributor user"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of submissions written per database batch",
+        )
+        parser.add_argument(
+            "--json-path",
+            default="item",
+            help="ijson prefix of the resource list inside .json files, "
+            "e.g. 'item' for a top-level array or 'business_data.resources.item'",
+        )
+
+    def handle(self, *args, **options):
+        user_id = options["user_id"]
+
+        try:
+            contributor = User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            self.stdout.write(
+                self.style.ERROR(f"User with ID {user_id} does not exist")
+            )
+            return
+
+        files = self.collect_files(options["paths"])
+        if not files:
+            self.stdout.write(self.style.WARNING("No JSON or NDJSON files found"))
+            return
+
+        writer = SubmissionBatchWriter(contributor, batch_size=options["batch_size"])
+
+        for file_path in files:
+            self.stdout.write(f"Processing {file_path}...")
+            for record in self.iter_records(file_path, options["json_path"]):
+                submission_data = self.map_record(record)
+                if submission_data is None:
+                    self.stdout.write(
+                        self.style.WARNING(f"Skipping record without an ID in {file_path}")
+                    )
+                    continue
+                writer.add(submission_data)
+
+        writer.close()
+        for error in writer.errors:
+            self.stdout.write(self.style.ERROR(error))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {writer.created} and updated {writer.updated} submissions"
+            )
+        )
+
+    def collect_files(self, paths):
+        extensions = JSON_EXTENSIONS + NDJSON_EXTENSIONS
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(
+                    os.path.join(path, name)
+                    for name in sorted(os.listdir(path))
+                    if name.endswith(extensions)
+                )
+            elif os.path.isfile(path):
+                files.append(path)
+            else:
+                self.stdout.write(self.style.ERROR(f"Path {path} does not exist"))
+        return files
+
+    def iter_records(self, file_path, json_path):
+        """Yield resource documents one at a time without loading the file"""
+        if file_path.endswith(NDJSON_EXTENSIONS):
+            with open(file_path, "r", encoding="utf-8") as stream:
+                for line in stream:
+                    if line.strip():
+                        yield json.loads(line)
+            return
+
+        try:
+            import ijson
+        except ImportError:
+            raise CommandError("Importing .json files requires the 'ijson' package.")
+
+        with open(file_path, "rb") as stream:
+            yield from ijson.items(stream, json_path, use_float=True)
+
+    def map_record(self, record):
+        resource_instance = record.get("resourceinstance", {})
+        resource_id = record.get("resourceinstanceid") or resource_instance.get(
+            "resourceinstanceid"
+        )
+        if not resource_id:
+            return None
+
+        fallback_title = record.get("displayname") or resource_instance.get(
+            "name", ""
+        )
+        return build_submission_data(
+            str(resource_id),
+            iter_label_values(record.get("resource", {})),
+            fallback_title=fallback_title,
+        )
+
+
+# Usage:
+# python manage.py import_arches /path/to/dumps --user-id 1
+# python manage.py import_arches export.json --user-id 1 --json-path business_data.resources.item
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from apps.heritage_data.models import Activity, FeedEntry, fan_out_activities
+
+
+class Command(BaseCommand):
+    help = (
+        "Populate the per-user activity feeds from the activities table "
+        "(run once after adding the feed table, or to repair missing entries)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Activities fanned out per batch",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete all feed entries before rebuilding",
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            FeedEntry.objects.all().delete()
+
+        batch_size = options["batch_size"]
+        batch = []
+        total = 0
+        # Oldest first so retention trimming keeps the newest entries
+        for activity in Activity.objects.order_by("created_at").iterator(
+            chunk_size=batch_size
+        ):
+            batch.append(activity)
+            if len(batch) >= batch_size:
+                fan_out_activities(batch)
+                total += len(batch)
+                batch = []
+        fan_out_activities(batch)
+        total += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Fanned out {total} activities into user feeds")
+        )
+
+
+# Usage:
+# python manage.py rebuild_activity_feeds
+# python manage.py rebuild_activity_feeds --clear --batch-size 5000
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from apps.heritage_data.models import CulturalEntity, EntityCounter
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the entity_counters table from cultural_entities and report "
+        "any drift that was repaired"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drift, do not write",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Lock the counters first so writers wait for the rebuild instead
+            # of applying deltas to rows that are about to be overwritten
+            stored = {
+                (row.status, row.category): row
+                for row in EntityCounter.objects.select_for_update()
+            }
+            actual = {
+                (row["status"], row["category"]): row["total"]
+                for row in CulturalEntity.objects.order_by()
+                .values("status", "category")
+                .annotate(total=Count("pk"))
+            }
+
+            to_create, to_update = [], []
+            for key in sorted(set(stored) | set(actual)):
+                expected = actual.get(key, 0)
+                row = stored.get(key)
+                current = row.count if row else 0
+                if current == expected:
+                    continue
+                self.stdout.write(
+                    f"{key[0]}/{key[1]}: stored {current}, actual {expected}"
+                )
+                if row is None:
+                    to_create.append(
+                        EntityCounter(status=key[0], category=key[1], count=expected)
+                    )
+                else:
+                    row.count = expected
+                    to_update.append(row)
+
+            if options["dry_run"]:
+                transaction.set_rollback(True)
+            else:
+                EntityCounter.objects.bulk_create(to_create)
+                EntityCounter.objects.bulk_update(to_update, ["count"])
+
+        drift = len(to_create) + len(to_update)
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Entity counters are in sync"))
+        elif options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"{drift} counters have drifted"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {drift} counters"))
+
+
+# Usage:
+# python manage.py reconcile_entity_counters
+# python manage.py reconcile_entity_counters --dry-run
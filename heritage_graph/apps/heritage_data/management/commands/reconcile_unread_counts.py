@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from apps.heritage_data.unread import UNREAD_COUNTERS
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild every unread notification counter table from its "
+        "notifications and report any drift that was repaired"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drift, do not write",
+        )
+
+    def handle(self, *args, **options):
+        for counters in UNREAD_COUNTERS:
+            drift = counters.reconcile(dry_run=options["dry_run"])
+            for user_id, (stored, actual) in drift.items():
+                self.stdout.write(f"{counters} user {user_id}: stored {stored}, actual {actual}")
+            if not drift:
+                self.stdout.write(self.style.SUCCESS(f"{counters}: in sync"))
+            elif options["dry_run"]:
+                self.stdout.write(self.style.WARNING(f"{counters}: {len(drift)} counters have drifted"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{counters}: repaired {len(drift)} counters"))
+
+
+# Usage:
+# python manage.py reconcile_unread_counts
+# python manage.py reconcile_unread_counts --dry-run
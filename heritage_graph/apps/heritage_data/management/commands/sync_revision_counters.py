@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from apps.heritage_data.models import CulturalEntity, Revision
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute CulturalEntity.revision_count and latest_revision from the "
+        "revisions table (run once after adding the columns, or to repair drift)"
+    )
+
+    def handle(self, *args, **options):
+        revisions = Revision.objects.filter(entity=OuterRef("pk")).order_by()
+        updated = CulturalEntity.objects.update(
+            revision_count=Coalesce(
+                Subquery(
+                    revisions.values("entity")
+                    .annotate(latest=Max("revision_number"))
+                    .values("latest")
+                ),
+                0,
+            ),
+            latest_revision=Subquery(
+                revisions.order_by("-revision_number").values("pk")[:1]
+            ),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Synced revision counters for {updated} entities")
+        )
+
+
+# Usage:
+# python manage.py sync_revision_counters
@@ -1,13 +1,24 @@
 import secrets
 import string
 import uuid
+import zlib
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .diffs import apply_diff, diff_documents
+from .unread import UnreadCounters
 
 User = get_user_model()  # noqa: F811
 
+# Marks Revision.data as not yet rebuilt from snapshot and diffs
+_NOT_LOADED = object()
+
 
 def generate_unique_submission_id(length=11, max_attempts=100):
     characters = string.ascii_letters + string.digits
@@ -26,80 +37,121 @@ def get_current_revision_data(self):
 
 def get_latest_revision(self):
     """Get the most recent revision for this entity"""
+    if self.latest_revision_id:
+        return self.latest_revision
     return self.revisions.order_by('-revision_number').first()
 
 def submit_for_review(self):
     """Submit the entity for editor review"""
     self.status = 'pending_review'
-    self.save()
+    self.save(update_fields=['status', 'updated_at'])
     
     # Log the activity
-    Activity.objects.create(
-        entity=self,
-        user=self.contributor,
-        activity_type='submitted'
-    )
+    publish_events([activity_event(self.pk, self.contributor_id, 'submitted')])
 
 def accept_contribution(self, editor, comment=None):
     """Accept the contribution and set it as published"""
-    latest_revision = self.get_latest_revision()
-    if latest_revision:
-        self.current_revision = latest_revision
+    if self.latest_revision_id:
+        self.current_revision_id = self.latest_revision_id
     self.status = 'accepted'
-    self.save()
+    self.claimed_by = None
+    self.claim_expires_at = None
+    self.save(update_fields=[
+        'current_revision', 'status', 'claimed_by', 'claim_expires_at', 'updated_at'
+    ])
     
     # Log the activity
-    Activity.objects.create(
-        entity=self,
-        user=editor,
-        activity_type='accepted',
-        comment=comment
-    )
+    publish_events([activity_event(self.pk, editor.pk, 'accepted', comment)])
 
 def reject_contribution(self, editor, comment):
     """Reject the contribution"""
     self.status = 'rejected'
-    self.save()
+    self.claimed_by = None
+    self.claim_expires_at = None
+    self.save(update_fields=['status', 'claimed_by', 'claim_expires_at', 'updated_at'])
     
     # Log the activity
-    Activity.objects.create(
-        entity=self,
-        user=editor,
-        activity_type='rejected',
-        comment=comment
-    )
+    publish_events([activity_event(self.pk, editor.pk, 'rejected', comment)])
 
 def create_revision(self, user, form_data):
-    """Create a new revision for this entity"""
-    latest_rev = self.get_latest_revision()
-    new_revision_number = latest_rev.revision_number + 1 if latest_rev else 1
-    
-    new_revision = Revision.objects.create(
-        entity=self,
-        data=form_data,
-        revision_number=new_revision_number,
-        created_by=user
-    )
-    
-    # Update entity status
-    self.status = 'pending_revision'
-    self.save()
-    
-    # Log the activity
-    Activity.objects.create(
-        entity=self,
-        user=user,
-        activity_type='revised'
-    )
-    
+    """
+    Create a new revision for this entity.
+
+    The entity row is locked while the next number is reserved, so
+    concurrent revisions are serialised and never share a number. The new
+    revision stores a full snapshot plus a diff against the previous one;
+    the previous revision then drops its snapshot unless it is a keyframe
+    or the entity's current revision.
+    """
+    revision_id = uuid.uuid4()
+    with transaction.atomic():
+        entities = CulturalEntity.objects.filter(pk=self.pk)
+        locked = (
+            entities.select_for_update(of=('self',))
+            .select_related('latest_revision')
+            .only(
+                'status',
+                'category',
+                'revision_count',
+                'current_revision_id',
+                'latest_revision__revision_number',
+                'latest_revision__snapshot',
+            )
+            .get()
+        )
+        previous = locked.latest_revision
+        revision_number = locked.revision_count + 1
+
+        entities.update(
+            revision_count=F('revision_count') + 1,
+            latest_revision_id=revision_id,
+            status='pending_revision',
+            updated_at=timezone.now(),
+        )
+        if locked.status != 'pending_revision':
+            adjust_entity_counters({
+                (locked.status, locked.category): -1,
+                ('pending_revision', locked.category): 1,
+            })
+
+        new_revision = Revision.objects.create(
+            revision_id=revision_id,
+            entity=self,
+            snapshot=form_data,
+            diff=diff_documents(previous.data, form_data) if previous else None,
+            revision_number=revision_number,
+            created_by=user
+        )
+        if previous and not (
+            Revision.is_keyframe(previous.revision_number)
+            or previous.pk == locked.current_revision_id
+        ):
+            Revision.objects.filter(pk=previous.pk).update(snapshot=None)
+
+        self.revision_count = revision_number
+        self.latest_revision = new_revision
+        self.status = 'pending_revision'
+
+        # Log the activity
+        publish_events([activity_event(self.pk, user.pk, 'revised')])
+
     return new_revision
 
 
+# Statuses an entity must be in to be moderated from the contribution queue
+MODERATION_QUEUE_STATUSES = ['pending_review', 'pending_revision']
+
 # Utility functions for views and management
+def is_claimed_by_other(claimed_by_id, claim_expires_at, editor, now=None):
+    """True while another editor holds a live moderation lease on the entity"""
+    if claimed_by_id is None or claimed_by_id == editor.pk:
+        return False
+    return claim_expires_at is not None and claim_expires_at >= (now or timezone.now())
+
 def get_contribution_queue():
     """Get all entities pending review or revision"""
     return CulturalEntity.objects.filter(
-        status__in=['pending_review', 'pending_revision']
+        status__in=MODERATION_QUEUE_STATUSES
     ).select_related('contributor', 'current_revision')
 
 def get_user_contributions(user):
@@ -115,6 +167,80 @@ def get_entity_history(entity_id):
         'activities': entity.activities.all().select_related('user')
     }
 
+def bulk_moderate(entity_ids, editor, action, comment=None):
+    """
+    Accept or reject many queued entities in one transaction.
+
+    Status and current-revision pointers are written with a single UPDATE,
+    and the matching activities with one bulk insert. Returns one result per
+    requested ID, in request order: the new status, or ``not_found`` /
+    ``skipped`` when the entity is missing, no longer in the queue or leased
+    to another editor. Moderated entities drop any lease they had.
+    """
+    new_status = {'accept': 'accepted', 'reject': 'rejected'}[action]
+    entity_ids = list(dict.fromkeys(str(entity_id) for entity_id in entity_ids))
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        current = {
+            str(pk): (entity_status, category, claimed_by_id, claim_expires_at)
+            for pk, entity_status, category, claimed_by_id, claim_expires_at in (
+                CulturalEntity.objects.select_for_update()
+                .filter(pk__in=entity_ids)
+                .values_list(
+                    'pk', 'status', 'category', 'claimed_by_id', 'claim_expires_at'
+                )
+            )
+        }
+        skipped = {}
+        for entity_id, (entity_status, _, claimed_by_id, claim_expires_at) in current.items():
+            if entity_status not in MODERATION_QUEUE_STATUSES:
+                skipped[entity_id] = f"Entity is {entity_status}, not in the moderation queue"
+            elif is_claimed_by_other(claimed_by_id, claim_expires_at, editor, now):
+                skipped[entity_id] = "Entity is claimed by another editor"
+        eligible = [
+            entity_id for entity_id in entity_ids
+            if entity_id in current and entity_id not in skipped
+        ]
+
+        if eligible:
+            changes = {
+                'status': new_status,
+                'updated_at': now,
+                'claimed_by': None,
+                'claim_expires_at': None,
+            }
+            if action == 'accept':
+                changes['current_revision_id'] = Coalesce(
+                    F('latest_revision_id'), F('current_revision_id')
+                )
+            CulturalEntity.objects.filter(pk__in=eligible).update(**changes)
+            deltas = {}
+            for entity_id in eligible:
+                entity_status, category = current[entity_id][:2]
+                for key, delta in (((entity_status, category), -1), ((new_status, category), 1)):
+                    deltas[key] = deltas.get(key, 0) + delta
+            adjust_entity_counters(deltas)
+            publish_events([
+                activity_event(entity_id, editor.pk, new_status, comment)
+                for entity_id in eligible
+            ])
+
+    results = []
+    for entity_id in entity_ids:
+        if entity_id not in current:
+            results.append({'entity_id': entity_id, 'result': 'not_found'})
+        elif entity_id in skipped:
+            results.append({
+                'entity_id': entity_id,
+                'result': 'skipped',
+                'detail': skipped[entity_id],
+            })
+        else:
+            results.append({'entity_id': entity_id, 'result': new_status})
+    return results
+
 class CulturalEntity(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
@@ -159,6 +285,28 @@ class CulturalEntity(models.Model):
         related_name='contributed_entities',
         verbose_name="Contributor"
     )
+    revision_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Revision Count",
+        help_text="Number of the latest revision, maintained by create_revision"
+    )
+    claimed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='claimed_entities',
+        verbose_name="Claimed By",
+        help_text="Editor currently holding the moderation lease"
+    )
+    claim_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Claim Expires At"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
 
@@ -170,12 +318,70 @@ class CulturalEntity(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['category']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['status', 'claim_expires_at']),
         ]
         ordering = ['-created_at']
 
     def __str__(self):
         return f"{self.name} ({self.get_status_display()})"
 
+    def save(self, *args, **kwargs):
+        # The counter signals lock and read the stored (status, category) in
+        # pre_save and adjust the counters in post_save; one transaction
+        # keeps concurrent saves from both moving the same old key
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class EntityCounter(models.Model):
+    """
+    Number of CulturalEntity rows per (status, category), kept in step with
+    the entities table so dashboards never have to GROUP BY it.
+    """
+    status = models.CharField(max_length=20, verbose_name="Status")
+    category = models.CharField(max_length=100, verbose_name="Category")
+    count = models.BigIntegerField(default=0, verbose_name="Count")
+
+    class Meta:
+        db_table = 'entity_counters'
+        verbose_name = "Entity Counter"
+        verbose_name_plural = "Entity Counters"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['status', 'category'], name='unique_entity_counter'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.status}/{self.category}: {self.count}"
+
+def adjust_entity_counters(deltas):
+    """
+    Apply ``{(status, category): delta}`` to the counters table inside the
+    caller's transaction. Rows are updated in a fixed order so concurrent
+    writers cannot deadlock on each other.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        EntityCounter.objects.bulk_create(
+            [EntityCounter(status=key[0], category=key[1]) for key in deltas],
+            ignore_conflicts=True,
+        )
+        for (entity_status, category), delta in sorted(deltas.items()):
+            EntityCounter.objects.filter(
+                status=entity_status, category=category
+            ).update(count=F('count') + delta)
+
+def get_entity_counters():
+    """Return the whole counter matrix as ``{status: {category: count}}``"""
+    matrix = {}
+    for entity_status, category, count in EntityCounter.objects.exclude(
+        count=0
+    ).values_list('status', 'category', 'count'):
+        matrix.setdefault(entity_status, {})[category] = count
+    return matrix
+
 class Revision(models.Model):
     revision_id = models.UUIDField(
         primary_key=True, 
@@ -189,9 +395,19 @@ class Revision(models.Model):
         related_name='revisions',
         verbose_name="Cultural Entity"
     )
-    data = models.JSONField(
-        verbose_name="Revision Data",
-        help_text="Complete form data for this revision in JSON format"
+    snapshot = models.JSONField(
+        null=True,
+        blank=True,
+        db_column='data',
+        verbose_name="Snapshot",
+        help_text="Complete form data, kept on keyframes and on the latest and "
+        "current revision of the entity"
+    )
+    diff = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name="Diff",
+        help_text="JSON Patch operations against the previous revision"
     )
     revision_number = models.PositiveIntegerField(
         default=1,
@@ -212,13 +428,82 @@ class Revision(models.Model):
         indexes = [
             models.Index(fields=['entity', 'revision_number']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['entity', 'created_at']),
         ]
         ordering = ['entity', '-revision_number']
         unique_together = ['entity', 'revision_number']
 
+    # Every SNAPSHOT_INTERVAL-th revision keeps its full snapshot, which bounds
+    # how many diffs have to be replayed to rebuild any revision
+    SNAPSHOT_INTERVAL = 10
+
+    _materialized_data = _NOT_LOADED
+
     def __str__(self):
         return f"Revision {self.revision_number} for {self.entity.name}"
 
+    @classmethod
+    def is_keyframe(cls, revision_number):
+        return (revision_number - 1) % cls.SNAPSHOT_INTERVAL == 0
+
+    @property
+    def data(self):
+        """Complete form data for this revision, rebuilt from diffs if needed"""
+        if self._materialized_data is _NOT_LOADED:
+            materialize_revisions([self])
+        return self._materialized_data
+
+    @data.setter
+    def data(self, value):
+        self.snapshot = value
+        self._materialized_data = value
+
+
+def materialize_revisions(revisions):
+    """
+    Fill in ``data`` for a batch of revisions. Revisions that carry a
+    snapshot are served directly; the rest cost one query per entity, which
+    reads back from the nearest keyframe and replays the diffs in order.
+    """
+    wanted = {}
+    for revision in revisions:
+        if revision._materialized_data is not _NOT_LOADED:
+            continue
+        if 'snapshot' not in revision.get_deferred_fields() and revision.snapshot is not None:
+            revision._materialized_data = revision.snapshot
+            continue
+        wanted.setdefault(revision.entity_id, {}).setdefault(
+            revision.revision_number, []
+        ).append(revision)
+
+    for entity_id, by_number in wanted.items():
+        keyframe = (
+            Revision.objects.filter(
+                entity_id=entity_id,
+                revision_number__lte=min(by_number),
+                snapshot__isnull=False,
+            )
+            .order_by('-revision_number')
+            .values('revision_number')[:1]
+        )
+        rows = (
+            Revision.objects.filter(
+                entity_id=entity_id,
+                revision_number__gte=models.Subquery(keyframe),
+                revision_number__lte=max(by_number),
+            )
+            .order_by('revision_number')
+            .values_list('revision_number', 'snapshot', 'diff')
+        )
+        state = None
+        for number, snapshot, diff in rows:
+            if snapshot is not None:
+                state = snapshot
+            elif diff:
+                state = apply_diff(state, diff)
+            for revision in by_number.get(number, []):
+                revision._materialized_data = state
+
 class Activity(models.Model):
     ACTIVITY_TYPES = [
         ('submitted', 'Submitted'),
@@ -257,7 +542,10 @@ class Activity(models.Model):
         verbose_name="Comment",
         help_text="Optional comment from editor or contributor"
     )
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    # Set from the outbox event so the activity keeps the time of the action
+    created_at = models.DateTimeField(
+        default=timezone.now, editable=False, verbose_name="Created At"
+    )
 
     class Meta:
         db_table = 'activities'
@@ -266,12 +554,163 @@ class Activity(models.Model):
         indexes = [
             models.Index(fields=['entity', 'activity_type']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['entity', 'created_at']),
         ]
         ordering = ['-created_at']
 
     def __str__(self):
         return f"{self.get_activity_type_display()} by {self.user.username} on {self.entity.name}"
 
+class FeedEntry(models.Model):
+    """
+    One user's copy of an activity. Every activity is fanned out to its
+    actor and to the entity's contributor when it is written, so a feed is
+    read with a range scan on (owner, created_at) instead of an OR across
+    the activities and entities tables.
+    """
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name="Feed Owner"
+    )
+    activity = models.ForeignKey(
+        Activity,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name="Activity"
+    )
+    # Copied from the activity so the feed index alone can order a page
+    created_at = models.DateTimeField(verbose_name="Created At")
+
+    class Meta:
+        db_table = 'activity_feed'
+        verbose_name = "Feed Entry"
+        verbose_name_plural = "Feed Entries"
+        indexes = [
+            models.Index(fields=['owner', 'created_at', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'activity'], name='unique_feed_entry'
+            ),
+        ]
+
+# Newest entries kept per feed; older ones are trimmed as new ones arrive
+FEED_RETENTION = 500
+
+def fan_out_activities(activities):
+    """
+    Copy ``activities`` into the feeds of their actors and of the entity
+    contributors, then trim every touched feed to FEED_RETENTION entries.
+    """
+    if not activities:
+        return
+    contributors = {
+        str(entity_id): contributor_id
+        for entity_id, contributor_id in CulturalEntity.objects.filter(
+            pk__in={activity.entity_id for activity in activities}
+        ).values_list('pk', 'contributor_id')
+    }
+    entries = []
+    for activity in activities:
+        owners = {activity.user_id, contributors.get(str(activity.entity_id))} - {None}
+        entries.extend(
+            FeedEntry(owner_id=owner_id, activity=activity, created_at=activity.created_at)
+            for owner_id in owners
+        )
+
+    with transaction.atomic():
+        FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        for owner_id in {entry.owner_id for entry in entries}:
+            trim_feed(owner_id)
+
+def trim_feed(owner_id, keep=FEED_RETENTION):
+    """Delete a user's feed entries beyond the newest ``keep``"""
+    feed = FeedEntry.objects.filter(owner_id=owner_id)
+    oldest_kept = (
+        feed.order_by('-created_at', '-id')
+        .values_list('created_at', 'id')[keep - 1:keep]
+        .first()
+    )
+    if oldest_kept is None:
+        return 0
+    created_at, entry_id = oldest_kept
+    deleted, _ = feed.filter(
+        models.Q(created_at__lt=created_at)
+        | models.Q(created_at=created_at, id__lt=entry_id)
+    ).delete()
+    return deleted
+
+class OutboxEvent(models.Model):
+    """
+    A side effect recorded in the same transaction as the change that
+    caused it and carried out later by the drain_outbox worker
+    (see outbox.py). Events of one entity are handled strictly in id order;
+    processed events are kept so consumers can be replayed.
+    """
+    event_type = models.CharField(max_length=50, verbose_name="Event Type")
+    entity_id = models.UUIDField(null=True, blank=True, verbose_name="Entity ID")
+    shard = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Shard",
+        help_text="Derived from the entity so one worker owns all of its events"
+    )
+    payload = models.JSONField(default=dict, verbose_name="Payload")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Created At")
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Processed At")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Attempts")
+    last_error = models.TextField(blank=True, default='', verbose_name="Last Error")
+
+    class Meta:
+        db_table = 'outbox_events'
+        verbose_name = "Outbox Event"
+        verbose_name_plural = "Outbox Events"
+        indexes = [
+            models.Index(
+                fields=['shard', 'id'],
+                condition=models.Q(processed_at__isnull=True),
+                name='outbox_pending_idx',
+            ),
+        ]
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.event_type} #{self.pk}"
+
+OUTBOX_SHARDS = 16
+
+def outbox_shard(entity_id):
+    return zlib.crc32(str(entity_id).encode()) % OUTBOX_SHARDS if entity_id else 0
+
+def activity_event(entity_id, user_id, activity_type, comment=None):
+    """Build (but do not save) the outbox event that will create an Activity"""
+    return OutboxEvent(
+        event_type='activity',
+        entity_id=entity_id,
+        shard=outbox_shard(entity_id),
+        payload={
+            'activity_id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'activity_type': activity_type,
+            'comment': comment,
+        },
+    )
+
+def publish_events(events):
+    """
+    Insert outbox events in the caller's transaction. With
+    OUTBOX_DISPATCH_ON_COMMIT (local development) they are also handled
+    right after the commit instead of waiting for a worker.
+    """
+    events = OutboxEvent.objects.bulk_create(events)
+    if events and getattr(settings, 'OUTBOX_DISPATCH_ON_COMMIT', False):
+        from .outbox import drain_outbox
+
+        shards = {event.shard for event in events}
+        transaction.on_commit(lambda: drain_outbox(shards=shards))
+    return events
+
 CulturalEntity.add_to_class(
     'current_revision',
     models.ForeignKey(
@@ -283,6 +722,18 @@ CulturalEntity.add_to_class(
         verbose_name="Current Revision"
     )
 )
+CulturalEntity.add_to_class(
+    'latest_revision',
+    models.ForeignKey(
+        Revision,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='latest_for_entity',
+        verbose_name="Latest Revision"
+    )
+)
 
 # Add the methods to the CulturalEntity class
 CulturalEntity.get_current_revision_data = get_current_revision_data
@@ -574,6 +1025,12 @@ class ActivityLog(models.Model):
     description = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-timestamp"]),
+            models.Index(fields=["user", "-timestamp"]),
+        ]
+
     def __str__(self):
         return (
             f"{self.user.username} {self.get_action_display()}"
@@ -703,6 +1160,13 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Inbox pages, all or unread only, newest first
+            models.Index(fields=["user", "-created_at"]),
+            models.Index(fields=["user", "is_read", "-created_at"]),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.notification_id:
             self.notification_id = self.generate_unique_notification_id()
@@ -721,3 +1185,27 @@ class Notification(models.Model):
     def __str__(self):
         status = "Read" if self.is_read else "Unread"
         return f"Notification for {self.user.username} ({status}): {self.message[:50]}"
+
+
+class NotificationCounter(models.Model):
+    """Per-user count of unread notifications, so badges skip COUNT(*)"""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="notification_counter",
+    )
+    unread = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "notification_counters"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
+unread_counters = UnreadCounters(NotificationCounter, Notification)
+adjust_unread_counts = unread_counters.adjust
+get_unread_count = unread_counters.get
+mark_notifications_read = unread_counters.mark_read
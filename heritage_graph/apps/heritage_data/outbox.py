@@ -0,0 +1,197 @@
+"""
+Draining the transactional outbox.
+
+Requests only insert OutboxEvent rows; drain_outbox turns them into their
+side effects (activities, feed entries, notifications) in batches. Events
+are taken in id order and consecutive events of the same type are handed to
+their handler together, so per-entity order is preserved while writes stay
+batched. An event that fails holds back the later events of its entity
+until it succeeds or is given up on after MAX_ATTEMPTS. Events without an
+entity (such as CIDOC fan-out) name what they are ordered by in their
+payload's ``order_key`` instead.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    OUTBOX_SHARDS,
+    Activity,
+    CulturalEntity,
+    OutboxEvent,
+    User,
+    fan_out_activities,
+)
+from .push import publish_activity_events
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+MAX_ATTEMPTS = 5
+
+HANDLERS = {}
+
+
+def handles(event_type):
+    """Register a handler taking a list of events of ``event_type``"""
+
+    def register(func):
+        HANDLERS[event_type] = func
+        return func
+
+    return register
+
+
+@handles('activity')
+def create_activities(events):
+    # Entities or users deleted since the event was written are skipped
+    entity_ids = set(
+        CulturalEntity.objects.filter(
+            pk__in={event.entity_id for event in events}
+        ).values_list('pk', flat=True)
+    )
+    user_ids = set(
+        User.objects.filter(
+            pk__in={event.payload['user_id'] for event in events}
+        ).values_list('pk', flat=True)
+    )
+    activities = Activity.objects.bulk_create(
+        [
+            Activity(
+                activity_id=event.payload['activity_id'],
+                entity_id=event.entity_id,
+                user_id=event.payload['user_id'],
+                activity_type=event.payload['activity_type'],
+                comment=event.payload.get('comment'),
+                created_at=event.created_at,
+            )
+            for event in events
+            if event.entity_id in entity_ids and event.payload['user_id'] in user_ids
+        ],
+        ignore_conflicts=True,
+    )
+    fan_out_activities(activities)
+    transaction.on_commit(lambda: publish_activity_events(activities))
+
+
+def hold_key(event):
+    """
+    What a failed ``event`` holds back for the rest of the drain: its
+    entity, else its payload's ``order_key``, else only the event itself
+    """
+    if event.entity_id is not None:
+        return ('entity', event.entity_id)
+    if event.payload.get('order_key') is not None:
+        return ('order', event.payload['order_key'])
+    return ('event', event.pk)
+
+
+def _held_filter(blocked):
+    held = {'entity': [], 'order': [], 'event': []}
+    for kind, value in blocked:
+        held[kind].append(value)
+    return (
+        Q(entity_id__in=held['entity'])
+        | Q(entity_id__isnull=True, payload__order_key__in=held['order'])
+        | Q(pk__in=held['event'])
+    )
+
+
+def _runs(events):
+    """Split events into consecutive runs sharing an event type"""
+    run = []
+    for event in events:
+        if run and run[-1].event_type != event.event_type:
+            yield run
+            run = []
+        run.append(event)
+    if run:
+        yield run
+
+
+def _handle(events):
+    handler = HANDLERS.get(events[0].event_type)
+    if handler is None:
+        raise LookupError(f"No outbox handler for '{events[0].event_type}'")
+    with transaction.atomic():
+        handler(events)
+
+
+def drain_batch(shards=None, batch_size=DEFAULT_BATCH_SIZE, blocked=None):
+    """
+    Handle one batch of pending events. Returns how many were completed
+    (successfully or given up on) and the hold keys (see hold_key()) whose
+    events must wait for a later run; ``blocked`` carries those between
+    batches.
+    """
+    now = timezone.now()
+    blocked = set(blocked or ())
+    with transaction.atomic():
+        pending = OutboxEvent.objects.select_for_update().filter(
+            processed_at__isnull=True
+        )
+        if shards is not None:
+            pending = pending.filter(shard__in=shards)
+        if blocked:
+            pending = pending.exclude(_held_filter(blocked))
+        events = list(pending.order_by('id')[:batch_size])
+
+        done, failed = [], []
+        for run in _runs(events):
+            run = [event for event in run if hold_key(event) not in blocked]
+            if not run:
+                continue
+            try:
+                _handle(run)
+                done.extend(run)
+                continue
+            except Exception:
+                logger.exception("Outbox batch failed, retrying events one by one")
+
+            for event in run:
+                if hold_key(event) in blocked:
+                    continue
+                try:
+                    _handle([event])
+                    done.append(event)
+                except Exception as exc:
+                    event.attempts += 1
+                    event.last_error = repr(exc)
+                    if event.attempts >= MAX_ATTEMPTS:
+                        logger.error("Giving up on outbox event %s: %r", event.pk, exc)
+                        done.append(event)
+                    else:
+                        blocked.add(hold_key(event))
+                    failed.append(event)
+
+        OutboxEvent.objects.filter(pk__in=[event.pk for event in done]).update(
+            processed_at=now
+        )
+        OutboxEvent.objects.bulk_update(failed, ['attempts', 'last_error'])
+    return len(done), blocked
+
+
+def drain_outbox(shards=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Drain batches until nothing is pending. Failed events are retried on
+    the next call, not within this one.
+    """
+    total = 0
+    blocked = set()
+    while True:
+        completed, now_blocked = drain_batch(
+            shards=shards, batch_size=batch_size, blocked=blocked
+        )
+        total += completed
+        # A batch that only failed still moves on: its events are held now
+        if completed == 0 and now_blocked == blocked:
+            return total
+        blocked = now_blocked
+
+
+def partition_shards(partitions, partition):
+    """The shards owned by worker ``partition`` out of ``partitions``"""
+    return [shard for shard in range(OUTBOX_SHARDS) if shard % partitions == partition]
@@ -0,0 +1,144 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+from rest_framework import serializers
+
+
+def plan_queryset(queryset, serializer, limits=None):
+    """
+    Derive select_related / prefetch_related / only() for ``queryset`` from
+    the fields ``serializer`` will actually render.
+
+    - nested serializers on forward FKs become select_related joins,
+    - nested ``many=True`` serializers become Prefetch objects whose inner
+      querysets are planned recursively,
+    - plain model fields become the only() column list.
+
+    ``limits`` maps a relation path (e.g. ``"revisions"``) to the maximum
+    number of related rows prefetched per parent, using the related model's
+    default ordering. only() is skipped for a level as soon as one of its
+    fields reads something the planner cannot see (SerializerMethodField,
+    ``source='*'``, properties).
+    """
+    plan = _plan(queryset.model, serializer, limits or {}, "")
+    if plan["select"]:
+        queryset = queryset.select_related(*plan["select"])
+    if plan["prefetch"]:
+        queryset = queryset.prefetch_related(*plan["prefetch"])
+    if plan["only"] is not None:
+        queryset = queryset.only(*plan["only"])
+    return queryset
+
+
+def _plan(model, serializer, limits, path):
+    only = {model._meta.pk.name}
+    restrict = True
+    select = []
+    prefetch = []
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == "*" or isinstance(field, serializers.SerializerMethodField):
+            restrict = False
+            continue
+
+        name = field.source.split(".")[0]
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            restrict = False
+            continue
+
+        if isinstance(field, serializers.ListSerializer) and model_field.is_relation:
+            prefetch.append(
+                _plan_prefetch(model_field, name, field.child, limits, path)
+            )
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch.append(_plan_many_related(model_field, name, field.child_relation))
+        elif (
+            isinstance(field, serializers.BaseSerializer)
+            and model_field.is_relation
+            and model_field.concrete
+        ):
+            nested = _plan(model_field.related_model, field, limits, f"{path}{name}__")
+            select.append(name)
+            select.extend(f"{name}__{related}" for related in nested["select"])
+            prefetch.extend(_prefix_lookup(name, lookup) for lookup in nested["prefetch"])
+            if nested["only"] is None:
+                only.add(name)
+            else:
+                only.update(f"{name}__{column}" for column in nested["only"])
+        elif isinstance(field, serializers.RelatedField) and not isinstance(
+            field, serializers.PrimaryKeyRelatedField
+        ):
+            # StringRelatedField and friends need the whole related object
+            select.append(name)
+            only.add(name)
+        elif model_field.concrete:
+            only.add(model_field.name)
+        else:
+            restrict = False
+
+    return {
+        "select": select,
+        "prefetch": prefetch,
+        "only": only if restrict else None,
+    }
+
+
+def _plan_prefetch(model_field, name, child, limits, path):
+    related_model = model_field.related_model
+    nested = _plan(related_model, child, limits, f"{path}{name}__")
+
+    inner = related_model._default_manager.all()
+    if nested["select"]:
+        inner = inner.select_related(*nested["select"])
+    if nested["prefetch"]:
+        inner = inner.prefetch_related(*nested["prefetch"])
+    if nested["only"] is not None:
+        columns = set(nested["only"])
+        if model_field.one_to_many:
+            # The reverse FK is needed to attach rows to their parent
+            columns.add(model_field.field.name)
+        inner = inner.only(*columns)
+
+    limit = limits.get(f"{path}{name}")
+    if limit is not None and model_field.one_to_many:
+        inner = _limit_per_parent(inner, model_field.field.name, limit)
+    return Prefetch(name, queryset=inner)
+
+
+def _plan_many_related(model_field, name, child):
+    """Related rows rendered as bare primary keys only need that column"""
+    if isinstance(child, serializers.PrimaryKeyRelatedField) and child.pk_field is None:
+        related_model = model_field.related_model
+        return Prefetch(
+            name,
+            queryset=related_model._default_manager.only(related_model._meta.pk.name),
+        )
+    return name
+
+
+def _limit_per_parent(queryset, parent_field, limit):
+    """
+    Keep the first ``limit`` rows per parent in the model's default ordering.
+    A ranked window filter is used instead of a slice because the related
+    manager still has to apply its own filter to the prefetch queryset.
+    """
+    order_by = [
+        F(name[1:]).desc() if name.startswith("-") else F(name).asc()
+        for name in queryset.model._meta.ordering
+        if name.lstrip("-") != parent_field
+    ] or [F(queryset.model._meta.pk.name).asc()]
+    return queryset.annotate(
+        _parent_rank=Window(
+            RowNumber(), partition_by=F(parent_field), order_by=order_by
+        )
+    ).filter(_parent_rank__lte=limit)
+
+
+def _prefix_lookup(name, lookup):
+    if isinstance(lookup, Prefetch):
+        return Prefetch(f"{name}__{lookup.prefetch_through}", queryset=lookup.queryset)
+    return f"{name}__{lookup}"
@@ -0,0 +1,155 @@
+"""
+Publish/subscribe for pushing events to open server-sent event streams.
+
+Publishers call publish_on_commit() from request or worker code; every open
+EventStream connection holds a Subscription with a bounded queue, so a slow
+client costs at most PUSH_QUEUE_SIZE events of memory. When a queue is
+full the oldest event is dropped and the client is told to resync.
+
+The broker is chosen with the PUSH_BROKER setting. InProcessBroker only
+reaches connections served by the same process, which is what development
+and tests need; a deployment with several ASGI workers or a separate outbox
+worker plugs in a broker backed by a shared channel instead.
+"""
+
+import abc
+import asyncio
+import itertools
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+DEFAULT_QUEUE_SIZE = 100
+MODERATION_CHANNEL = "moderation"
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+class Subscription:
+    """One connection's view of the broker, bound to the loop serving it"""
+
+    def __init__(self, broker, channels, max_queue):
+        self.broker = broker
+        self.channels = set(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def _deliver(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    def put(self, message):
+        """Queue a message from any thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, message)
+        except RuntimeError:
+            # The serving loop is gone; the connection is already dead
+            self.close()
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker(abc.ABC):
+    """Interface every PUSH_BROKER implementation provides"""
+
+    @abc.abstractmethod
+    def publish(self, channel, event):
+        """Send ``event`` to every subscription on ``channel``"""
+
+    @abc.abstractmethod
+    def subscribe(self, channels, max_queue=DEFAULT_QUEUE_SIZE):
+        """Return a Subscription to ``channels`` for the running event loop"""
+
+    @abc.abstractmethod
+    def unsubscribe(self, subscription):
+        """Stop delivering to ``subscription``; safe to call more than once"""
+
+
+class InProcessBroker(Broker):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._ids = itertools.count(1)
+
+    def publish(self, channel, event):
+        message = {"id": next(self._ids), "channel": channel, **event}
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+
+    def subscribe(self, channels, max_queue=DEFAULT_QUEUE_SIZE):
+        subscription = Subscription(self, channels, max_queue)
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[channel]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            path = getattr(
+                settings, "PUSH_BROKER", "apps.heritage_data.push.InProcessBroker"
+            )
+            _broker = import_string(path)()
+        return _broker
+
+
+def publish_on_commit(channel, event):
+    """Publish once the current transaction commits (immediately outside one)"""
+    transaction.on_commit(lambda: get_broker().publish(channel, event))
+
+
+def publish_activity_events(activities):
+    """Push moderation updates for new activities to editors and contributors"""
+    from .models import CulturalEntity
+
+    if not activities:
+        return
+    entities = {
+        str(entity_id): (contributor_id, status)
+        for entity_id, contributor_id, status in CulturalEntity.objects.filter(
+            pk__in={activity.entity_id for activity in activities}
+        ).values_list("pk", "contributor_id", "status")
+    }
+    broker = get_broker()
+    for activity in activities:
+        contributor_id, status = entities.get(str(activity.entity_id), (None, None))
+        event = {
+            "type": "moderation",
+            "entity_id": str(activity.entity_id),
+            "activity_type": activity.activity_type,
+            "status": status,
+            "user_id": activity.user_id,
+            "created_at": activity.created_at.isoformat(),
+        }
+        broker.publish(MODERATION_CHANNEL, event)
+        if contributor_id is not None:
+            broker.publish(user_channel(contributor_id), event)
@@ -7,6 +7,7 @@ from .models import (
     ActivityLog,
     Comments,
     Moderation,
+    Notification,
     Submission,
     SubmissionEditSuggestion,
     SubmissionVersion,
@@ -15,6 +16,7 @@ from .models import (
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import CulturalEntity, Revision, Activity
+from .leases import DEFAULT_CLAIM_SIZE, MAX_CLAIM_SIZE
 
 
 class SubmissionSerializer(serializers.ModelSerializer):
@@ -152,6 +154,26 @@ class CustomUserSerializer(serializers.ModelSerializer):
         fields = ["id", "username", "email", "first_name", "last_name", "profile"]
 
 
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = [
+            "notification_id",
+            "notification_type",
+            "submission",
+            "message",
+            "is_read",
+            "created_at",
+        ]
+        read_only_fields = fields
+
+
+class MarkNotificationsReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.CharField(max_length=11), allow_empty=False, max_length=500
+    )
+
+
 class ActivityLogSerializer(serializers.ModelSerializer):
     permission_classes = [AllowAny]
     user = serializers.StringRelatedField()
@@ -364,12 +386,22 @@ class UserSerializer(serializers.ModelSerializer):
 
 class RevisionSerializer(serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
+    data = serializers.JSONField(read_only=True)
     
     class Meta:
         model = Revision
         fields = ['revision_id', 'revision_number', 'data', 'created_by', 'created_at']
         read_only_fields = ['revision_id', 'revision_number', 'created_by', 'created_at']
 
+class RevisionDiffSerializer(serializers.ModelSerializer):
+    """Compact revision entry: the change against the previous revision only"""
+    created_by = UserSerializer(read_only=True)
+    
+    class Meta:
+        model = Revision
+        fields = ['revision_id', 'revision_number', 'diff', 'created_by', 'created_at']
+        read_only_fields = fields
+
 class ActivitySerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
@@ -386,21 +418,21 @@ class CulturalEntityListSerializer(serializers.ModelSerializer):
         model = CulturalEntity
         fields = [
             'entity_id', 'name', 'category', 'status', 
-            'contributor', 'created_at', 'current_revision'
+            'contributor', 'created_at', 'current_revision', 'revision_count'
         ]
 
 class CulturalEntityDetailSerializer(serializers.ModelSerializer):
     contributor = UserSerializer(read_only=True)
     current_revision = RevisionSerializer(read_only=True)
-    revisions = RevisionSerializer(many=True, read_only=True)
+    revisions = RevisionDiffSerializer(many=True, read_only=True)
     activities = ActivitySerializer(many=True, read_only=True)
     
     class Meta:
         model = CulturalEntity
         fields = [
             'entity_id', 'name', 'description', 'category', 'status',
-            'contributor', 'current_revision', 'created_at', 'updated_at',
-            'revisions', 'activities'
+            'contributor', 'current_revision', 'revision_count', 'created_at',
+            'updated_at', 'revisions', 'activities'
         ]
         read_only_fields = ['entity_id', 'created_at', 'updated_at', 'contributor']
 
@@ -439,6 +471,8 @@ class CulturalEntityUpdateSerializer(serializers.ModelSerializer):
         read_only_fields = ['entity_id', 'contributor', 'created_at']
 
 class RevisionCreateSerializer(serializers.ModelSerializer):
+    data = serializers.JSONField()
+    
     class Meta:
         model = Revision
         fields = ['data']
@@ -452,6 +486,20 @@ class ModerationActionSerializer(serializers.Serializer):
     action = serializers.ChoiceField(choices=['accept', 'reject'])
     comment = serializers.CharField(required=False, allow_blank=True)
 
+class BulkModerationSerializer(ModerationActionSerializer):
+    entity_ids = serializers.ListField(
+        child=serializers.UUIDField(), allow_empty=False, max_length=500
+    )
+
+class ClaimSerializer(serializers.Serializer):
+    limit = serializers.IntegerField(
+        min_value=1, max_value=MAX_CLAIM_SIZE, default=DEFAULT_CLAIM_SIZE
+    )
+
+class LeaseSerializer(serializers.Serializer):
+    # Omit to act on every lease held by the editor
+    entity_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+
 class ContributionQueueSerializer(serializers.ModelSerializer):
     contributor = UserSerializer(read_only=True)
     current_revision = RevisionSerializer(read_only=True)
@@ -462,15 +510,21 @@ class ContributionQueueSerializer(serializers.ModelSerializer):
         model = CulturalEntity
         fields = [
             'entity_id', 'name', 'category', 'status', 'contributor',
-            'created_at', 'current_revision', 'latest_revision', 'activity_count'
+            'created_at', 'current_revision', 'latest_revision', 'revision_count',
+            'activity_count', 'claimed_by', 'claim_expires_at'
         ]
     
     def get_latest_revision(self, obj):
+        # Served from the select_related latest_revision pointer when present
         latest = obj.get_latest_revision()
         if latest:
             return RevisionSerializer(latest).data
         return None
     
     def get_activity_count(self, obj):
-        return obj.activities.count()
+        # ContributionQueueViewSet annotates the count; fall back for other callers
+        count = getattr(obj, 'activity_count', None)
+        if count is None:
+            count = obj.activities.count()
+        return count
 
@@ -1,15 +1,130 @@
 from datetime import datetime, timedelta
 
 from django.db.models import Count, Q  # ✅ Correct import
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from .models import Submission, UserProfile, UserStats
+from .models import (
+    Activity,
+    CulturalEntity,
+    Notification,
+    Submission,
+    UserProfile,
+    UserStats,
+    adjust_entity_counters,
+    adjust_unread_counts,
+    fan_out_activities,
+)
+from .push import publish_on_commit, user_channel
 
 
 @receiver(post_save, sender=Submission)
 def update_user_stats(sender, instance, **kwargs):
-    user = instance.contributor
+    refresh_user_stats(instance.contributor)
+
+
+COUNTER_FIELDS = {"status", "category"}
+
+
+def _stored_counter_key(instance):
+    # Locked until the save or delete commits, so a concurrent writer reads
+    # the key this one leaves behind rather than the same old one
+    return (
+        CulturalEntity.objects.select_for_update()
+        .filter(pk=instance.pk)
+        .values_list("status", "category")
+        .first()
+    )
+
+
+@receiver(pre_save, sender=CulturalEntity)
+def remember_counter_key(sender, instance, update_fields=None, **kwargs):
+    # Read the stored key rather than trusting a possibly stale instance
+    instance._counter_key = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not COUNTER_FIELDS & set(update_fields):
+        return
+    instance._counter_key = _stored_counter_key(instance)
+
+
+@receiver(post_save, sender=CulturalEntity)
+def update_entity_counters(sender, instance, created, **kwargs):
+    key = (instance.status, instance.category)
+    if created:
+        adjust_entity_counters({key: 1})
+        return
+    previous = getattr(instance, "_counter_key", None)
+    if previous and previous != key:
+        adjust_entity_counters({previous: -1, key: 1})
+
+
+@receiver(pre_delete, sender=CulturalEntity)
+def remember_deleted_counter_key(sender, instance, **kwargs):
+    instance._counter_key = _stored_counter_key(instance)
+
+
+@receiver(post_delete, sender=CulturalEntity)
+def release_entity_counter(sender, instance, **kwargs):
+    key = getattr(instance, "_counter_key", None)
+    if key:
+        adjust_entity_counters({key: -1})
+
+
+@receiver(post_save, sender=Activity)
+def fan_out_activity(sender, instance, created, **kwargs):
+    if created:
+        fan_out_activities([instance])
+
+
+@receiver(pre_save, sender=Notification)
+def remember_read_state(sender, instance, update_fields=None, **kwargs):
+    instance._was_read = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and "is_read" not in update_fields:
+        return
+    instance._was_read = (
+        Notification.objects.filter(pk=instance.pk)
+        .values_list("is_read", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_count(sender, instance, created, **kwargs):
+    if created:
+        if not instance.is_read:
+            adjust_unread_counts({instance.user_id: 1})
+        return
+    was_read = getattr(instance, "_was_read", None)
+    if was_read is not None and was_read != instance.is_read:
+        adjust_unread_counts({instance.user_id: -1 if instance.is_read else 1})
+
+
+@receiver(post_save, sender=Notification)
+def push_notification(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit(
+            user_channel(instance.user_id),
+            {
+                "type": "notification",
+                "notification_id": instance.notification_id,
+                "notification_type": instance.notification_type,
+                "message": instance.message,
+                "created_at": instance.created_at.isoformat(),
+            },
+        )
+
+
+@receiver(post_delete, sender=Notification)
+def release_unread_count(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread_counts({instance.user_id: -1})
+
+
+def refresh_user_stats(user):
+    """Recompute the UserStats row for one contributor"""
     today = datetime.today()
     first_day_this_month = today.replace(day=1)
     last_month_end = first_day_this_month - timedelta(days=1)
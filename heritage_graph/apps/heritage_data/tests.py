@@ -1,3 +1,751 @@
-# from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+from apps.cidoc_data.models import Activity as CidocActivity, Artifact, ArtifactComment
+
+from .archive import archive_kind, read_archive
+from . import leases
+from .diffs import apply_diff, diff_documents
+from .exports import EXPORT_FIELDS
+from .importers import SubmissionBatchWriter
+from .models import (
+    OUTBOX_SHARDS, Activity, CulturalEntity, EntityCounter, Notification, NotificationCounter, OutboxEvent,
+    Revision, Submission, SubmissionVersion, activity_event, get_entity_counters, get_unread_count,
+)
+from .outbox import HANDLERS, MAX_ATTEMPTS, drain_outbox, partition_shards
+from .timeline import STREAM_RANK
+from .views import CulturalEntityViewSet
+
+ENTITIES_URL = '/data/api/cultural-entities/'
+
+
+class CulturalEntityQueryTests(TestCase):
+    """Entity list and detail cost a fixed number of queries and bounded payloads"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='contributor')
+        self.client = APIClient()
+
+    def make_entity(self, revisions=0, activities=0):
+        entity = CulturalEntity.objects.create(
+            name='Entity', description='Description', category='monument', contributor=self.user
+        )
+        Revision.objects.bulk_create(
+            Revision(entity=entity, snapshot={'name': f'v{n}'}, revision_number=n, created_by=self.user)
+            for n in range(1, revisions + 1)
+        )
+        Activity.objects.bulk_create(
+            Activity(entity=entity, user=self.user, activity_type='commented')
+            for _ in range(activities)
+        )
+        return entity
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_list(self):
+        self.make_entity(revisions=1)
+        one, one_queries = self.get(ENTITIES_URL)
+        self.make_entity(revisions=30, activities=30)
+        self.make_entity(revisions=30, activities=30)
+        three, three_queries = self.get(ENTITIES_URL)
+
+        self.assertEqual(len(three.json()['results']), 3)
+        self.assertEqual(len(three_queries), len(one_queries))
+        # Only the current revision is joined; no revision history or activities are read
+        self.assertFalse(any('FROM "revisions"' in sql or '"activities"' in sql for sql in three_queries))
+        per_entity = (len(three.content) - len(one.content)) / 2
+        self.assertLess(abs(per_entity - len(one.content)), 200)
+
+    def test_detail(self):
+        limits = CulturalEntityViewSet.prefetch_limits
+        small = self.make_entity(revisions=3, activities=3)
+        at_cap = self.make_entity(revisions=limits['revisions'] + 1, activities=limits['activities'] + 1)
+        large = self.make_entity(revisions=limits['revisions'] * 3, activities=limits['activities'] * 3)
+
+        response, small_queries = self.get(f'{ENTITIES_URL}{small.pk}/')
+        self.assertFalse(response.data['revisions_truncated'])
+        self.assertFalse(response.data['activities_truncated'])
+        self.assertEqual(len(response.data['revisions']), 3)
+
+        at_cap_response, at_cap_queries = self.get(f'{ENTITIES_URL}{at_cap.pk}/')
+        large_response, large_queries = self.get(f'{ENTITIES_URL}{large.pk}/')
+        self.assertEqual(len(large_queries), len(small_queries))
+        self.assertEqual(len(at_cap_queries), len(small_queries))
+        for name, limit in limits.items():
+            self.assertEqual(len(large_response.data[name]), limit)
+            self.assertTrue(large_response.data[f'{name}_truncated'])
+            self.assertTrue(at_cap_response.data[f'{name}_truncated'])
+        self.assertEqual(
+            [r['revision_number'] for r in large_response.data['revisions']],
+            list(range(limits['revisions'] * 3, limits['revisions'] * 2, -1)),
+        )
+        # The payload stops growing once the caps are reached
+        self.assertLess(abs(len(large_response.content) - len(at_cap_response.content)), 50)
+        self.assertTrue(large_response.data['timeline'].endswith(f'{large.pk}/timeline/'))
+
+
+class UnreadCounterTests(TestCase):
+    """reconcile_unread_counts repairs counters that predate or drifted from the notifications"""
+
+    def test_reconcile_then_mark_all_read(self):
+        user = User.objects.create(username='reader')
+        for _ in range(3):
+            Notification.objects.create(user=user, notification_type='general', message='hello')
+        # As for users whose notifications were written before the counters existed
+        NotificationCounter.objects.all().delete()
+        self.assertEqual(get_unread_count(user), 0)
+
+        call_command('reconcile_unread_counts', stdout=StringIO())
+        self.assertEqual(get_unread_count(user), 3)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/data/api/notifications/mark_all_read/')
+        self.assertEqual(response.json(), {'updated': 3, 'unread': 0})
+
+
+class CidocActivityArchiveTests(TestCase):
+    """Old CIDOC activities are archived unless a comment still hangs off them"""
+
+    def test_archive_keeps_commented_activities(self):
+        user = User.objects.create(username='editor')
+        old = timezone.now() - timedelta(days=1000)
+
+        def activity(previous=None):
+            created = CidocActivity.objects.create(
+                user=user, post_uid=1, activity_type='comment', previous_activity=previous, details={}
+            )
+            CidocActivity.objects.filter(pk=created.pk).update(timestamp=old)
+            return created.pk
+
+        root = activity()
+        commented = activity(root)
+        child = activity(commented)
+        artifact = Artifact.objects.create(name='Bowl', description='', material='clay', condition='good', status='draft')
+        ArtifactComment.objects.create(uid=artifact, user=user, activity_id_id=commented, comment='kept')
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(ACTIVITY_ARCHIVE_DIR=directory):
+            archive_kind('cidoc_activity', timezone.now())
+            archived = [row['activity_id'] for row in read_archive('cidoc_activity')]
+
+        self.assertEqual(sorted(archived), [root, child])
+        self.assertEqual(list(CidocActivity.objects.values_list('pk', 'chain_root')), [(commented, None)])
+        self.assertEqual(ArtifactComment.objects.count(), 1)
+
+
+class RevisionStorageTests(TestCase):
+    """Diff-only revisions replay to exactly what was saved"""
+
+    def test_type_only_changes_survive_replay(self):
+        for old, new in [({'a': 1}, {'a': True}), ({'a': 1}, {'a': 1.0}), ({'a': {'b': [1]}}, {'a': {'b': [True]}})]:
+            with self.subTest(new=new):
+                replayed = apply_diff(old, diff_documents(old, new))
+                self.assertEqual(repr(replayed), repr(new))
+        self.assertEqual(diff_documents({'a': {'b': [1]}}, {'a': {'b': [1]}}), [])
+
+    def test_revision_list_rebuilds_a_page_in_one_query_per_entity(self):
+        user = User.objects.create(username='reviser')
+        entity = CulturalEntity.objects.create(
+            name='Entity', description='Description', category='monument', contributor=user
+        )
+        for n in range(1, 26):
+            entity.create_revision(user, {'name': f'v{n}', 'n': n})
+        client = APIClient()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/data/api/revisions/')
+        results = response.json()['results']
+        self.assertTrue(any(not Revision.is_keyframe(r['revision_number']) for r in results))
+        for result in results:
+            self.assertEqual(result['data'], {'name': f"v{result['revision_number']}", 'n': result['revision_number']})
+        # count + page + one replay for the single entity on the page
+        self.assertEqual(len(queries.captured_queries), 3)
+
+
+class ActivityListShapeTests(TestCase):
+    """Staff and anonymous callers page by number; contributors read their feed by cursor"""
+
+    def test_response_shape_per_caller(self):
+        contributor = User.objects.create(username='contributor')
+        staff = User.objects.create(username='staff', is_staff=True)
+        entity = CulturalEntity.objects.create(
+            name='Entity', description='Description', category='monument', contributor=contributor
+        )
+        for _ in range(12):
+            Activity.objects.create(entity=entity, user=contributor, activity_type='commented')
+
+        for user in (None, staff):
+            with self.subTest(user=user):
+                client = APIClient()
+                if user is not None:
+                    client.force_authenticate(user)
+                page = client.get('/data/api/activities/').json()
+                self.assertEqual(set(page), {'count', 'next', 'previous', 'results'})
+                self.assertEqual(page['count'], 12)
+                second = client.get('/data/api/activities/', {'page': 2}).json()
+                self.assertEqual(set(second), {'count', 'next', 'previous', 'results'})
+                self.assertIsNotNone(second['previous'])
+                self.assertEqual(len(page['results']) + len(second['results']), 12)
+
+        client = APIClient()
+        client.force_authenticate(contributor)
+        page = client.get('/data/api/activities/', {'page_size': 10}).json()
+        self.assertEqual(set(page), {'next', 'results'})
+        rest = client.get(page['next']).json()
+        self.assertEqual(set(rest), {'next', 'results'})
+        self.assertEqual(len(page['results']) + len(rest['results']), 12)
+        self.assertIsNone(rest['next'])
+
+
+class OutboxDrainTests(TestCase):
+    """Draining keeps per-entity order, counts retries and is safe to replay"""
+
+    def setUp(self):
+        self.handled = []
+
+        def handler(events):
+            if any(event.payload.get('fail') for event in events):
+                raise RuntimeError('handler failed')
+            self.handled.extend(event.payload['n'] for event in events)
+
+        patcher = mock.patch.dict(HANDLERS, {'test': handler})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def event(self, n, entity_id=None, fail=False, shard=0):
+        return OutboxEvent.objects.create(
+            event_type='test', entity_id=entity_id, shard=shard, payload={'n': n, 'fail': fail}
+        )
+
+    def drain(self, **kwargs):
+        with self.assertLogs('apps.heritage_data.outbox', 'ERROR'):
+            return drain_outbox(**kwargs)
+
+    def test_failure_holds_back_its_entity_only(self):
+        entity, other = uuid.uuid4(), uuid.uuid4()
+        failing = self.event(1, entity, fail=True)
+        held = self.event(2, entity)
+        self.event(3, other)
+
+        self.assertEqual(self.drain(), 1)
+        self.assertEqual(self.handled, [3])
+        self.assertEqual(
+            list(OutboxEvent.objects.filter(processed_at__isnull=True).values_list('pk', flat=True)),
+            [failing.pk, held.pk],
+        )
+
+        OutboxEvent.objects.filter(pk=failing.pk).update(payload={'n': 1})
+        self.assertEqual(drain_outbox(), 2)
+        self.assertEqual(self.handled, [3, 1, 2])
+
+    def test_retries_once_per_drain_then_gives_up(self):
+        failing = self.event(0, fail=True)
+        for _ in range(MAX_ATTEMPTS):
+            self.event(len(self.handled) + 1)
+            # The other event completes, yet the failed one is not retried in the same call
+            self.drain(batch_size=1)
+            failing.refresh_from_db()
+            self.assertEqual(failing.attempts, len(self.handled))
+        self.assertEqual(failing.attempts, MAX_ATTEMPTS)
+        self.assertIsNotNone(failing.processed_at)
+        self.assertIn('handler failed', failing.last_error)
+        self.assertEqual(drain_outbox(), 0)
+
+    def test_replayed_activity_events_are_idempotent(self):
+        user = User.objects.create(username='replayer')
+        entity = CulturalEntity.objects.create(
+            name='Entity', description='Description', category='monument', contributor=user
+        )
+        event = activity_event(entity.pk, user.pk, 'commented')
+        event.save()
+        drain_outbox()
+        OutboxEvent.objects.filter(pk=event.pk).update(processed_at=None)
+        drain_outbox()
+        self.assertEqual(Activity.objects.filter(activity_id=event.payload['activity_id']).count(), 1)
+
+    def test_partitions_split_the_shards(self):
+        partitions = [partition_shards(3, partition) for partition in range(3)]
+        self.assertEqual(sorted(shard for shards in partitions for shard in shards), list(range(OUTBOX_SHARDS)))
+
+        for shard in range(OUTBOX_SHARDS):
+            self.event(shard, shard=shard)
+        self.assertEqual(drain_outbox(shards=partitions[0]), len(partitions[0]))
+        self.assertEqual(sorted(self.handled), partitions[0])
+        self.assertEqual(OutboxEvent.objects.filter(processed_at__isnull=True).count(), OUTBOX_SHARDS - len(partitions[0]))
+
+
+class EntityTimelineTests(TestCase):
+    """Timeline cursors page through both streams exactly once and reject anything malformed"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='historian')
+        self.entity = CulturalEntity.objects.create(
+            name='Entity', description='Description', category='monument', contributor=self.user
+        )
+        self.url = f'{ENTITIES_URL}{self.entity.pk}/timeline/'
+
+    def test_pages_cover_equal_timestamps_across_streams(self):
+        Revision.objects.bulk_create(
+            Revision(entity=self.entity, snapshot={'n': n}, revision_number=n, created_by=self.user)
+            for n in range(1, 6)
+        )
+        Activity.objects.bulk_create(
+            Activity(entity=self.entity, user=self.user, activity_type='commented') for _ in range(5)
+        )
+        moment = timezone.now()
+        Revision.objects.filter(entity=self.entity).update(created_at=moment)
+        Activity.objects.filter(entity=self.entity).update(created_at=moment)
+
+        expected = sorted(
+            [('revision', str(pk)) for pk in Revision.objects.filter(entity=self.entity).values_list('pk', flat=True)]
+            + [('activity', str(pk)) for pk in Activity.objects.filter(entity=self.entity).values_list('pk', flat=True)],
+            key=lambda event: (STREAM_RANK[event[0]], event[1]),
+            reverse=True,
+        )
+        seen, url, client = [], self.url, APIClient()
+        while url:
+            page = client.get(url, {'page_size': 3} if url == self.url else None).json()
+            for event in page['results']:
+                kind = event['type']
+                seen.append((kind, str(event[kind]['revision_id' if kind == 'revision' else 'activity_id'])))
+            url = page['next']
+        self.assertEqual(seen, expected)
+
+    def test_malformed_cursors_are_rejected(self):
+        def cursor(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+        now = timezone.now().isoformat()
+        naive = timezone.now().replace(tzinfo=None).isoformat()
+        for value in [
+            'not base64!', cursor('text'), cursor([now, 'revision']), cursor([now, 'comment', str(uuid.uuid4())]),
+            cursor([now, 'revision', 'not-a-uuid']), cursor([now, 'revision', [1]]), cursor([now, 'activity', {'a': 1}]),
+            cursor([now, 'revision', 7]), cursor([naive, 'revision', str(uuid.uuid4())]), cursor([3, 'revision', str(uuid.uuid4())]),
+        ]:
+            with self.subTest(cursor=value):
+                response = APIClient().get(self.url, {'cursor': value})
+                self.assertEqual(response.status_code, 400)
+        response = APIClient().get(self.url, {'cursor': cursor([now, 'revision', str(uuid.uuid4())])})
+        self.assertEqual(response.status_code, 200)
+
+
+class EntityCounterTests(TestCase):
+    """Counter signals follow the stored row, and the reconcile command repairs drift"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='counter')
+
+    def entity(self, category='monument'):
+        return CulturalEntity.objects.create(
+            name='Entity', description='Description', category=category, contributor=self.user
+        )
+
+    def test_signals_move_the_stored_key(self):
+        entity = self.entity()
+        other = self.entity('festival')
+        initial = entity.status
+        self.assertEqual(get_entity_counters(), {initial: {'monument': 1, 'festival': 1}})
+
+        # A stale copy still moves the key the row actually holds
+        stale = CulturalEntity.objects.get(pk=entity.pk)
+        entity.status = 'accepted'
+        entity.save()
+        stale.status = 'rejected'
+        stale.save()
+        self.assertEqual(get_entity_counters(), {initial: {'festival': 1}, 'rejected': {'monument': 1}})
+
+        other.name = 'Renamed'
+        other.save(update_fields=['name', 'updated_at'])
+        other.category = 'monument'
+        other.save()
+        self.assertEqual(get_entity_counters(), {initial: {'monument': 1}, 'rejected': {'monument': 1}})
+
+        entity.delete()  # the instance still says 'accepted'
+        other.delete()
+        self.assertEqual(get_entity_counters(), {})
+
+    def test_reconcile_repairs_drift(self):
+        entity = self.entity()
+        self.entity()
+        EntityCounter.objects.all().delete()
+        EntityCounter.objects.create(status='accepted', category='monument', count=4)
+
+        out = StringIO()
+        call_command('reconcile_entity_counters', dry_run=True, stdout=out)
+        self.assertIn('2 counters have drifted', out.getvalue())
+        self.assertEqual(get_entity_counters(), {'accepted': {'monument': 4}})
+
+        call_command('reconcile_entity_counters', stdout=StringIO())
+        self.assertEqual(get_entity_counters(), {entity.status: {'monument': 2}})
+        out = StringIO()
+        call_command('reconcile_entity_counters', stdout=out)
+        self.assertIn('in sync', out.getvalue())
+
+
+class LeaseTests(TestCase):
+    """Moderation leases are exclusive, expire, and only their holder can renew or release them"""
+
+    def setUp(self):
+        self.editor = User.objects.create(username='editor')
+        self.other = User.objects.create(username='other-editor')
+        contributor = User.objects.create(username='submitter')
+        self.entities = [
+            CulturalEntity.objects.create(
+                name=f'Entity {n}', description='', category='monument', contributor=contributor,
+                status='pending_review',
+            ).pk
+            for n in range(4)
+        ]
+
+    def expire(self, entity_id):
+        CulturalEntity.objects.filter(pk=entity_id).update(claim_expires_at=timezone.now() - timedelta(minutes=1))
+
+    def test_claims_are_exclusive_and_use_skip_locked_where_supported(self):
+        for skip_locked in (True, False):
+            with self.subTest(skip_locked=skip_locked):
+                CulturalEntity.objects.update(claimed_by=None, claim_expires_at=None)
+                with mock.patch.object(connection.features, 'has_select_for_update_skip_locked', skip_locked), \
+                        mock.patch('django.db.models.query.QuerySet.select_for_update', autospec=True,
+                                   side_effect=lambda queryset, **kwargs: queryset) as select_for_update:
+                    mine = leases.claim_contributions(self.editor, limit=3)
+                    theirs = leases.claim_contributions(self.other, limit=3)
+                self.assertEqual(len(mine), 3)
+                self.assertEqual(theirs, [pk for pk in self.entities if pk not in mine])
+                if skip_locked:
+                    self.assertEqual(select_for_update.call_args.kwargs, {'skip_locked': True})
+                else:
+                    select_for_update.assert_not_called()
+
+    def test_conditional_update_leaves_rows_taken_meanwhile(self):
+        free = leases._free
+        calls = []
+
+        def take_one_first(now):
+            calls.append(now)
+            if len(calls) == 2:  # between picking the candidates and the UPDATE
+                CulturalEntity.objects.filter(pk=self.entities[0]).update(
+                    claimed_by=self.other, claim_expires_at=now + leases.LEASE_DURATION
+                )
+            return free(now)
+
+        with mock.patch.object(leases, '_free', side_effect=take_one_first):
+            claimed = leases.claim_contributions(self.editor, limit=2)
+        self.assertEqual(claimed, [self.entities[1]])
+        self.assertEqual(CulturalEntity.objects.get(pk=self.entities[0]).claimed_by, self.other)
+
+    def test_expired_or_stolen_leases_cannot_be_renewed(self):
+        first, second = leases.claim_contributions(self.editor, limit=2)
+        self.expire(first)
+        renewed, _ = leases.renew_claims(self.editor)
+        self.assertEqual(renewed, [second])
+
+        # Once expired the lease can be taken, after which it is the new holder's
+        stolen = leases.claim_contributions(self.other, limit=1)
+        self.assertEqual(stolen, [first])
+        self.assertEqual(leases.renew_claims(self.editor, [first])[0], [])
+        self.assertEqual(leases.renew_claims(self.other, [first])[0], [first])
+
+    def test_only_the_holder_releases(self):
+        held = leases.claim_contributions(self.editor, limit=2)
+        self.assertEqual(leases.release_claims(self.other, held), 0)
+        self.assertEqual(CulturalEntity.objects.filter(claimed_by=self.editor).count(), 2)
+        self.assertEqual(leases.release_claims(self.editor, held[:1]), 1)
+        self.assertEqual(leases.release_claims(self.editor), 1)
+        self.assertFalse(CulturalEntity.objects.filter(claimed_by__isnull=False).exists())
+
+
+class RevisionDiffTests(TestCase):
+    """Per-pair revision diffs are cached and only compare a revision with an earlier one of its entity"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.owner = User.objects.create(username='owner')
+        entity = CulturalEntity.objects.create(
+            name='Entity', description='Description', category='monument', contributor=self.owner
+        )
+        self.first = entity.create_revision(self.owner, {'name': 'Stupa', 'height': 10})
+        self.second = entity.create_revision(self.owner, {'name': 'Stupa', 'height': 12, 'era': 'Licchavi'})
+        other = CulturalEntity.objects.create(
+            name='Other', description='Description', category='monument', contributor=self.owner
+        )
+        self.unrelated = other.create_revision(self.owner, {'name': 'Temple'})
+
+    def url(self, revision):
+        return f'/data/api/revisions/{revision.pk}/diff/'
+
+    def test_diff_is_cached_per_pair(self):
+        client = APIClient()
+        with mock.patch('apps.heritage_data.views.diff_documents', wraps=diff_documents) as compute:
+            response = client.get(self.url(self.second))
+            again = client.get(self.url(self.second), {'against': str(self.first.pk)})
+            summary = client.get(self.url(self.second), {'summary': 'true'})
+        self.assertEqual(compute.call_count, 1)
+        self.assertEqual(response.json(), again.json())
+        self.assertEqual(response.json()['against'], str(self.first.pk))
+        self.assertEqual(sorted(response.json()['changed_keys']), ['era', 'height'])
+        self.assertEqual(summary.json(), {k: v for k, v in response.json().items() if k != 'diff'})
+
+        first = client.get(self.url(self.first)).json()
+        self.assertIsNone(first['against'])
+        self.assertEqual(sorted(first['changed_keys']), ['height', 'name'])
+
+    def test_rejected_pairs(self):
+        client = APIClient()
+        for against, code in [
+            (self.second, 400), (self.first, 400), (self.unrelated, 400), (uuid.uuid4(), 404), ('not-a-uuid', 404),
+        ]:
+            with self.subTest(against=against):
+                response = client.get(self.url(self.first), {'against': str(getattr(against, 'pk', against))})
+                self.assertEqual(response.status_code, code)
+
+    def test_readable_like_the_revision_itself(self):
+        # Revisions are public to read, so their diffs are too; writes are refused
+        stranger = User.objects.create(username='stranger')
+        expected = APIClient().get(self.url(self.second)).json()
+        client = APIClient()
+        client.force_authenticate(stranger)
+        self.assertEqual(client.get(self.url(self.second)).json(), expected)
+        self.assertEqual(client.post(self.url(self.second)).status_code, 405)
+        self.assertEqual(APIClient().post(self.url(self.second)).status_code, 403)
+
+
+class SubmissionExportTests(TestCase):
+    """Exports stream every matching submission and read back to the stored values in each format"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='exporter')
+        self.submissions = [
+            Submission.objects.create(
+                title=f'Monument {i}', description='Pagoda', contributor=self.user,
+                contribution_type='heritage_documentation', District=district, status=status,
+                contribution_data={'objects': [{'Name': 'Bell'}], 'note': 'घण्टा'},
+            )
+            for i, (district, status) in enumerate(
+                [('Lalitpur', 'accepted'), ('Kathmandu', 'accepted'), ('Lalitpur', 'pending')]
+            )
+        ]
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def export(self, export_format, **options):
+        output = os.path.join(self.directory.name, f'submissions.{export_format}')
+        call_command(
+            'export_submissions', format=export_format, output=output, chunk_size=2, stderr=StringIO(), **options
+        )
+        return output
+
+    def assert_matches(self, rows):
+        self.assertEqual([row['submission_id'] for row in rows], [s.submission_id for s in self.submissions])
+        for row, submission in zip(rows, self.submissions):
+            self.assertEqual(set(row), set(EXPORT_FIELDS))
+            self.assertEqual(row['title'], submission.title)
+            self.assertEqual(row['District'], submission.District)
+            self.assertEqual(row['contributor_id'], self.user.pk)
+            self.assertEqual(json.loads(row['contribution_data']), submission.contribution_data)
+
+    def test_csv_round_trip(self):
+        with open(self.export('csv'), encoding='utf-8', newline='') as stream:
+            rows = list(csv.DictReader(stream))
+        for row in rows:
+            row['contributor_id'] = int(row['contributor_id'])
+        self.assert_matches(rows)
+
+    def test_ndjson_round_trip(self):
+        with open(self.export('ndjson'), encoding='utf-8') as stream:
+            rows = [json.loads(line) for line in stream]
+        for row in rows:
+            row['contribution_data'] = json.dumps(row['contribution_data'])
+        self.assert_matches(rows)
+
+    @skipUnless(pq, 'pyarrow is not installed')
+    def test_parquet_round_trip(self):
+        parquet = pq.ParquetFile(self.export('parquet'))
+        # One row group per chunk of rows
+        self.assertEqual(parquet.num_row_groups, 2)
+        rows = parquet.read().to_pylist()
+        self.assert_matches(rows)
+        self.assertEqual(rows[0]['created_at'], self.submissions[0].created_at)
+
+    def test_filters(self):
+        with open(self.export('ndjson', status='accepted', district='lalitpur'), encoding='utf-8') as stream:
+            self.assertEqual([json.loads(line)['id'] for line in stream], [self.submissions[0].pk])
+
+        Submission.objects.filter(pk=self.submissions[0].pk).update(
+            created_at=timezone.now() - timedelta(days=10)
+        )
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        with open(self.export('ndjson', since=since), encoding='utf-8') as stream:
+            self.assertEqual(
+                [json.loads(line)['id'] for line in stream], [s.pk for s in self.submissions[1:]]
+            )
+
+    def test_api_streams_export(self):
+        client = APIClient()
+        url = '/data/api/submissions/export/'
+        self.assertIn(client.get(url).status_code, (401, 403))
+
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get(url, {'export_format': 'xml'}).status_code, 400)
+        self.assertEqual(client.get(url, {'since': 'yesterday'}).status_code, 400)
+
+        response = client.get(url, {'export_format': 'ndjson', 'status': 'pending'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('submissions.ndjson', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [self.submissions[2].pk])
+
+
+class SubmissionImportTests(TestCase):
+    """Arches and CSV imports upsert by resource ID and version the submissions they overwrite"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='importer')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8', newline='') as stream:
+            stream.write(content)
+        return path
+
+    def write_csv(self, rows):
+        stream = io.StringIO()
+        writer = csv.writer(stream)
+        writer.writerow(['Resource ID', 'Report Title', 'Label', 'Value'])
+        writer.writerows(rows)
+        return self.write('monuments.csv', stream.getvalue())
+
+    def arches_record(self, resource_id, name, district):
+        return {
+            'resourceinstanceid': resource_id,
+            'displayname': f'Report {resource_id}',
+            'resource': {
+                'Monument name': {'@display_value': name},
+                'District': {'@display_value': district},
+                'Objects': [
+                    {'Name': {'@display_value': 'Bell'}, 'Object type': {'@display_value': 'Metal'}},
+                    {'Name': {'@display_value': 'Lion'}, 'Object type': {'@display_value': 'Stone'}},
+                ],
+            },
+        }
+
+    def run_command(self, *args):
+        stdout = StringIO()
+        call_command(*args, user_id=self.user.pk, batch_size=2, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_csv_import_and_reimport(self):
+        self.write_csv([
+            ['R1', 'Report R1', 'Monument name', 'Kumbheshwar'],
+            ['R1', 'Report R1', 'District', 'Lalitpur'],
+            ['R1', 'Report R1', 'Gate', 'Golden'],
+            ['R2', 'Report R2', 'District', 'Bhaktapur'],
+            ['R3', 'Report R3', 'Monument name', 'Nyatapola'],
+        ])
+        output = self.run_command('import_csvs', self.directory.name)
+        self.assertIn('Created 3 and updated 0 submissions', output)
+        first = Submission.objects.get(submission_id='R1')
+        self.assertEqual((first.title, first.District, first.Gate), ('Kumbheshwar', 'Lalitpur', 'Golden'))
+        self.assertEqual(Submission.objects.get(submission_id='R2').title, 'Report R2')
+        self.assertFalse(SubmissionVersion.objects.exists())
+        self.assertEqual(self.user.stats.total_submissions, 3)
+
+        self.write_csv([
+            ['R1', 'Report R1', 'Monument name', 'Kumbheshwar Temple'],
+            ['R1', 'Report R1', 'District', 'Lalitpur'],
+        ])
+        output = self.run_command('import_csvs', self.directory.name)
+        self.assertIn('Created 0 and updated 1 submissions', output)
+        first.refresh_from_db()
+        self.assertEqual(first.title, 'Kumbheshwar Temple')
+        # Columns the re-import does not carry keep their values
+        self.assertEqual(first.Gate, 'Golden')
+        self.assertEqual(Submission.objects.count(), 3)
+
+        self.run_command('import_csvs', self.directory.name)
+        self.assertEqual(
+            list(first.versions.values_list('version_number', 'title', 'updated_by')),
+            [(2, 'Kumbheshwar Temple', self.user.pk), (1, 'Kumbheshwar Temple', self.user.pk)],
+        )
+
+    def test_arches_ndjson_import(self):
+        path = self.write('resources.ndjson', '\n'.join([
+            json.dumps(self.arches_record('A1', 'Kasthamandap', 'Kathmandu')),
+            '',
+            json.dumps({'resource': {}}),
+            json.dumps(self.arches_record('A2', '', 'Lalitpur')),
+        ]))
+        output = self.run_command('import_arches', path)
+        self.assertIn('Skipping record without an ID', output)
+        self.assertIn('Created 2 and updated 0 submissions', output)
+
+        first = Submission.objects.get(submission_id='A1')
+        self.assertEqual((first.title, first.District), ('Kasthamandap', 'Kathmandu'))
+        self.assertEqual(
+            first.contribution_data['objects'],
+            [{'Name': 'Bell', 'Object type': 'Metal'}, {'Name': 'Lion', 'Object type': 'Stone'}],
+        )
+        self.assertEqual(Submission.objects.get(submission_id='A2').title, 'Report A2')
+
+        self.run_command('import_arches', path)
+        self.assertEqual(Submission.objects.count(), 2)
+        self.assertEqual(SubmissionVersion.objects.count(), 2)
+
+    @skipUnless(ijson, 'ijson is not installed')
+    def test_arches_json_import(self):
+        document = {'business_data': {'resources': [self.arches_record('A1', 'Kasthamandap', 'Kathmandu')]}}
+        self.write('export.json', json.dumps(document))
+        stdout = StringIO()
+        call_command(
+            'import_arches', self.directory.name, user_id=self.user.pk,
+            json_path='business_data.resources.item', stdout=stdout,
+        )
+        self.assertIn('Created 1 and updated 0 submissions', stdout.getvalue())
+        self.assertEqual(Submission.objects.get(submission_id='A1').District, 'Kathmandu')
+
+    def test_batch_writer_flushes_and_reports_failed_batches(self):
+        writer = SubmissionBatchWriter(self.user, batch_size=2)
+        writer.add({'submission_id': 'B1', 'title': 'One', 'description': ''})
+        writer.add({'submission_id': 'B2', 'title': 'Two', 'description': ''})
+        self.assertEqual(writer.created, 2)
+        writer.add({'submission_id': 'B1', 'title': 'One again', 'description': ''})
+
+        with mock.patch.object(SubmissionVersion.objects, 'bulk_create', side_effect=RuntimeError('boom')):
+            writer.close()
+        self.assertEqual(writer.errors, ['Error writing 1 submissions (B1 .. B1): boom'])
+        # The failed batch rolled back as a whole
+        self.assertEqual(Submission.objects.get(submission_id='B1').title, 'One')
+        self.assertEqual((writer.created, writer.updated), (2, 0))
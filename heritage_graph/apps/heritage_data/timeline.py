@@ -0,0 +1,104 @@
+"""
+Merged, newest-first timeline of an entity's revisions and activities.
+
+Each table is read as its own stream with keyset pagination over
+``(entity, created_at, pk)``, so a page costs two bounded index range scans
+no matter how long the entity's history is. The two streams are then merged
+in Python and cut to the page size.
+"""
+
+import base64
+import heapq
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Activity, Revision
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Tie-break between streams for events sharing a timestamp
+REVISION = 'revision'
+ACTIVITY = 'activity'
+STREAM_RANK = {ACTIVITY: 0, REVISION: 1}
+STREAM_MODELS = {ACTIVITY: Activity, REVISION: Revision}
+
+
+def encode_cursor(key):
+    created_at, kind, pk = key
+    raw = json.dumps([created_at.isoformat(), kind, str(pk)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Turn an opaque cursor back into a sort key; raises ValueError if malformed"""
+    try:
+        created_at, kind, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if kind not in STREAM_RANK or not isinstance(created_at, str) or not isinstance(pk, str):
+            raise ValueError
+        created_at = datetime.fromisoformat(created_at)
+        pk = STREAM_MODELS[kind]._meta.pk.to_python(pk)
+    except (TypeError, ValueError, ValidationError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor.")
+    if timezone.is_naive(created_at):
+        raise ValueError("Invalid cursor.")
+    return created_at, kind, pk
+
+
+def _before(kind, pk_name, cursor):
+    """Rows of stream ``kind`` that sort strictly after ``cursor`` (newest first)"""
+    if cursor is None:
+        return Q()
+    created_at, cursor_kind, pk = cursor
+    older = Q(created_at__lt=created_at)
+    if STREAM_RANK[kind] < STREAM_RANK[cursor_kind]:
+        return older | Q(created_at=created_at)
+    if STREAM_RANK[kind] == STREAM_RANK[cursor_kind]:
+        return older | Q(created_at=created_at, **{f'{pk_name}__lt': pk})
+    # At equal timestamps this stream sorts before the cursor's stream
+    return older
+
+
+def _stream(queryset, kind, cursor, limit):
+    pk_name = queryset.model._meta.pk.name
+    rows = queryset.filter(_before(kind, pk_name, cursor)).order_by(
+        '-created_at', f'-{pk_name}'
+    )[:limit]
+    for row in rows:
+        yield (row.created_at, STREAM_RANK[kind], str(row.pk)), kind, row
+
+
+def entity_timeline(entity_id, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return ``(events, next_cursor)`` where ``events`` is a list of
+    ``(kind, instance)`` pairs, newest first, and ``next_cursor`` is None on
+    the last page.
+    """
+    revisions = (
+        Revision.objects.filter(entity_id=entity_id)
+        .select_related('created_by')
+        .defer('snapshot')
+    )
+    activities = Activity.objects.filter(entity_id=entity_id).select_related('user')
+
+    # One extra row per stream tells us whether another page exists
+    merged = heapq.merge(
+        _stream(revisions, REVISION, cursor, page_size + 1),
+        _stream(activities, ACTIVITY, cursor, page_size + 1),
+        key=lambda event: event[0],
+        reverse=True,
+    )
+    page = []
+    for key, kind, row in merged:
+        if len(page) == page_size:
+            last_key, last_kind, last_row = page[-1]
+            return (
+                [(k, r) for _, k, r in page],
+                encode_cursor((last_key[0], last_kind, last_row.pk)),
+            )
+        page.append((key, kind, row))
+    return [(k, r) for _, k, r in page], None
@@ -0,0 +1,102 @@
+"""
+Per-user unread notification counters.
+
+Both notification apps keep a ``(user, unread)`` counter table next to their
+notifications; UnreadCounters holds the logic once and each app binds an
+instance to its own pair of models. Every instance is listed in
+UNREAD_COUNTERS so reconcile_unread_counts can rebuild them all.
+"""
+
+import collections
+
+from django.db import transaction
+from django.db.models import Count, F
+
+UNREAD_COUNTERS = []
+
+
+class UnreadCounters:
+    def __init__(self, counter_model, notification_model):
+        self.counter_model = counter_model
+        self.notification_model = notification_model
+        UNREAD_COUNTERS.append(self)
+
+    def __str__(self):
+        return self.counter_model._meta.label
+
+    def adjust(self, deltas):
+        """Apply ``{user_id: delta}`` to the counters in the caller's transaction"""
+        deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        with transaction.atomic():
+            self.counter_model.objects.bulk_create(
+                [self.counter_model(user_id=user_id) for user_id in deltas],
+                ignore_conflicts=True,
+            )
+            for user_id, delta in sorted(deltas.items()):
+                self.counter_model.objects.filter(user_id=user_id).update(
+                    unread=F("unread") + delta
+                )
+
+    def get(self, user):
+        return (
+            self.counter_model.objects.filter(user=user)
+            .values_list("unread", flat=True)
+            .first()
+            or 0
+        )
+
+    def mark_read(self, notifications):
+        """
+        Mark every unread notification in ``notifications`` as read with one
+        UPDATE and move the affected users' counters down to match.
+        Returns the number of notifications that changed.
+        """
+        with transaction.atomic():
+            unread = notifications.filter(is_read=False)
+            # Lock the rows so the per-user totals match what the UPDATE changes
+            per_user = collections.Counter(
+                unread.select_for_update().values_list("user_id", flat=True)
+            )
+            updated = unread.update(is_read=True)
+            self.adjust({user_id: -total for user_id, total in per_user.items()})
+        return updated
+
+    def reconcile(self, dry_run=False):
+        """
+        Recompute every counter from the notifications with one GROUP BY.
+        Returns ``{user_id: (stored, actual)}`` for the counters that were off.
+        """
+        with transaction.atomic():
+            # Lock the counters first so writers wait for the rebuild instead
+            # of applying deltas to rows that are about to be overwritten
+            stored = {
+                row.user_id: row for row in self.counter_model.objects.select_for_update()
+            }
+            actual = dict(
+                self.notification_model.objects.filter(is_read=False)
+                .order_by()
+                .values("user_id")
+                .annotate(total=Count("pk"))
+                .values_list("user_id", "total")
+            )
+
+            drift, to_create, to_update = {}, [], []
+            for user_id in sorted(set(stored) | set(actual)):
+                expected = actual.get(user_id, 0)
+                row = stored.get(user_id)
+                current = row.unread if row else 0
+                if current == expected:
+                    continue
+                drift[user_id] = (current, expected)
+                if row is None:
+                    to_create.append(self.counter_model(user_id=user_id, unread=expected))
+                else:
+                    row.unread = expected
+                    to_update.append(row)
+
+            if not dry_run:
+                self.counter_model.objects.bulk_create(to_create, batch_size=1000)
+                self.counter_model.objects.bulk_update(to_update, ["unread"], batch_size=1000)
+        return drift
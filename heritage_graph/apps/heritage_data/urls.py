@@ -8,6 +8,7 @@ router.register(r'cultural-entities', views.CulturalEntityViewSet, basename='cul
 router.register(r'contribution-queue', views.ContributionQueueViewSet, basename='contributionqueue')
 router.register(r'revisions', views.RevisionViewSet, basename='revision')
 router.register(r'activities', views.ActivityViewSet, basename='activity')
+router.register(r'notifications', views.NotificationViewSet, basename='notification')
 
 # router.register(r'submissions', views.SubmissionViewSet, basename='submission')
 # router.register(r'comments', views.CommentViewSet, basename='comment')
@@ -18,6 +19,11 @@ urlpatterns = [
     
     # Legacy API endpoints (consider migrating these to ViewSets over time)
     path("api/submissions/", views.SubmissionListView.as_view(), name="submission-list"),
+    path(
+        "api/submissions/export/",
+        views.SubmissionExportView.as_view(),
+        name="submission-export",
+    ),
     path(
         "api/submissions/<str:submission_id>/",
         views.SubmissionDetailView.as_view(),
@@ -32,6 +38,12 @@ urlpatterns = [
         name="moderation-review",
     ),
     path("api/activity-logs/", views.ActivityLogView.as_view(), name="activity-logs"),
+    path(
+        "api/activity-archive/",
+        views.ActivityArchiveView.as_view(),
+        name="activity-archive",
+    ),
+    path("api/events/", views.event_stream, name="event-stream"),
     path("api/leaderboard/", views.LeaderboardView.as_view(), name="leaderboard"),
     path("api/personal-stats/", views.PersonalStatsView.as_view(), name="personal-stats"),
     
@@ -1,11 +1,19 @@
+import asyncio
 import json
+from urllib.parse import urlencode
 
 # from django.contrib.auth import get_user_model
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Count, Q
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from drf_yasg import openapi
@@ -14,29 +22,72 @@ from django.db.models import Q
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from .models import CulturalEntity, Revision, Activity
+from .models import (
+    CulturalEntity,
+    Revision,
+    Activity,
+    bulk_moderate,
+    get_entity_counters,
+    get_unread_count,
+    is_claimed_by_other,
+    mark_notifications_read,
+    materialize_revisions,
+)
+from .leases import claim_contributions, release_claims, renew_claims
+from .feeds import (
+    DEFAULT_PAGE_SIZE as FEED_PAGE_SIZE,
+    MAX_PAGE_SIZE as FEED_MAX_PAGE_SIZE,
+    decode_cursor as decode_feed_cursor,
+    read_feed,
+)
+from .diffs import changed_keys, diff_documents
+from .timeline import (
+    DEFAULT_PAGE_SIZE as TIMELINE_PAGE_SIZE,
+    MAX_PAGE_SIZE as TIMELINE_MAX_PAGE_SIZE,
+    decode_cursor,
+    entity_timeline,
+)
 from .serializers import *
 from .permissions import IsContributorOrReadOnly, IsEditor
+from .prefetch import plan_queryset
 
 
 # For Swagger documentation
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import generics, permissions, serializers, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.exceptions import (
+    AuthenticationFailed,
+    NotFound,
+    PermissionDenied,
+    ValidationError,
+)
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .archive import ARCHIVE_MODELS, read_archive
+from .push import DEFAULT_QUEUE_SIZE, MODERATION_CHANNEL, get_broker, user_channel
+from .exports import (
+    CONTENT_TYPES,
+    EXPORT_FORMATS,
+    get_export_queryset,
+    parse_since,
+    stream_export,
+)
 from .models import (
     ActivityLog,
     Comments,
     CulturalHeritage,
     Moderation,
+    Notification,
     Submission,
     SubmissionEditSuggestion,
     SubmissionVersion,
@@ -47,7 +98,9 @@ from .serializers import (
     ActivityLogSerializer,
     CommentSerializer,
     CustomUserSerializer,
+    MarkNotificationsReadSerializer,
     ModerationSerializer,
+    NotificationSerializer,
     RegisterSerializer,
     SubmissionEditSuggestionSerializer,
     SubmissionIdSerializer,
@@ -267,6 +320,63 @@ class SubmissionListView(generics.ListAPIView):
     serializer_class = SubmissionSerializer
 
 
+class SubmissionExportView(APIView):
+    """
+    Stream every matching submission as CSV, NDJSON or Parquet.
+
+    Rows are read with a server-side cursor and written out chunk by chunk,
+    so memory use does not grow with the size of the table.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Bulk export submissions",
+        manual_parameters=[
+            openapi.Parameter(
+                "export_format",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                enum=EXPORT_FORMATS,
+                default="csv",
+            ),
+            openapi.Parameter("status", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter("district", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter(
+                "since",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Only submissions created at or after this ISO date",
+            ),
+        ],
+    )
+    def get(self, request):
+        params = request.query_params
+        export_format = params.get("export_format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError(
+                {"export_format": f"Must be one of {', '.join(EXPORT_FORMATS)}."}
+            )
+
+        try:
+            queryset = get_export_queryset(
+                status=params.get("status"),
+                district=params.get("district"),
+                since=parse_since(params.get("since")),
+            )
+            chunks = stream_export(export_format, queryset)
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)})
+
+        response = StreamingHttpResponse(
+            chunks, content_type=CONTENT_TYPES[export_format]
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="submissions.{export_format}"'
+        )
+        return response
+
+
 # Moderator view: Review a submission
 class ModerationReviewView(generics.UpdateAPIView):
     queryset = Moderation.objects.all()
@@ -314,6 +424,125 @@ class ActivityLogView(APIView):
         return Response(serializer.data)
 
 
+PUSH_HEARTBEAT_SECONDS = 15
+
+
+@sync_to_async
+def _authenticate_stream(request):
+    if request.user.is_authenticated:
+        return request.user
+    # EventSource cannot set headers, so the token may come as ?access_token=
+    token = request.GET.get("access_token")
+    if token and "HTTP_AUTHORIZATION" not in request.META:
+        request.META["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    drf_request = Request(
+        request,
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    try:
+        user = drf_request.user
+    except AuthenticationFailed:
+        return None
+    return user if user.is_authenticated else None
+
+
+def _sse(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, cls=DjangoJSONEncoder)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+async def event_stream(request):
+    """
+    Server-sent event stream of the user's notifications (heritage and
+    CIDOC) and moderation updates on their entities; staff also receive
+    every moderation event. Needs an ASGI server. Each connection buffers at
+    most PUSH_QUEUE_SIZE events; older ones are dropped and an ``overflow``
+    event tells the client to refetch over the REST endpoints.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "The event stream is only served over ASGI."}, status=501
+        )
+    user = await _authenticate_stream(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."}, status=401
+        )
+
+    channels = [user_channel(user.pk)]
+    if user.is_staff:
+        channels.append(MODERATION_CHANNEL)
+
+    async def stream():
+        # Subscribing inside the generator ties the subscription to its
+        # finally block, which runs when the client disconnects
+        subscription = get_broker().subscribe(
+            channels, max_queue=getattr(settings, "PUSH_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)
+        )
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    message = await subscription.get(timeout=PUSH_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscription.dropped:
+                    yield _sse("overflow", {"dropped": subscription.dropped})
+                    subscription.dropped = 0
+                yield _sse(message["type"], message, event_id=message["id"])
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+class ActivityArchiveView(APIView):
+    """
+    Stream archived activity rows for a time range as NDJSON, read from the
+    monthly archive files written by the archive_activity command.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Read archived activity",
+        manual_parameters=[
+            openapi.Parameter(
+                "kind",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                enum=sorted(ARCHIVE_MODELS),
+                required=True,
+            ),
+            openapi.Parameter("since", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter("until", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        ],
+    )
+    def get(self, request):
+        params = request.query_params
+        kind = params.get("kind")
+        if kind not in ARCHIVE_MODELS:
+            raise ValidationError(
+                {"kind": f"Must be one of {', '.join(sorted(ARCHIVE_MODELS))}."}
+            )
+        try:
+            since = parse_since(params.get("since"))
+            until = parse_since(params.get("until"))
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)})
+
+        rows = read_archive(kind, start=since, end=until)
+        return StreamingHttpResponse(
+            (json.dumps(row) + "\n" for row in rows),
+            content_type="application/x-ndjson",
+        )
+
+
 class LogoutView(APIView):
     permission_classes = (AllowAny,)
     authentication_classes = ()
@@ -828,6 +1057,8 @@ class CulturalEntityViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
     ordering_fields = ['created_at', 'updated_at', 'name']
     ordering = ['-created_at']
+    # Most recent related rows loaded per entity on detail responses
+    prefetch_limits = {'revisions': 20, 'activities': 50}
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -854,15 +1085,54 @@ class CulturalEntityViewSet(viewsets.ModelViewSet):
         if self.action == 'list' and not self.request.user.is_staff:
             queryset = queryset.filter()
         
-        # Prefetch related data for performance
+        # Load exactly what the serializer for this action renders; one row
+        # past each limit is read so retrieve() can tell the list was cut
         if self.action in ['retrieve', 'list']:
-            queryset = queryset.select_related('contributor', 'current_revision').prefetch_related('revisions', 'activities')
+            queryset = plan_queryset(
+                queryset,
+                self.get_serializer_class()(),
+                limits={name: limit + 1 for name, limit in self.prefetch_limits.items()},
+            )
         
         return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Entity detail. The nested revisions and activities are capped at the
+        most recent prefetch_limits rows; ``<name>_truncated`` says whether
+        more exist and ``timeline`` pages through all of them.
+        """
+        response = super().retrieve(request, *args, **kwargs)
+        for name, limit in self.prefetch_limits.items():
+            rows = response.data[name]
+            response.data[f'{name}_truncated'] = len(rows) > limit
+            response.data[name] = rows[:limit]
+        response.data['timeline'] = reverse(
+            'culturalentity-timeline', args=[kwargs['pk']], request=request
+        )
+        return response
     
     def perform_create(self, serializer):
         serializer.save(contributor=self.request.user)
     
+    @action(detail=False, methods=['get'])
+    def counts(self, request):
+        """
+        Entity counts per status and category, read from the counters table
+        """
+        matrix = get_entity_counters()
+        by_status = {key: sum(row.values()) for key, row in matrix.items()}
+        by_category = {}
+        for row in matrix.values():
+            for category, count in row.items():
+                by_category[category] = by_category.get(category, 0) + count
+        return Response({
+            'total': sum(by_status.values()),
+            'by_status': by_status,
+            'by_category': by_category,
+            'matrix': matrix,
+        })
+
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def my_contributions(self, request):
         """
@@ -929,6 +1199,49 @@ class CulturalEntityViewSet(viewsets.ModelViewSet):
             {'message': 'Entity submitted for review successfully'},
             status=status.HTTP_200_OK
         )
+    
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ]
+    )
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """
+        Revisions and activities of an entity merged newest first, one
+        cursor page at a time
+        """
+        if not CulturalEntity.objects.filter(pk=pk).exists():
+            raise NotFound("Entity not found.")
+
+        try:
+            cursor = request.query_params.get('cursor')
+            cursor = decode_cursor(cursor) if cursor else None
+            page_size = int(request.query_params.get('page_size', TIMELINE_PAGE_SIZE))
+        except ValueError as exc:
+            raise ValidationError({'detail': str(exc)})
+        page_size = max(1, min(page_size, TIMELINE_MAX_PAGE_SIZE))
+
+        events, next_cursor = entity_timeline(pk, cursor=cursor, page_size=page_size)
+        results = []
+        for kind, row in events:
+            serializer = RevisionDiffSerializer if kind == 'revision' else ActivitySerializer
+            results.append({
+                'type': kind,
+                'created_at': row.created_at,
+                kind: serializer(row).data,
+            })
+
+        next_url = None
+        if next_cursor:
+            next_url = request.build_absolute_uri(
+                '{}?{}'.format(
+                    request.path,
+                    urlencode({'cursor': next_cursor, 'page_size': page_size}),
+                )
+            )
+        return Response({'next': next_url, 'results': results})
 
 class ContributionQueueViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -953,10 +1266,21 @@ class ContributionQueueViewSet(viewsets.ReadOnlyModelViewSet):
         """
         Only include pending or pending-revision contributions in the queue.
         """
+        activity_counts = (
+            Activity.objects.filter(entity=OuterRef('pk'))
+            .order_by()
+            .values('entity')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
         return (
             CulturalEntity.objects.filter(status__in=['pending_review', 'pending_revision'])
-            .select_related('contributor')
-            .prefetch_related('activities')
+            .select_related(
+                'contributor',
+                'current_revision__created_by',
+                'latest_revision__created_by',
+            )
+            .annotate(activity_count=Coalesce(Subquery(activity_counts), 0))
         )
 
     @action(detail=True, methods=['post'])
@@ -974,6 +1298,12 @@ class ContributionQueueViewSet(viewsets.ReadOnlyModelViewSet):
         action = serializer.validated_data['action']
         comment = serializer.validated_data.get('comment', '')
 
+        if is_claimed_by_other(entity.claimed_by_id, entity.claim_expires_at, request.user):
+            return Response(
+                {'error': 'Entity is claimed by another editor'},
+                status=status.HTTP_409_CONFLICT
+            )
+
         if action == 'accept':
             entity.accept_contribution(request.user, comment)
             return Response({'message': 'Entity accepted successfully'}, status=status.HTTP_200_OK)
@@ -984,6 +1314,75 @@ class ContributionQueueViewSet(viewsets.ReadOnlyModelViewSet):
 
         return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
 
+    @swagger_auto_schema(request_body=BulkModerationSerializer)
+    @action(detail=False, methods=['post'])
+    def bulk_moderate(self, request):
+        """
+        Accept or reject a batch of queued contributions in one transaction.
+        Only for authenticated editors.
+        """
+        serializer = BulkModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = bulk_moderate(
+            serializer.validated_data['entity_ids'],
+            request.user,
+            serializer.validated_data['action'],
+            serializer.validated_data.get('comment', ''),
+        )
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(request_body=ClaimSerializer)
+    @action(detail=False, methods=['post'])
+    def claim(self, request):
+        """
+        Lease the next unclaimed contributions to the current editor.
+        Leases expire unless renewed; leases already held are renewed too.
+        """
+        serializer = ClaimSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        claimed = claim_contributions(request.user, serializer.validated_data['limit'])
+        entities = self.get_queryset().filter(pk__in=claimed).order_by('created_at')
+        return Response(
+            self.get_serializer(entities, many=True).data,
+            status=status.HTTP_200_OK
+        )
+
+    @swagger_auto_schema(request_body=LeaseSerializer)
+    @action(detail=False, methods=['post'])
+    def renew(self, request):
+        """
+        Extend the current editor's leases
+        """
+        serializer = LeaseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        renewed, expires = renew_claims(
+            request.user, serializer.validated_data.get('entity_ids')
+        )
+        return Response(
+            {'renewed': renewed, 'claim_expires_at': expires},
+            status=status.HTTP_200_OK
+        )
+
+    @swagger_auto_schema(request_body=LeaseSerializer)
+    @action(detail=False, methods=['post'])
+    def release(self, request):
+        """
+        Return the current editor's leases to the queue
+        """
+        serializer = LeaseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        released = release_claims(
+            request.user, serializer.validated_data.get('entity_ids')
+        )
+        return Response({'released': released}, status=status.HTTP_200_OK)
+
+# Revision payloads never change once written, so a computed diff stays valid
+REVISION_DIFF_CACHE_TIMEOUT = 60 * 60 * 24
+
 class RevisionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing revisions
@@ -993,6 +1392,17 @@ class RevisionViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         return Revision.objects.select_related('created_by', 'entity')
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        revisions = list(queryset) if page is None else page
+        # Rebuild the page's diff-only revisions with one query per entity
+        materialize_revisions(revisions)
+        serializer = self.get_serializer(revisions, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def entity_history(self, request, pk=None):
@@ -1005,12 +1415,70 @@ class RevisionViewSet(viewsets.ReadOnlyModelViewSet):
         entity_data = CulturalEntityDetailSerializer(entity).data
         return Response(entity_data)
 
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                'against', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                description="Earlier revision ID to compare with (defaults to the previous revision)",
+            ),
+            openapi.Parameter(
+                'summary', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                description="Return only the changed top-level keys",
+            ),
+        ]
+    )
+    @action(detail=True, methods=['get'])
+    def diff(self, request, pk=None):
+        """
+        Field-level diff of this revision against an earlier revision of the
+        same entity. Revisions are immutable, so results are cached per pair.
+        """
+        revision = self.get_object()
+        against_id = request.query_params.get('against')
+        if against_id:
+            try:
+                against = Revision.objects.get(pk=against_id)
+            except (Revision.DoesNotExist, DjangoValidationError):
+                raise NotFound("Revision to compare against not found.")
+            if against.entity_id != revision.entity_id:
+                raise ValidationError(
+                    {'against': "Revisions must belong to the same entity."}
+                )
+            if against.revision_number >= revision.revision_number:
+                raise ValidationError(
+                    {'against': "Compare against an earlier revision."}
+                )
+        else:
+            against = Revision.objects.filter(
+                entity_id=revision.entity_id,
+                revision_number=revision.revision_number - 1,
+            ).first()
+
+        cache_key = 'revision-diff:{}:{}'.format(
+            against.pk if against else 'empty', revision.pk
+        )
+        ops = cache.get(cache_key)
+        if ops is None:
+            materialize_revisions([r for r in (revision, against) if r])
+            ops = diff_documents(against.data if against else {}, revision.data)
+            cache.set(cache_key, ops, REVISION_DIFF_CACHE_TIMEOUT)
+
+        result = {
+            'revision_id': revision.pk,
+            'against': against.pk if against else None,
+            'changed_keys': changed_keys(ops),
+        }
+        if request.query_params.get('summary', '').lower() not in ('1', 'true', 'yes'):
+            result['diff'] = ops
+        return Response(result)
+
 class ActivityViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing activities.
     Returns:
       - All activities if no authenticated user or user is staff.
-      - User-specific activities (their own + ones on entities they contributed) otherwise.
+      - User-specific activities (their own + ones on entities they contributed) otherwise,
+        read from the user's fanned-out feed with cursor pagination.
     """
     serializer_class = ActivitySerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
@@ -1029,7 +1497,98 @@ class ActivityViewSet(viewsets.ReadOnlyModelViewSet):
         if user.is_staff:
             return Activity.objects.select_related('user', 'entity')
 
-        # Authenticated non-staff → user-specific
+        # Authenticated non-staff → user-specific, via their feed
         return Activity.objects.filter(
-            Q(user=user) | Q(entity__contributor=user)
+            feed_entries__owner=user
         ).select_related('user', 'entity')
+
+    def _uses_feed(self):
+        user = self.request.user
+        return user and user.is_authenticated and not user.is_staff
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        if not self._uses_feed():
+            return super().list(request, *args, **kwargs)
+
+        try:
+            cursor = request.query_params.get('cursor')
+            cursor = decode_feed_cursor(cursor) if cursor else None
+            page_size = int(request.query_params.get('page_size', FEED_PAGE_SIZE))
+        except ValueError as exc:
+            raise ValidationError({'detail': str(exc)})
+        page_size = max(1, min(page_size, FEED_MAX_PAGE_SIZE))
+        filters = {
+            field: request.query_params[field]
+            for field in self.filterset_fields
+            if request.query_params.get(field)
+        }
+
+        try:
+            activities, next_cursor = read_feed(
+                request.user, cursor=cursor, page_size=page_size, **filters
+            )
+        except DjangoValidationError as exc:
+            raise ValidationError({'detail': exc.messages})
+
+        next_url = None
+        if next_cursor:
+            params = request.query_params.copy()
+            params['cursor'] = next_cursor
+            next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+        return Response({
+            'next': next_url,
+            'results': self.get_serializer(activities, many=True).data,
+        })
+
+
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The current user's notifications, newest first.
+    ?unread=true limits the inbox to unread ones.
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = 'notification_id'
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        if self.request.query_params.get('unread', '').lower() in ('1', 'true', 'yes'):
+            queryset = queryset.filter(is_read=False)
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """
+        Unread badge count, read from the user's counter row
+        """
+        return Response({'unread': get_unread_count(request.user)})
+
+    @swagger_auto_schema(request_body=MarkNotificationsReadSerializer)
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """
+        Mark the given notifications as read
+        """
+        serializer = MarkNotificationsReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = mark_notifications_read(
+            Notification.objects.filter(
+                user=request.user,
+                notification_id__in=serializer.validated_data['ids'],
+            )
+        )
+        return Response({'updated': updated, 'unread': get_unread_count(request.user)})
+
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        """
+        Mark every notification of the current user as read
+        """
+        updated = mark_notifications_read(Notification.objects.filter(user=request.user))
+        return Response({'updated': updated, 'unread': get_unread_count(request.user)})
@@ -127,3 +127,20 @@ GRAPH_MODELS = {
     "all_applications": True,
     "graph_models": True,
 }
+
+# Outbox events are handled by `manage.py drain_outbox`; set to True to
+# handle them right after each commit instead (no worker needed)
+OUTBOX_DISPATCH_ON_COMMIT = False
+
+# Server-sent event push (api/events/). The in-process broker only reaches
+# streams served by the publishing process; point PUSH_BROKER at a shared
+# broker when running several ASGI workers or a separate outbox worker.
+PUSH_BROKER = "apps.heritage_data.push.InProcessBroker"
+PUSH_QUEUE_SIZE = 100
+
+# Activity rows older than this many days are moved to monthly NDJSON
+# archives by `manage.py archive_activity`
+ACTIVITY_RETENTION_DAYS = {"activitylog": 180, "activity": 730, "cidoc_activity": 730}
+ACTIVITY_ARCHIVE_DIR = os.environ.get(
+    "ACTIVITY_ARCHIVE_DIR", Path(__file__).resolve().parent.parent / "archive"
+)
@@ -18,3 +18,5 @@ DATABASES = {
         "NAME": BASE_DIR / "db.sqlite3",
     }
 }
+
+OUTBOX_DISPATCH_ON_COMMIT = True